@@ -2,36 +2,136 @@
 """
 智能重试下载脚本
 利用 CDN 节点状态波动的特点，多次重试直到成功
+
+每次执行有一个 run_id（workflow_checkpoints.py），每次尝试的结果都记下来：
+脚本被中断或重试用完后再运行，会接着上一次的 run_id 继续，累计结果不丢；
+run_id 通过环境变量 WORKFLOW_RUN_ID 传给 main.py，下载时据此跳过这一轮已经下载过的视频
+
+第一次整批运行 main.py 之后，不再整批重跑：下载失败的视频逐个放进延迟队列
+（delay_queue.py，download:{账号}），每个视频按自己的失败次数指数退避
+（wait_minutes, 2x, 4x ...），到期一个就通过下载服务单独下载一个，
+已经成功的视频不会再检查，一个视频在等也不会拖住其他视频。
+扫描服务放进 fresh 道的新视频总是排在这些重试前面。
 """
 
+import os
 import subprocess
 import time
 import json
 from datetime import datetime
 
+import redis
+
+from delay_queue import DelayQueue, run_worker
+from download_journal import DownloadJournal
+from run_full_workflow import STAGE_TIMEOUTS, call_api
+from workflow_checkpoints import get_checkpoints
+from workflow_engine import StageFailed
+
+REDIS_URL = "redis://localhost:6379"
+
+
+def download_queue(account_name, wait_minutes=10, max_retries=5):
+    """这个账号的下载延迟队列：第 n 次失败后等 wait_minutes * 2^(n-1) 分钟"""
+    return DelayQueue(redis.from_url(REDIS_URL), f"download:{account_name}",
+                      base_delay=wait_minutes * 60, max_delay=wait_minutes * 60 * 16,
+                      max_attempts=max_retries)
+
+
+def download_statuses(account_name):
+    """读一次下载记录，返回 (成功的 shortcode, 失败的 shortcode)。
+    不查 SQLite 索引：下载服务在别的进程（容器）里写记录，索引可能还是写之前的"""
+    succeeded, failed = set(), set()
+    for record in DownloadJournal(account_name).get_downloads():
+        if record.get("shortcode"):
+            (succeeded if record.get("status") == "success" else failed).add(record["shortcode"])
+    return succeeded, failed
+
+
+def queue_failed_downloads(queue, account_name, run_id):
+    """把下载记录里失败、后来也没有成功的视频放进 retry 道，返回放入的个数"""
+    succeeded, failed = download_statuses(account_name)
+    entries = [
+        (shortcode, {"account": account_name, "shortcode": shortcode, "run_id": run_id})
+        for shortcode in sorted(failed - succeeded)
+    ]
+    return queue.add_many(entries, lane="retry", delay=queue.backoff(1))
+
+
+def wait_downloaded(account_name, shortcode, timeout, interval=10):
+    """
+    等下载记录里出现这个视频的成功记录，到 timeout 秒还没有返回 False。
+    下载服务没有状态接口（run_full_workflow.has_status），只能看它写的记录
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        if shortcode in download_statuses(account_name)[0]:
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(min(interval, max(0.0, deadline - time.monotonic())))
+
+
+def download_one(account_name, run_id, checkpoints):
+    """通过下载服务单独下载一个视频，等记录里出现成功；没下载成功抛 StageFailed"""
+    def handler(shortcode, task, attempts):
+        print(f"\n📥 重试 {shortcode}（第 {attempts + 1} 次）")
+        result = call_api("/downloader/download", {
+            "account": account_name,
+            "shortcodes": [shortcode],
+            "max_downloads": 1,
+            "run_id": run_id,
+        })
+        if not result or result.get("status") != "success":
+            raise StageFailed(result.get("error") if result else "API调用失败")
+        if not wait_downloaded(account_name, shortcode, STAGE_TIMEOUTS["download"]):
+            checkpoints.mark_item(run_id, "download", shortcode, status="failed")
+            raise StageFailed(f"{STAGE_TIMEOUTS['download']} 秒内下载服务没有记录成功")
+        checkpoints.mark_item(run_id, "download", shortcode)
+        print(f"✅ {shortcode} 下载成功")
+    return handler
+
+
 def run_download(account_name, max_retries=5, wait_minutes=10):
     """
     智能重试下载
     
     Args:
         account_name: 账号名称 (ai_vanvan 或 aigf8728)
-        max_retries: 最多重试次数
-        wait_minutes: 每次重试之间等待分钟数
+        max_retries: 每个失败的视频最多重试次数
+        wait_minutes: 第一次重试前等待分钟数（之后每次翻倍）
     """
     
+    checkpoints = get_checkpoints()
+    run = checkpoints.latest_unfinished(account_name, kind="download")
+    if run:
+        run_id = run["run_id"]
+        checkpoints.set_run_status(run_id, "running")
+        attempts = checkpoints.done_items(run_id, "attempt")
+        results = [json.loads(attempts[n]) for n in sorted(attempts, key=int)]
+    else:
+        run_id = checkpoints.start_run(account_name, {
+            "max_retries": max_retries,
+            "wait_minutes": wait_minutes,
+        }, kind="download")
+        results = []
+    
     print("=" * 60)
     print(f"🚀 智能下载器启动")
     print(f"📱 账号: {account_name}")
     print(f"🔄 最多重试: {max_retries} 次")
     print(f"⏰ 重试间隔: {wait_minutes} 分钟")
+    print(f"🔖 执行ID: {run_id}")
+    if results:
+        print(f"♻️  继续上次的执行，已经尝试 {len(results)} 次")
     print("=" * 60)
     print()
     
-    results = []
-    
-    for attempt in range(1, max_retries + 1):
+    # 整批只跑一次（恢复的执行已经跑过了），之后的失败逐个重试
+    if not results:
+        attempt = 1
         print(f"\n{'='*60}")
-        print(f"📥 第 {attempt}/{max_retries} 次尝试")
+        print(f"📥 整批下载")
         print(f"⏰ 时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"{'='*60}\n")
         
@@ -43,7 +143,8 @@ def run_download(account_name, max_retries=5, wait_minutes=10):
             capture_output=True, 
             text=True,
             encoding='utf-8',
-            errors='ignore'
+            errors='ignore',
+            env={**os.environ, "WORKFLOW_RUN_ID": run_id}
         )
         
         # 解析结果
@@ -78,22 +179,29 @@ def run_download(account_name, max_retries=5, wait_minutes=10):
             'skipped': skipped,
             'time': datetime.now().isoformat()
         })
+        checkpoints.mark_item(run_id, "attempt", attempt, output=json.dumps(results[-1]))
         
         print(f"\n📊 本次结果:")
         print(f"   ✅ 成功: {success}")
         print(f"   ❌ 失败: {failed}")
         print(f"   ⏭️  跳过: {skipped}")
         
-        # 如果没有失败的，说明全部完成
-        if failed == 0:
-            print(f"\n🎉 所有视频下载完成！")
-            break
-        
-        # 如果还没到最后一次，等待后继续
-        if attempt < max_retries:
-            print(f"\n⏸️  等待 {wait_minutes} 分钟后重试...")
-            print(f"   原因: CDN 节点状态会变化，稍后可能成功")
-            time.sleep(wait_minutes * 60)
+    # 失败的视频逐个退避重试
+    queue = download_queue(account_name, wait_minutes, max_retries)
+    queued = queue_failed_downloads(queue, account_name, run_id)
+    if queued:
+        print(f"\n⏸️  {queued} 个失败的视频放进重试队列，第一次重试约 {wait_minutes} 分钟后")
+        print(f"   原因: CDN 节点状态会变化，稍后可能成功")
+    retried, gave_up = run_worker(queue, download_one(account_name, run_id, checkpoints), exit_when_empty=True)
+    if retried or gave_up:
+        results.append({
+            'attempt': len(results) + 1,
+            'success': retried,
+            'failed': gave_up,
+            'skipped': 0,
+            'time': datetime.now().isoformat()
+        })
+        checkpoints.mark_item(run_id, "attempt", results[-1]['attempt'], output=json.dumps(results[-1]))
     
     # 总结
     print(f"\n\n{'='*60}")
@@ -101,8 +209,10 @@ def run_download(account_name, max_retries=5, wait_minutes=10):
     print(f"{'='*60}")
     
     total_success = sum(r['success'] for r in results)
-    total_failed = results[-1]['failed'] if results else 0
+    # 只算这次执行放进队列的视频；以前的执行放弃的还留在 failed 里，不算到这次头上
+    total_failed = sum(1 for _, task, _ in queue.failed_tasks() if task.get("run_id") == run_id)
     total_attempts = len(results)
+    checkpoints.set_run_status(run_id, "completed" if total_failed == 0 else "failed")
     
     print(f"\n总共尝试: {total_attempts} 次")
     print(f"累计成功: {total_success} 个视频")
@@ -111,11 +221,11 @@ def run_download(account_name, max_retries=5, wait_minutes=10):
     if total_failed == 0:
         print(f"\n✅ 完美！所有视频都下载成功了！")
     elif total_failed < 3:
-        print(f"\n👍 不错！只剩 {total_failed} 个视频失败")
-        print(f"   建议: 稍后再运行一次可能就全部成功了")
+        print(f"\n👍 不错！只剩 {total_failed} 个视频重试 {max_retries} 次仍然失败")
+        print(f"   建议: 稍后运行 python delay_queue.py retry-failed download:{account_name} 再试")
     else:
-        print(f"\n⚠️  还有 {total_failed} 个视频失败")
-        print(f"   建议: 等待更长时间后再试，或检查网络")
+        print(f"\n⚠️  还有 {total_failed} 个视频重试 {max_retries} 次仍然失败")
+        print(f"   建议: 检查网络后运行 python delay_queue.py retry-failed download:{account_name}")
     
     # 保存结果
     with open(f'download_results_{account_name}.json', 'w', encoding='utf-8') as f:
@@ -134,7 +244,7 @@ if __name__ == "__main__":
         print()
         print("可选参数:")
         print("  python auto_retry_download.py ai_vanvan 5 15")
-        print("  (账号名 最多重试次数 等待分钟数)")
+        print("  (账号名 每个视频最多重试次数 第一次重试等待分钟数)")
         sys.exit(1)
     
     account = sys.argv[1]
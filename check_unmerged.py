@@ -1,9 +1,8 @@
-import sys
-sys.path.insert(0, 'src')
-from utils.logger import Logger
+from download_journal import DownloadJournal
 
-logger = Logger('ai_vanvan')
-unmerged = logger.get_unmerged_downloads()
+# 读取快照 + 追加日志（和 Logger.get_unmerged_downloads 结果一致）
+journal = DownloadJournal('ai_vanvan')
+unmerged = journal.get_unmerged_downloads()
 
 print(f'未合并视频总数: {len(unmerged)}')
 print(f'\n前3个未合并视频:')
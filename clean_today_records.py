@@ -1,34 +1,23 @@
 #!/usr/bin/env python3
 """清理今天的下载和合并记录"""
-import json
 import os
 from datetime import datetime
 
+from download_journal import DownloadJournal
+from record_writer import update_json_record
+
 def clean_download_records(account_name, target_date):
-    """清理下载记录中指定日期的数据"""
-    log_file = f"logs/downloads/{account_name}_downloads.json"
+    """清理下载记录中指定日期的数据（加锁重写快照，索引同步删除）"""
+    journal = DownloadJournal(account_name)
     
-    if not os.path.exists(log_file):
-        print(f"❌ 下载记录文件不存在: {log_file}")
+    if not os.path.exists(journal.snapshot_file) and not os.path.exists(journal.journal_file):
+        print(f"❌ 下载记录文件不存在: {journal.snapshot_file}")
         return
     
-    with open(log_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    original_count = len(data.get('downloads', []))
-    
-    # 过滤掉今天的记录
-    data['downloads'] = [
-        d for d in data.get('downloads', [])
-        if not d.get('download_time', '').startswith(target_date)
-    ]
-    
-    removed_count = original_count - len(data['downloads'])
+    removed_count = journal.remove_by_date(target_date)
+    remaining = len(journal.get_downloads())
     
-    with open(log_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    
-    print(f"✅ 下载记录: 删除 {removed_count} 条记录 (剩余 {len(data['downloads'])} 条)")
+    print(f"✅ 下载记录: 删除 {removed_count} 条记录 (剩余 {remaining} 条)")
 
 def clean_merge_records(account_name, target_date):
     """清理合并记录中指定日期的数据"""
@@ -38,23 +27,20 @@ def clean_merge_records(account_name, target_date):
         print(f"❌ 合并记录文件不存在: {log_file}")
         return
     
-    with open(log_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    original_count = len(data.get('merged_videos', []))
-    
-    # 过滤掉今天的记录
-    data['merged_videos'] = [
-        m for m in data.get('merged_videos', [])
-        if not m.get('timestamp', '').startswith(target_date)
-    ]
-    
-    removed_count = original_count - len(data['merged_videos'])
+    def remove_date(data):
+        original_count = len(data.get('merged_videos', []))
+        
+        # 过滤掉今天的记录
+        data['merged_videos'] = [
+            m for m in data.get('merged_videos', [])
+            if not m.get('timestamp', '').startswith(target_date)
+        ]
+        return original_count - len(data['merged_videos']), len(data['merged_videos'])
     
-    with open(log_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    # 加锁修改，不会覆盖合并进程同时写入的记录
+    removed_count, remaining = update_json_record(log_file, remove_date)
     
-    print(f"✅ 合并记录: 删除 {removed_count} 条记录 (剩余 {len(data['merged_videos'])} 条)")
+    print(f"✅ 合并记录: 删除 {removed_count} 条记录 (剩余 {remaining} 条)")
 
 if __name__ == "__main__":
     account = "ai_vanvan"
@@ -0,0 +1,331 @@
+"""
+逐个视频流式交接 - 下载 → 标准化 → 合并（Redis Streams）
+
+以前每一步都是整批：/downloader/download 把 N 个全部下完才开始标准化，
+全部标准化完才开始合并，一轮的耗时是三步加起来。
+
+这里每个账号两条流：
+  clips:downloaded:{account}     下载完一个就 XADD 一条，标准化服务马上开始编码
+  clips:standardized:{account}   标准化完一个就 XADD 一条，凑够 batch_size 个合并服务就合并
+下载、编码、合并同时进行，一轮的耗时大约是最慢那一步的耗时。
+
+  - 用消费组（standardizer / merger），多个标准化容器可以一起消费同一个账号的流
+  - 标准化结果的 XADD 和原消息的 XACK 在同一个事务里，重启不会丢也不会重复
+  - 合并服务攒着的片段在合并成功之前不 XACK：重启后从自己的待确认列表恢复；
+    不够一批的片段留给下一轮；合并失败只记日志，过一会儿再试，不会让合并服务退出
+  - 下载结束时 finish_downloads(run_id, total) 往 standardized 流写一条结束标记，
+    合并服务数满这一轮的 total 个（标准化失败的也算）就把剩下的合并掉（不少于 min_batch 个）；
+    每一轮的计数存在 clips:runs:{account}，合并服务重启后也能数满
+  - 传入 checkpoints（workflow_checkpoints）时按 run_id 记录每个片段，
+    同一轮重试时已经标准化过的片段不再编码
+  - 消息用 task_codec 编码（msgpack），和任务队列一样
+
+用法（下载服务）:
+    stream = ClipStream(r, "ai_vanvan")
+    stream.add_downloaded(path, run_id=run_id, shortcode=shortcode)
+    stream.finish_downloads(run_id, total=downloaded_count)
+
+用法（标准化服务 / 合并服务）:
+    standardize_worker(r, "ai_vanvan", standardize_one, consumer="standardizer-1")
+    merge_worker(r, "ai_vanvan", merge_clips, batch_size=15, on_run_done=report)
+
+用法（命令行）:
+  python clip_stream.py status ai_vanvan
+"""
+import sys
+import time
+
+import redis
+
+from task_codec import binary_client, decode, encode
+
+REDIS_URL = "redis://localhost:6379"
+DOWNLOADED_STREAM = "clips:downloaded:{account}"
+STANDARDIZED_STREAM = "clips:standardized:{account}"
+STANDARDIZER_GROUP = "standardizer"
+MERGER_GROUP = "merger"
+RUNS_KEY = "clips:runs:{account}"
+STREAM_MAXLEN = 10000
+BLOCK_MS = 5000
+RETRY_DELAY = 60
+
+
+def _id_key(message_id):
+    """流消息ID 1700000000000-3 -> (1700000000000, 3)，用来排序"""
+    if isinstance(message_id, bytes):
+        message_id = message_id.decode()
+    ms, _, seq = str(message_id).partition("-")
+    return int(ms), int(seq or 0)
+
+
+def _decode(fields):
+    return decode(fields[b"data"])
+
+
+class ClipStream:
+    """单个账号的两条片段流"""
+
+    def __init__(self, redis_client, account):
+        self.redis = binary_client(redis_client)
+        self.account = account
+        self.downloaded = DOWNLOADED_STREAM.format(account=account)
+        self.standardized = STANDARDIZED_STREAM.format(account=account)
+
+    def ensure_group(self, stream, group):
+        try:
+            self.redis.xgroup_create(stream, group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def _add(self, stream, message, pipe=None):
+        return (pipe or self.redis).xadd(
+            stream, {"data": encode(message)},
+            maxlen=STREAM_MAXLEN, approximate=True,
+        )
+
+    # ------------------------------------------------------------------
+    # 生产
+    # ------------------------------------------------------------------
+
+    def add_downloaded(self, path, run_id=None, **fields):
+        """下载服务：下完一个视频就调用"""
+        return self._add(self.downloaded, {"type": "clip", "path": path, "run_id": run_id, **fields})
+
+    def finish_downloads(self, run_id, total):
+        """下载服务：这一轮下载结束，total 是这一轮 add_downloaded 的个数"""
+        return self._add(self.standardized, {"type": "end", "run_id": run_id, "total": total})
+
+    def forward(self, message_id, message, group):
+        """把处理结果写进 standardized 流，同时确认 downloaded 流里的原消息（一个事务）"""
+        pipe = self.redis.pipeline()
+        self._add(self.standardized, message, pipe)
+        pipe.xack(self.downloaded, group, message_id)
+        pipe.execute()
+
+    # ------------------------------------------------------------------
+    # 消费
+    # ------------------------------------------------------------------
+
+    def read(self, stream, group, consumer, count=10, block=BLOCK_MS, after=None):
+        """
+        读新消息 [(消息ID, 内容)]。after 是消息ID时改为读本消费者已经领取、
+        ID 在 after 之后但还没确认的消息（重启恢复用）。
+        已经被 MAXLEN 裁掉的待确认消息直接确认掉。
+        """
+        response = self.redis.xreadgroup(
+            group, consumer, {stream: ">" if after is None else after},
+            count=count, block=block if after is None else None,
+        )
+        entries = response[0][1] if response else []
+        trimmed = [message_id for message_id, fields in entries if not fields]
+        if trimmed:
+            self.redis.xack(stream, group, *trimmed)
+        return [(message_id, _decode(fields)) for message_id, fields in entries if fields]
+
+    def ack(self, stream, group, *message_ids):
+        if message_ids:
+            self.redis.xack(stream, group, *message_ids)
+
+    def status(self):
+        """每条流的长度和各消费组的待确认数"""
+        result = {}
+        for name, stream in (("downloaded", self.downloaded), ("standardized", self.standardized)):
+            info = {"length": self.redis.xlen(stream), "groups": {}}
+            if info["length"] or self.redis.exists(stream):
+                for group in self.redis.xinfo_groups(stream):
+                    group_name = group["name"].decode() if isinstance(group["name"], bytes) else group["name"]
+                    info["groups"][group_name] = {"pending": group["pending"], "lag": group.get("lag")}
+            result[name] = info
+        return result
+
+
+# ----------------------------------------------------------------------
+# 标准化服务
+# ----------------------------------------------------------------------
+
+def _consume(stream, source, group, consumer, count, stop):
+    """先产出上次领取了没确认的，再读新的；空闲时产出 None，stop.is_set() 时结束"""
+    stream.ensure_group(source, group)
+    after = "0"
+    while not (stop and stop.is_set()):
+        entries = stream.read(source, group, consumer, count=count, after=after)
+        if after is not None:
+            after = entries[-1][0] if entries else None
+        elif not entries:
+            yield None
+        for entry in entries:
+            yield entry
+
+
+def standardize_worker(redis_client, account, standardize_fn, consumer="standardizer-1", stop=None, count=1,
+                       checkpoints=None):
+    """
+    从 downloaded 流逐个取片段标准化。standardize_fn(path) 返回输出文件路径；
+    抛异常时写一条 failed，合并服务据此计数，不会一直等这个片段。
+    返回处理的个数。
+    """
+    stream = ClipStream(redis_client, account)
+    handled = 0
+    for entry in _consume(stream, stream.downloaded, STANDARDIZER_GROUP, consumer, count, stop):
+        if entry is None:
+            continue
+        message_id, message = entry
+        source = message["path"]
+        base = {"run_id": message.get("run_id"), "source": source, "source_id": _id_key(message_id)}
+        run_id = message.get("run_id")
+        done = checkpoints.done_items(run_id, "standardize") if checkpoints and run_id else {}
+        try:
+            output = done.get(source) or standardize_fn(source)
+            if checkpoints and run_id and source not in done:
+                checkpoints.mark_item(run_id, "standardize", source, output=output)
+            result = {"type": "clip", "path": output, **base}
+        except Exception as e:
+            print(f"❌ [{account}] 标准化失败 {source}: {e}")
+            result = {"type": "failed", "error": str(e), **base}
+        stream.forward(message_id, result, STANDARDIZER_GROUP)
+        handled += 1
+    return handled
+
+
+# ----------------------------------------------------------------------
+# 合并服务
+# ----------------------------------------------------------------------
+
+class MergeAssembler:
+    """
+    攒 standardized 流里的片段，够 batch_size 个就合并一次；
+    一批里的片段按下载顺序排（多个标准化服务完成的先后不一定是下载的先后）。
+    合并成功后才确认这些消息；merge_fn 抛异常时片段留在缓冲里，打印错误，
+    retry_delay 秒后再试，合并服务不会因为一次合并失败退出。
+
+    每一轮已经确认的片段数（含标准化失败的）和结束标记里的 total 存在 clips:runs:{account}，
+    和 XACK 在同一个事务里更新：重启后还没确认的片段从待确认列表回到缓冲，
+    已经确认的从这里读，这一轮照样能数满、结束。
+    """
+
+    def __init__(self, stream, merge_fn, batch_size=15, min_batch=1, on_run_done=None, retry_delay=RETRY_DELAY):
+        self.stream = stream
+        self.merge_fn = merge_fn
+        self.batch_size = batch_size
+        self.min_batch = min_batch
+        self.retry_delay = retry_delay
+        self.on_run_done = on_run_done or (lambda run_id, merged: None)
+        self.runs_key = RUNS_KEY.format(account=stream.account)
+        self.buffer = []      # [(消息ID, 内容)] 还没合并的片段
+        self.acked = {}       # run_id -> 已经确认的片段数（含失败）
+        self.expected = {}    # run_id -> 下载个数（收到结束标记后才有）
+        self.merged = {}      # run_id -> 这一轮参与的合并结果（只在本进程里）
+        self.retry_at = 0.0
+        self._load_runs()
+
+    def _load_runs(self):
+        for field, value in self.stream.redis.hgetall(self.runs_key).items():
+            run_id, _, kind = (field.decode() if isinstance(field, bytes) else field).rpartition(":")
+            (self.acked if kind == "acked" else self.expected)[run_id] = int(value)
+
+    def _ack(self, message_ids, counts=(), total=None):
+        """确认消息；counts 是 [run_id]（每个确认的片段一次），total 是 (run_id, 下载个数)"""
+        pipe = self.stream.redis.pipeline()
+        pipe.xack(self.stream.standardized, MERGER_GROUP, *message_ids)
+        for run_id in counts:
+            pipe.hincrby(self.runs_key, f"{run_id}:acked", 1)
+            self.acked[run_id] = self.acked.get(run_id, 0) + 1
+        if total is not None:
+            pipe.hset(self.runs_key, f"{total[0]}:total", total[1])
+            self.expected[total[0]] = total[1]
+        pipe.execute()
+
+    def _merge(self, size):
+        batch, self.buffer = self.buffer[:size], self.buffer[size:]
+        try:
+            ordered = sorted(batch, key=lambda entry: tuple(entry[1].get("source_id") or _id_key(entry[0])))
+            result = self.merge_fn([message["path"] for _, message in ordered])
+        except Exception:
+            self.buffer = batch + self.buffer
+            raise
+        run_ids = [str(message.get("run_id")) for _, message in batch]
+        self._ack([message_id for message_id, _ in batch], counts=run_ids)
+        for run_id in set(run_ids):
+            self.merged.setdefault(run_id, []).append(result)
+        return result
+
+    def _buffered(self, run_id):
+        return sum(1 for _, message in self.buffer if str(message.get("run_id")) == run_id)
+
+    def handle(self, message_id, message):
+        """处理一条消息，返回这次触发的合并结果列表"""
+        kind = message.get("type")
+        run_id = str(message.get("run_id"))
+        if kind == "clip":
+            self.buffer.append((message_id, message))
+        elif kind == "end":
+            self._ack([message_id], total=(run_id, message.get("total", 0)))
+        else:
+            self._ack([message_id], counts=[run_id] if kind == "failed" else ())
+        return self.flush()
+
+    def flush(self):
+        """够一批就合并，数满的轮次收尾；合并失败时记日志，retry_delay 秒后再试"""
+        results = []
+        if time.time() < self.retry_at:
+            return results
+        try:
+            while len(self.buffer) >= self.batch_size:
+                results.append(self._merge(self.batch_size))
+
+            for run_id, total in list(self.expected.items()):
+                buffered = self._buffered(run_id)
+                if self.acked.get(run_id, 0) + buffered < total:
+                    continue
+                if buffered and len(self.buffer) >= self.min_batch:
+                    results.append(self._merge(len(self.buffer)))
+                self._finish_run(run_id)
+        except Exception as e:
+            print(f"❌ [{self.stream.account}] 合并失败，{self.retry_delay} 秒后重试: {e}")
+            self.retry_at = time.time() + self.retry_delay
+        return results
+
+    def _finish_run(self, run_id):
+        self.stream.redis.hdel(self.runs_key, f"{run_id}:acked", f"{run_id}:total")
+        self.expected.pop(run_id, None)
+        self.acked.pop(run_id, None)
+        self.on_run_done(run_id, self.merged.pop(run_id, []))
+
+
+def merge_worker(redis_client, account, merge_fn, batch_size=15, min_batch=1,
+                 consumer="merger-1", stop=None, on_run_done=None):
+    """
+    从 standardized 流攒片段合并。merge_fn(paths) 合并并返回结果（例如输出文件路径）；
+    on_run_done(run_id, results) 在一轮下载的片段全部处理完时调用。
+    同一个账号只跑一个合并消费者（编号要连续）。返回所有合并结果。
+    """
+    stream = ClipStream(redis_client, account)
+    assembler = MergeAssembler(stream, merge_fn, batch_size, min_batch, on_run_done)
+    results = []
+    for entry in _consume(stream, stream.standardized, MERGER_GROUP, consumer, batch_size, stop):
+        if entry is None:
+            # 空闲时重试之前失败的合并
+            results.extend(assembler.flush())
+        else:
+            results.extend(assembler.handle(*entry))
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    command, account = sys.argv[1], sys.argv[2]
+    clips = ClipStream(redis.from_url(REDIS_URL), account)
+
+    if command == "status":
+        for name, info in clips.status().items():
+            print(f"📊 {name}: {info['length']} 条")
+            for group, counts in info["groups"].items():
+                print(f"   {group}: 待确认 {counts['pending']}, 未读 {counts['lag'] if counts['lag'] is not None else '?'}")
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
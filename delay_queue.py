@@ -0,0 +1,271 @@
+"""
+延迟重试队列 - Redis 有序集合，按优先级分道，每个条目单独指数退避
+
+auto_retry_download.py 以前遇到 CDN 失败就等 10 分钟，再把整个下载重新跑一遍：
+已经成功的视频每次都要重新检查，失败的视频也只能跟着整批一起等。
+
+这里每个条目（例如一个 shortcode）单独排队：
+  delayq:{name}:{lane}     有序集合，分数 = 可以开始的时间戳；lane 按优先级排：fresh（新扫描的）在 retry 前面
+  delayq:{name}:tasks      条目 → 任务内容
+  delayq:{name}:attempts   条目 → 已经失败的次数
+  delayq:{name}:inflight   有序集合，正在处理的条目，分数 = 租约到期时间
+  delayq:{name}:failed     重试次数用完的条目
+
+  - pop() 总是取优先级最高的道里最早到期的条目；新扫描的排在所有重试前面
+  - 失败的条目 retry() 后按 base_delay * 2^(失败次数-1) 退避（±20% 抖动，最多 max_delay），
+    只有它自己等，其他条目照常处理
+  - 取出的条目租约 lease 秒（要比处理一个条目最长的时间长）；处理的进程崩溃了，租约到期
+    也算一次失败，按退避回到 retry 道，次数用完同样移到 failed（不会让一个总把进程搞崩的条目无限重试）
+  - 失败 max_attempts 次后移到 failed，不再自动重试（retry_failed() 可以手动放回去）
+  - 任务用 task_codec 编码；add_many 一批条目只要 2 次往返（扫描服务一次放入几千个帖子）
+
+用法（扫描服务 / 下载服务）:
+    queue = DelayQueue(redis_client, "download:ai_vanvan")
+    queue.add(shortcode, {"shortcode": shortcode})
+    queue.add_many([(shortcode, {"shortcode": shortcode}) for shortcode in scanned])
+    run_worker(queue, download_one, stop=stop)
+
+用法（命令行）:
+  python delay_queue.py status download:ai_vanvan
+  python delay_queue.py retry-failed download:ai_vanvan
+"""
+import json
+import random
+import sys
+import time
+
+import redis
+
+from task_codec import binary_client, decode, encode
+
+REDIS_URL = "redis://localhost:6379"
+LANES = ("fresh", "retry")  # 优先级从高到低
+KEY = "delayq:{name}:{part}"
+BASE_DELAY = 60
+MAX_DELAY = 2 * 60 * 60
+MAX_ATTEMPTS = 6
+LEASE = 60 * 60  # 比下载阶段的超时（STAGE_TIMEOUTS["download"] = 1800 秒）长，等得久的下载不会被当成崩溃
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class DelayQueue:
+    """一个延迟重试队列"""
+
+    def __init__(self, redis_client, name, base_delay=BASE_DELAY, max_delay=MAX_DELAY,
+                 max_attempts=MAX_ATTEMPTS, lease=LEASE):
+        self.redis = binary_client(redis_client)
+        self.name = name
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.lanes = {lane: KEY.format(name=name, part=lane) for lane in LANES}
+        self.tasks = KEY.format(name=name, part="tasks")
+        self.attempts = KEY.format(name=name, part="attempts")
+        self.inflight = KEY.format(name=name, part="inflight")
+        self.failed = KEY.format(name=name, part="failed")
+
+    def backoff(self, attempts):
+        """第 attempts 次失败后等待的秒数"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    # ------------------------------------------------------------------
+    # 放入
+    # ------------------------------------------------------------------
+
+    def add(self, item, task, lane="fresh", delay=0):
+        """放入一个条目；已经在排队、处理中或已经失败的条目不重复放入，返回 False"""
+        return self.add_many([(item, task)], lane, delay) == 1
+
+    def add_many(self, entries, lane="fresh", delay=0):
+        """批量放入 [(条目, 任务)]，返回实际放入的个数"""
+        entries = list(entries)
+        if not entries:
+            return 0
+        pipe = self.redis.pipeline(transaction=False)
+        for item, task in entries:
+            pipe.hsetnx(self.tasks, item, encode(task))
+        ready_at = time.time() + delay
+        added = {item: ready_at for (item, _), new in zip(entries, pipe.execute()) if new}
+        if added:
+            self.redis.zadd(self.lanes[lane], added)
+        return len(added)
+
+    def retry(self, item, error=None):
+        """处理失败：退避后重试，返回等待秒数；次数用完移到 failed，返回 None"""
+        attempts = self.redis.hincrby(self.attempts, item, 1)
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.inflight, item)
+        if attempts >= self.max_attempts:
+            pipe.hset(self.failed, item, json.dumps({
+                "error": error,
+                "attempts": attempts,
+                "failed_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }, ensure_ascii=False))
+            pipe.execute()
+            return None
+        delay = self.backoff(attempts)
+        pipe.zadd(self.lanes["retry"], {item: time.time() + delay})
+        pipe.execute()
+        return delay
+
+    def retry_failed(self):
+        """把 failed 里的条目重新放回 retry 道（失败次数清零），返回个数"""
+        items = self.redis.hkeys(self.failed)
+        if items:
+            pipe = self.redis.pipeline()
+            pipe.hdel(self.failed, *items)
+            pipe.hdel(self.attempts, *items)
+            pipe.zadd(self.lanes["retry"], {item: time.time() for item in items})
+            pipe.execute()
+        return len(items)
+
+    # ------------------------------------------------------------------
+    # 取出
+    # ------------------------------------------------------------------
+
+    def requeue_expired(self, now=None):
+        """租约到期（处理的进程挂了）的条目记一次失败，退避后放回 retry 道或移到 failed，返回个数"""
+        now = now or time.time()
+        expired = self.redis.zrangebyscore(self.inflight, "-inf", now)
+        moved = 0
+        for item in expired:
+            # 先 ZREM：几个进程同时发现同一个过期条目，只有一个记这次失败
+            if self.redis.zrem(self.inflight, item):
+                self.retry(item, "租约到期，处理的进程可能已经退出")
+                moved += 1
+        return moved
+
+    def pop(self, now=None):
+        """
+        取出优先级最高、已经到期的条目，返回 (条目, 任务, 已失败次数)；没有到期的返回 None。
+        多个进程同时 pop 不会拿到同一个条目。
+        """
+        now = now or time.time()
+        self.requeue_expired(now)
+        with self.redis.pipeline() as pipe:
+            for key in self.lanes.values():
+                while True:
+                    try:
+                        pipe.watch(key)
+                        ready = pipe.zrangebyscore(key, "-inf", now, start=0, num=1)
+                        if not ready:
+                            pipe.unwatch()
+                            break
+                        item = ready[0]
+                        pipe.multi()
+                        pipe.zrem(key, item)
+                        pipe.zadd(self.inflight, {item: now + self.lease})
+                        pipe.hget(self.tasks, item)
+                        pipe.hget(self.attempts, item)
+                        _, _, task, attempts = pipe.execute()
+                        return _text(item), decode(task) if task else {}, int(attempts or 0)
+                    except redis.WatchError:
+                        continue
+        return None
+
+    def done(self, item):
+        """处理成功，条目从队列里删掉"""
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.inflight, item)
+        pipe.hdel(self.tasks, item)
+        pipe.hdel(self.attempts, item)
+        pipe.execute()
+
+    def next_ready_in(self):
+        """最早的条目还要等几秒（0 表示已经有到期的）；队列空了返回 None"""
+        scores = []
+        for key in (*self.lanes.values(), self.inflight):
+            first = self.redis.zrange(key, 0, 0, withscores=True)
+            if first:
+                scores.append(first[0][1])
+        if not scores:
+            return None
+        return max(0.0, min(scores) - time.time())
+
+    def failed_tasks(self):
+        """重试次数用完的条目 [(条目, 任务, 失败信息)]"""
+        failed = self.redis.hgetall(self.failed)
+        if not failed:
+            return []
+        items = list(failed)
+        tasks = self.redis.hmget(self.tasks, items)
+        return [
+            (_text(item), decode(task) if task else {}, json.loads(failed[item]))
+            for item, task in zip(items, tasks)
+        ]
+
+    def status(self):
+        """每条道的条目数和已到期数，处理中、已失败的条目数"""
+        now = time.time()
+        info = {
+            lane: {"queued": self.redis.zcard(key), "ready": self.redis.zcount(key, "-inf", now)}
+            for lane, key in self.lanes.items()
+        }
+        info["inflight"] = self.redis.zcard(self.inflight)
+        info["failed"] = self.redis.hlen(self.failed)
+        return info
+
+
+def run_worker(queue, handler, stop=None, idle_wait=5.0, exit_when_empty=False):
+    """
+    下载服务的循环：总是取最该处理的条目。handler(item, task, attempts) 正常返回就 done，
+    抛异常就 retry。exit_when_empty=True 时队列空了（包括等待重试的）就返回。
+    返回 (成功数, 失败数)。
+    """
+    succeeded = failed = 0
+    while not (stop and stop.is_set()):
+        entry = queue.pop()
+        if entry is None:
+            wait = queue.next_ready_in()
+            if wait is None and exit_when_empty:
+                break
+            wait = idle_wait if wait is None else min(max(wait, 0.1), idle_wait)
+            if stop:
+                stop.wait(wait)
+            else:
+                time.sleep(wait)
+            continue
+
+        item, task, attempts = entry
+        try:
+            handler(item, task, attempts)
+        except Exception as e:
+            delay = queue.retry(item, str(e))
+            if delay is None:
+                failed += 1
+                print(f"❌ [{queue.name}] {item} 失败 {attempts + 1} 次，不再重试: {e}")
+            else:
+                print(f"⏳ [{queue.name}] {item} 失败，{delay / 60:.1f} 分钟后重试: {e}")
+            continue
+        queue.done(item)
+        succeeded += 1
+    return succeeded, failed
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    command, name = sys.argv[1], sys.argv[2]
+    queue = DelayQueue(redis.from_url(REDIS_URL), name)
+
+    if command == "status":
+        info = queue.status()
+        for lane in LANES:
+            print(f"📊 {lane:6}: {info[lane]['queued']} 个，已到期 {info[lane]['ready']} 个")
+        print(f"   处理中: {info['inflight']}，已放弃: {info['failed']}")
+        wait = queue.next_ready_in()
+        if wait:
+            print(f"   下一个 {wait / 60:.1f} 分钟后到期")
+    elif command == "retry-failed":
+        print(f"✅ {queue.retry_failed()} 个条目放回重试")
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
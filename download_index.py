@@ -0,0 +1,276 @@
+"""
+下载记录索引 - SQLite，shortcode 为主键
+
+去重检查、未合并查询、按日期筛选以前都要把整个 downloads 数组读进来逐条比较。
+这里把记录放进 logs/downloads/{account}_downloads.db：
+  - shortcode 主键：去重检查是一次主键查询
+  - download_time / merged / status / blogger_name 上建索引
+
+DownloadJournal 发现索引文件存在时会把每个事件同步写进来，
+所以只需要用下面的命令做一次导入。索引里记着导入时快照文件的大小和修改时间，
+快照被别的程序（没走 DownloadJournal）改过时，DownloadJournal 会先从当前记录重新同步再用。
+同一个 shortcode 已经有成功记录时，后来的失败记录不会把它覆盖掉。
+
+用法:
+  python download_index.py import ai_vanvan           # 从当前记录（快照 + 日志）导入
+  python download_index.py check ai_vanvan DMSpQtdt9F_ # 查询某个 shortcode
+  python download_index.py stats ai_vanvan
+"""
+import json
+import os
+import sqlite3
+import sys
+
+DOWNLOAD_LOG_DIR = "logs/downloads"
+
+# 表里单独成列的字段，其余字段放进 extra（JSON）
+COLUMNS = ("shortcode", "download_time", "status", "file_path", "error",
+           "merged", "download_folder", "blogger_name")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    shortcode       TEXT PRIMARY KEY,
+    download_time   TEXT NOT NULL DEFAULT '',
+    status          TEXT NOT NULL DEFAULT '',
+    file_path       TEXT NOT NULL DEFAULT '',
+    error           TEXT NOT NULL DEFAULT '',
+    merged          INTEGER NOT NULL DEFAULT 0,
+    download_folder TEXT NOT NULL DEFAULT '',
+    blogger_name    TEXT NOT NULL DEFAULT '',
+    extra           TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_downloads_time ON downloads(download_time);
+CREATE INDEX IF NOT EXISTS idx_downloads_merged ON downloads(merged);
+CREATE INDEX IF NOT EXISTS idx_downloads_status ON downloads(status);
+CREATE INDEX IF NOT EXISTS idx_downloads_blogger ON downloads(blogger_name);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# 已有成功记录时只接受新的成功记录，失败重试不会把"已下载"冲掉
+UPSERT = """
+INSERT INTO downloads VALUES (?,?,?,?,?,?,?,?,?)
+ON CONFLICT(shortcode) DO UPDATE SET
+    download_time = excluded.download_time,
+    status = excluded.status,
+    file_path = excluded.file_path,
+    error = excluded.error,
+    merged = excluded.merged,
+    download_folder = excluded.download_folder,
+    blogger_name = excluded.blogger_name,
+    extra = excluded.extra
+WHERE downloads.status != 'success' OR excluded.status = 'success'
+"""
+
+
+def index_path(account_name, log_dir=DOWNLOAD_LOG_DIR):
+    return os.path.join(log_dir, f"{account_name}_downloads.db")
+
+
+class DownloadIndex:
+    """单个账号的下载记录索引"""
+
+    def __init__(self, account_name, db_path=None, log_dir=DOWNLOAD_LOG_DIR):
+        self.account_name = account_name
+        self.log_dir = log_dir
+        self.db_path = db_path or index_path(account_name, log_dir)
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ------------------------------------------------------------------
+    # 行 <-> 记录
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _to_row(record):
+        extra = {k: v for k, v in record.items() if k not in COLUMNS}
+        return (
+            record["shortcode"],
+            record.get("download_time", "") or "",
+            record.get("status", "") or "",
+            record.get("file_path", "") or "",
+            record.get("error", "") or "",
+            1 if record.get("merged") else 0,
+            record.get("download_folder", "") or "",
+            record.get("blogger_name", "") or "",
+            json.dumps(extra, ensure_ascii=False),
+        )
+
+    @staticmethod
+    def _to_record(row):
+        record = {k: row[k] for k in COLUMNS}
+        record["merged"] = bool(record["merged"])
+        record.update(json.loads(row["extra"] or "{}"))
+        return record
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def upsert_many(self, records, replace=True):
+        """批量写入；replace=False 时已有的 shortcode 保持不变，成功记录不会被失败记录覆盖"""
+        sql = UPSERT if replace else "INSERT OR IGNORE INTO downloads VALUES (?,?,?,?,?,?,?,?,?)"
+        rows = [self._to_row(r) for r in records if r.get("shortcode")]
+        with self.conn:
+            self.conn.executemany(sql, rows)
+        return len(rows)
+
+    def upsert(self, record):
+        self.upsert_many([record])
+
+    def update(self, shortcode, **fields):
+        """和 DownloadJournal.update 一样，改的是这个 shortcode 本身（包括 status）"""
+        record = self.get(shortcode)
+        if record:
+            record.update(fields)
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO downloads VALUES (?,?,?,?,?,?,?,?,?)",
+                                  self._to_row(record))
+
+    def mark_merged(self, shortcodes):
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE downloads SET merged = 1 WHERE shortcode = ?",
+                [(s,) for s in shortcodes]
+            )
+
+    def remove(self, shortcodes):
+        with self.conn:
+            self.conn.executemany("DELETE FROM downloads WHERE shortcode = ?", [(s,) for s in shortcodes])
+
+    def delete_by_date(self, date_str):
+        """删除指定日期（YYYY-MM-DD）的记录，返回删除条数"""
+        with self.conn:
+            cur = self.conn.execute(
+                "DELETE FROM downloads WHERE download_time >= ? AND download_time < ?",
+                (date_str, date_str + "\uffff")
+            )
+        return cur.rowcount
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def get(self, shortcode):
+        row = self.conn.execute("SELECT * FROM downloads WHERE shortcode = ?", (shortcode,)).fetchone()
+        return self._to_record(row) if row else None
+
+    def is_downloaded(self, shortcode):
+        row = self.conn.execute(
+            "SELECT 1 FROM downloads WHERE shortcode = ? AND status = 'success'", (shortcode,)
+        ).fetchone()
+        return row is not None
+
+    def filter_downloaded(self, shortcodes):
+        """返回 shortcodes 中已经下载成功的那些（一次查询）"""
+        shortcodes = list(shortcodes)
+        found = set()
+        # SQLite 默认最多 999 个参数
+        for i in range(0, len(shortcodes), 900):
+            chunk = shortcodes[i:i + 900]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT shortcode FROM downloads WHERE status = 'success' AND shortcode IN ({placeholders})",
+                chunk
+            )
+            found.update(r[0] for r in rows)
+        return found
+
+    def get_unmerged_downloads(self):
+        """未合并的成功下载，按下载时间排序（与 Logger.get_unmerged_downloads 相同）"""
+        rows = self.conn.execute(
+            "SELECT * FROM downloads WHERE merged = 0 AND status = 'success' ORDER BY download_time"
+        )
+        return [self._to_record(r) for r in rows]
+
+    def get_by_date(self, date_str):
+        rows = self.conn.execute(
+            "SELECT * FROM downloads WHERE download_time >= ? AND download_time < ? ORDER BY download_time",
+            (date_str, date_str + "\uffff")
+        )
+        return [self._to_record(r) for r in rows]
+
+    def get_by_blogger(self, blogger_name):
+        rows = self.conn.execute(
+            "SELECT * FROM downloads WHERE blogger_name = ? ORDER BY download_time", (blogger_name,)
+        )
+        return [self._to_record(r) for r in rows]
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM downloads").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # 快照时间戳
+    # ------------------------------------------------------------------
+
+    def snapshot_stamp(self):
+        """最后一次同步时快照文件的 [大小, 修改时间]；从没同步过返回 None"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'snapshot'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_snapshot_stamp(self, stamp):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('snapshot', ?)", (json.dumps(stamp),))
+
+    def sync(self, downloads, stamp):
+        """整表换成 downloads（当前的完整记录），同时记下快照时间戳"""
+        rows = [self._to_row(r) for r in downloads if r.get("shortcode")]
+        with self.conn:
+            self.conn.execute("DELETE FROM downloads")
+            self.conn.executemany(UPSERT, rows)
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('snapshot', ?)", (json.dumps(stamp),))
+        return len(rows)
+
+    # ------------------------------------------------------------------
+    # 导入
+    # ------------------------------------------------------------------
+
+    def import_account(self):
+        """
+        一次性导入当前记录（快照 + 追加日志）。
+        _backup_* 是某个时间点的旧副本，里面有清理、回退时特意删掉的记录，不导入。
+        """
+        from download_journal import DownloadJournal
+
+        journal = DownloadJournal(self.account_name, log_dir=self.log_dir, index=self)
+        return [(journal.snapshot_file, journal.sync_index())]
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    command, account = sys.argv[1], sys.argv[2]
+    index = DownloadIndex(account)
+
+    if command == "import":
+        for source, count in index.import_account():
+            print(f"✅ {source}: {count} 条")
+        print(f"📊 索引总数: {index.count()} ({index.db_path})")
+    elif command == "check":
+        if len(sys.argv) < 4:
+            print("用法: python download_index.py check <账号> <shortcode>")
+            sys.exit(1)
+        record = index.get(sys.argv[3])
+        if record:
+            print(json.dumps(record, ensure_ascii=False, indent=2))
+        else:
+            print(f"❌ 没有记录: {sys.argv[3]}")
+    elif command == "stats":
+        print(f"📊 记录总数: {index.count()}")
+        print(f"📋 未合并: {len(index.get_unmerged_downloads())}")
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
+
+    index.close()
@@ -0,0 +1,383 @@
+"""
+下载记录日志存储 - 追加写入，定期压缩
+
+原来每次下载都要把整个 logs/downloads/{account}_downloads.json 读出来再整体写回，
+记录越多写入越慢。这里改为：
+
+  logs/downloads/{account}_downloads.json    快照（格式不变，仍然是 {"account", "downloads"}）
+  logs/downloads/{account}_downloads.jsonl   日志（每行一个事件，只追加）
+
+写入只追加一行，和历史长度无关；日志超过阈值后合并回快照（压缩）。
+日志的第一行是 {"op": "journal", "id": ...}；压缩时快照里记下吸收到了哪个日志的第几个字节
+（"journal": {"id", "offset"}），写完快照、删日志之前崩溃的话，重放时跳过已经吸收的事件，不会重复。
+读取 = 快照 + 重放日志，对外提供和 Logger 相同的读取接口。
+如果已经建立了 SQLite 索引（download_index.py），每个事件也会同步写进索引；
+快照被外部改过（和索引里记的大小/修改时间对不上）时，先从当前记录重新同步索引再查询。
+如果已经建立了 seen 集合（seen_shortcodes.py），下载成功的 shortcode 也会加进去，删除记录时一并删掉。
+未合并的记录另外由 unmerged_cursor.py 维护，查询只和积压数量有关。
+
+用法:
+  python download_journal.py compact ai_vanvan    # 手动压缩
+  python download_journal.py stats ai_vanvan      # 查看快照/日志大小
+"""
+import json
+import os
+import sys
+import uuid
+from datetime import datetime
+
+from download_index import DownloadIndex, index_path
+from record_writer import FileLock, write_json_atomic
+from seen_shortcodes import CACHE_DIR, SeenShortcodes
+from unmerged_cursor import UnmergedCursor
+
+DOWNLOAD_LOG_DIR = "logs/downloads"
+COMPACT_THRESHOLD = 500  # 日志超过这么多行就自动压缩
+
+
+class DownloadJournal:
+    """单个账号的下载记录（快照 + 追加日志）"""
+
+    def __init__(self, account_name, log_dir=DOWNLOAD_LOG_DIR, compact_threshold=COMPACT_THRESHOLD,
+                 index=None, seen=None):
+        self.account_name = account_name
+        self.log_dir = log_dir
+        self.compact_threshold = compact_threshold
+        self.snapshot_file = os.path.join(log_dir, f"{account_name}_downloads.json")
+        self.journal_file = os.path.join(log_dir, f"{account_name}_downloads.jsonl")
+        self._journal_lines = None
+
+        # 索引已导入过才同步，没有索引时行为和以前一样
+        if index is None and os.path.exists(index_path(account_name, log_dir)):
+            index = DownloadIndex(account_name, log_dir=log_dir)
+        self.index = index
+
+        if seen is None and os.path.exists(os.path.join(CACHE_DIR, f"{account_name}_seen.bin")):
+            seen = SeenShortcodes(account_name)
+        self.seen = seen
+        self.cursor = UnmergedCursor(account_name, self.snapshot_file, log_dir)
+        # 追加和压缩共用一把跨进程锁，压缩时不会丢掉别的进程刚追加的事件
+        self.lock = FileLock(self.snapshot_file)
+
+    # ------------------------------------------------------------------
+    # 写入（只追加）
+    # ------------------------------------------------------------------
+
+    def _append_event(self, event):
+        """追加一个事件到日志，必要时触发压缩"""
+        os.makedirs(self.log_dir, exist_ok=True)
+        event.setdefault("ts", datetime.now().isoformat())
+        line = json.dumps(event, ensure_ascii=False)
+        with self.lock:
+            new_journal = not os.path.exists(self.journal_file) or os.path.getsize(self.journal_file) == 0
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                if new_journal:
+                    f.write(json.dumps({"op": "journal", "id": uuid.uuid4().hex}) + "\n")
+                f.write(line + "\n")
+                f.flush()
+
+            if self.index is not None:
+                self._apply_to_index(event)
+            self.cursor.apply_event(event)
+
+        self._journal_lines = self._count_journal_lines() if self._journal_lines is None else self._journal_lines + 1
+        if self.compact_threshold and self._journal_lines >= self.compact_threshold:
+            self.compact()
+
+    def add_download(self, shortcode, status="success", file_path="", error="",
+                     blogger_name="unknown", download_folder=None, **extra):
+        """记录一次下载（字段和原 downloads.json 条目一致）"""
+        record = {
+            "shortcode": shortcode,
+            "download_time": datetime.now().isoformat(),
+            "status": status,
+            "file_path": file_path,
+            "error": error,
+            "merged": False,
+            "download_folder": download_folder if download_folder is not None else file_path,
+            "blogger_name": blogger_name,
+        }
+        record.update(extra)
+        self._append_event({"op": "add", "record": record})
+        if self.seen is not None and status == "success":
+            self.seen.add(shortcode)
+        return record
+
+    def update(self, shortcode, **fields):
+        """更新某个 shortcode 的字段（所有同名条目）"""
+        self._append_event({"op": "update", "shortcode": shortcode, "fields": fields})
+
+    def mark_merged(self, shortcodes):
+        """标记一批视频为已合并"""
+        shortcodes = list(shortcodes)
+        if shortcodes:
+            self._append_event({"op": "merged", "shortcodes": shortcodes})
+
+    def remove(self, shortcodes):
+        """删除一批记录，返回删除条数"""
+        targets = set(shortcodes)
+        if not targets:
+            return 0
+        return self._remove_where(lambda d: d.get("shortcode") in targets)
+
+    def remove_by_date(self, date_str):
+        """删除指定日期（YYYY-MM-DD）的下载记录，返回删除条数"""
+        return self._remove_where(lambda d: d.get("download_time", "").startswith(date_str))
+
+    def _remove_where(self, match):
+        """
+        删除是破坏性的：加锁直接重写快照（不追加事件），索引在同一把锁里同步删除。
+        这样删掉的记录不会因为日志压缩顺序、或者别的进程正在追加而又出现。
+        """
+        removed = []
+
+        def drop(data):
+            keep = []
+            for d in data.get("downloads", []):
+                (removed if match(d) else keep).append(d)
+            data["downloads"] = keep
+            if removed and self.index is not None:
+                gone = {d["shortcode"] for d in removed if d.get("shortcode")}
+                self.index.remove(gone)
+                # 同一个 shortcode 在别的日期还有记录时，索引里换成剩下的那条
+                self.index.upsert_many([d for d in keep if d.get("shortcode") in gone])
+            if removed and self.seen is not None:
+                still_seen = {d.get("shortcode") for d in keep if d.get("status") == "success"}
+                self.seen.remove({d["shortcode"] for d in removed if d.get("shortcode")} - still_seen)
+
+        self.rewrite(drop)
+        return len(removed)
+
+    # ------------------------------------------------------------------
+    # 读取（快照 + 重放）
+    # ------------------------------------------------------------------
+
+    def _load_snapshot(self):
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {"account": self.account_name, "downloads": []}
+
+    def _iter_events(self, absorbed=None):
+        """
+        日志里的事件。absorbed 是快照里记的 {"id", "offset"}：同一个日志文件
+        offset 之前的事件已经压缩进快照了（压缩后删日志之前崩溃留下的），跳过
+        """
+        if not os.path.exists(self.journal_file):
+            return
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # 进程写到一半被杀掉时最后一行可能不完整，跳过即可
+                    continue
+                if event.get("op") == "journal":
+                    if absorbed and event.get("id") == absorbed.get("id"):
+                        f.seek(absorbed["offset"])
+                    continue
+                yield event
+
+    def _journal_position(self):
+        """当前日志的 {"id", "offset"}（offset 是文件长度）；没有日志或旧日志没有头返回 None"""
+        if not os.path.exists(self.journal_file):
+            return None
+        with open(self.journal_file, 'rb') as f:
+            try:
+                header = json.loads(f.readline())
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                return None
+            if not isinstance(header, dict) or header.get("op") != "journal":
+                return None
+            return {"id": header.get("id"), "offset": os.fstat(f.fileno()).st_size}
+
+    @staticmethod
+    def _apply_event(downloads, event):
+        """把一个事件应用到 downloads 列表上，返回新的列表"""
+        op = event.get("op")
+        if op == "add":
+            downloads.append(event["record"])
+        elif op == "update":
+            for d in downloads:
+                if d.get("shortcode") == event["shortcode"]:
+                    d.update(event.get("fields", {}))
+        elif op == "merged":
+            targets = set(event.get("shortcodes", []))
+            for d in downloads:
+                if d.get("shortcode") in targets:
+                    d["merged"] = True
+        elif op == "remove":
+            targets = set(event.get("shortcodes", []))
+            downloads = [d for d in downloads if d.get("shortcode") not in targets]
+        elif op == "remove_date":
+            date_str = event["date"]
+            downloads = [d for d in downloads if not d.get("download_time", "").startswith(date_str)]
+        return downloads
+
+    def _apply_to_index(self, event):
+        """把事件同步到 SQLite 索引"""
+        op = event.get("op")
+        if op == "add":
+            self.index.upsert(event["record"])
+        elif op == "update":
+            self.index.update(event["shortcode"], **event.get("fields", {}))
+        elif op == "merged":
+            self.index.mark_merged(event.get("shortcodes", []))
+        elif op == "remove":
+            self.index.remove(event.get("shortcodes", []))
+        elif op == "remove_date":
+            self.index.delete_by_date(event["date"])
+
+    def load(self):
+        """读取完整数据（和原 downloads.json 结构相同）"""
+        data = self._load_snapshot()
+        absorbed = data.pop("journal", None)
+        downloads = data.get("downloads", [])
+        for event in self._iter_events(absorbed):
+            downloads = self._apply_event(downloads, event)
+        data["downloads"] = downloads
+        return data
+
+    def get_downloads(self):
+        return self.load().get("downloads", [])
+
+    def get_all_downloads(self):
+        """在线记录 + 已归档的月份（record_archive.py，按需解压）"""
+        from record_archive import RecordArchive
+
+        archived = list(RecordArchive(self.account_name).iter_records("downloads"))
+        return archived + self.get_downloads()
+
+    def get_table(self):
+        """紧凑的列式下载记录（record_model.py），内存只有 dict 列表的一小部分"""
+        from record_model import load_download_table
+
+        return load_download_table(self.account_name, self.log_dir)
+
+    def _snapshot_stamp(self):
+        if not os.path.exists(self.snapshot_file):
+            return [0, 0]
+        st = os.stat(self.snapshot_file)
+        return [st.st_size, st.st_mtime_ns]
+
+    def sync_index(self):
+        """加锁用当前记录整表重建索引，返回条数"""
+        with self.lock:
+            return self.index.sync(self.get_downloads(), self._snapshot_stamp())
+
+    def _fresh_index(self):
+        """可以直接查询的索引：快照被外部改过时先重新同步；没有索引返回 None"""
+        if self.index is None:
+            return None
+        if self.index.snapshot_stamp() != self._snapshot_stamp():
+            self.sync_index()
+        return self.index
+
+    def get_unmerged_downloads(self):
+        """获取未合并的成功下载（与 Logger.get_unmerged_downloads 相同）"""
+        items = self.cursor.load()
+        if items is not None:
+            return items
+
+        # 游标不存在或已失效：完整计算一次并重建游标
+        index = self._fresh_index()
+        if index is not None:
+            downloads = index.get_unmerged_downloads()
+        else:
+            downloads = self.get_downloads()
+        return self.cursor.rebuild(downloads)
+
+    def merge_status(self):
+        """/merge/status/<account> 需要的数据"""
+        unmerged = self.get_unmerged_downloads()
+        return {
+            "account": self.account_name,
+            "unmerged_count": len(unmerged),
+            "unmerged": unmerged,
+        }
+
+    def is_downloaded(self, shortcode):
+        from record_archive import RecordArchive
+
+        # 先查在线记录（有索引查索引），没找到再查归档
+        index = self._fresh_index()
+        if index is not None:
+            if index.is_downloaded(shortcode):
+                return True
+        elif any(d.get("shortcode") == shortcode and d.get("status") == "success" for d in self.get_downloads()):
+            return True
+        return RecordArchive(self.account_name).has_downloaded(shortcode)
+
+    # ------------------------------------------------------------------
+    # 压缩
+    # ------------------------------------------------------------------
+
+    def _count_journal_lines(self):
+        if not os.path.exists(self.journal_file):
+            return 0
+        with open(self.journal_file, 'rb') as f:
+            return sum(1 for _ in f)
+
+    def rewrite(self, mutator=None):
+        """
+        加锁重写快照：快照 + 日志 → mutator(data) → 新快照，然后清空日志。
+        mutator 为 None 时就是普通的压缩。
+        """
+        with self.lock:
+            data = self.load()
+            position = self._journal_position()
+            unmerged = self.cursor.load()
+            index_fresh = self.index is not None and self.index.snapshot_stamp() == self._snapshot_stamp()
+            if mutator is not None:
+                mutator(data)
+            # 快照里记下吸收到日志的哪里：下面删日志之前崩溃，重放时也不会重复这些事件
+            write_json_atomic(self.snapshot_file, {**data, "journal": position} if position else data)
+            if index_fresh:
+                # 快照是自己重写的，索引已经随事件同步过，只更新时间戳
+                self.index.set_snapshot_stamp(self._snapshot_stamp())
+
+            if mutator is None and unmerged is not None:
+                # 内容没变，只是快照文件重写了，更新游标里的时间戳
+                self.cursor.save(unmerged)
+            elif mutator is not None:
+                self.cursor.invalidate()
+
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+            self._journal_lines = 0
+        return data
+
+    def compact(self):
+        """把日志合并进快照，然后清空日志"""
+        return len(self.rewrite().get("downloads", []))
+
+    def stats(self):
+        return {
+            "snapshot_bytes": os.path.getsize(self.snapshot_file) if os.path.exists(self.snapshot_file) else 0,
+            "journal_bytes": os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0,
+            "journal_events": self._count_journal_lines(),
+        }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    command, account = sys.argv[1], sys.argv[2]
+    journal = DownloadJournal(account)
+
+    if command == "compact":
+        total = journal.compact()
+        print(f"✅ 压缩完成: {journal.snapshot_file} ({total} 条记录)")
+    elif command == "stats":
+        stats = journal.stats()
+        print(f"📄 快照: {stats['snapshot_bytes'] / 1024:.1f} KB")
+        print(f"📝 日志: {stats['journal_bytes'] / 1024:.1f} KB ({stats['journal_events']} 个事件)")
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
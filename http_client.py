@@ -0,0 +1,170 @@
+"""
+共享 HTTP 客户端 - 连接池 + keep-alive + 重试预算 + 默认超时
+
+run_full_workflow.call_api、ContainerTester、trigger_/test_ 脚本以前都直接 requests.post，
+每次请求新建一个 TCP 连接；没写 timeout 的请求服务卡住就一直等。
+gateway 转发到各个服务（/merge → merger:8000）也是一样。
+
+这里所有调用共用一个 requests.Session：
+  - 连接池 + keep-alive：同一个 host 的连接复用，不再每次握手、留下一堆 TIME_WAIT
+  - 默认超时 (连接 5 秒, 读取 60 秒)，调用时传 timeout 可以覆盖
+  - 连接失败（请求还没发出去）任何方法都重试；502/503/504 和读超时只对 GET 等幂等请求重试，
+    POST 提交任务不会被自动重复提交
+  - 重试预算：重试次数不超过最近请求数的 20%（另有每秒 1 次保底），
+    服务整体挂掉时不会被重试放大流量
+
+用法:
+    import http_client
+    response = http_client.post(f"{API_BASE}/merger/merge", json=payload)
+
+    merger = http_client.HttpClient("http://merger:8000")      # gateway 转发
+    response = merger.post("/merge", json=request.get_json())
+"""
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = (5, 60)  # (连接, 读取) 秒
+DEFAULT_POOL_SIZE = 16
+DEFAULT_RETRIES = 2
+RETRY_STATUSES = (502, 503, 504)
+
+
+class RetryBudget:
+    """
+    令牌桶：每个请求存入 ratio 个令牌，每次重试取出 1 个；
+    另外每秒补充 min_per_second 个，保证请求很少时也能重试。
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=1.0, window=10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max(1.0, min_per_second * window)
+        self._tokens = self.max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """取出一次重试的额度，没有额度返回 False"""
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class BudgetRetry(Retry):
+    """每次重试先从 RetryBudget 里取额度，取不到就不再重试"""
+
+    def __init__(self, *args, budget=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.budget = budget
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.budget = self.budget
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        if self.budget is not None and not self.budget.withdraw():
+            raise MaxRetryError(_pool, url, error or ResponseError("重试预算已用完"))
+        return retry
+
+
+class PooledAdapter(HTTPAdapter):
+    """带默认超时的连接池；每个请求向重试预算存入额度"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, budget=None, **kwargs):
+        self.timeout = timeout
+        self.budget = budget
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        if self.budget is not None:
+            self.budget.deposit()
+        return super().send(request, timeout=timeout if timeout is not None else self.timeout, **kwargs)
+
+
+def build_session(pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT,
+                  backoff=0.3, budget=None):
+    """新建一个带连接池、重试和默认超时的 Session"""
+    budget = budget or RetryBudget()
+    retry = BudgetRetry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        raise_on_status=False,
+        budget=budget,
+    )
+    adapter = PooledAdapter(timeout=timeout, budget=budget, pool_connections=pool_size,
+                            pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """进程内共用的 Session（第一次调用时创建）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def request(method, url, **kwargs):
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url, params=None, **kwargs):
+    return get_session().get(url, params=params, **kwargs)
+
+
+def post(url, data=None, json=None, **kwargs):
+    return get_session().post(url, data=data, json=json, **kwargs)
+
+
+def delete(url, **kwargs):
+    return get_session().delete(url, **kwargs)
+
+
+class HttpClient:
+    """固定 base_url 的客户端，例如 gateway 转发到某个服务"""
+
+    def __init__(self, base_url, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.session = session or get_session()
+
+    def request(self, method, path, **kwargs):
+        return self.session.request(method, f"{self.base_url}{path}", **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
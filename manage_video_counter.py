@@ -6,22 +6,31 @@
   python manage_video_counter.py get              # 查询当前编号
   python manage_video_counter.py set 125          # 设置为125（下次上传会是#126）
   python manage_video_counter.py reset            # 重置为0
+
+本地脚本的编号由 upload_numbers.py 分配；set / reset 会同时更新 biliup 计数器和本地分配器。
+upload 走 /api/biliup/upload 的 auto_number：服务端用 numbered_upload.py 从同一个
+upload_numbers 分配器预留编号再入队，和本地脚本同时上传也不会拿到同一个 #N。
 """
 
 import sys
-import requests
+import http_client
+
+from upload_numbers import get_allocator
 
 API_BASE = "http://localhost:8080"
 ACCOUNT = "ai_vanvan"
 
 def get_counter():
     """查询当前计数"""
-    response = requests.get(f"{API_BASE}/api/biliup/counter")
+    response = http_client.get(f"{API_BASE}/api/biliup/counter")
     if response.status_code == 200:
         data = response.json()
         current = data['current_number']
         print(f"当前计数: {current}")
         print(f"下次上传视频编号将是: #{current + 1}")
+        local_next = get_allocator().peek(ACCOUNT)
+        if local_next != current + 1:
+            print(f"⚠️  本地分配器的下一个编号是 #{local_next}，和 biliup 计数器不一致")
         return current
     else:
         print(f"错误: {response.text}")
@@ -29,11 +38,12 @@ def get_counter():
 
 def set_counter(value):
     """设置计数器"""
-    response = requests.post(
+    response = http_client.post(
         f"{API_BASE}/api/biliup/counter",
         json={"account": ACCOUNT, "value": value}
     )
     if response.status_code == 200:
+        get_allocator().set_last_number(ACCOUNT, value)
         print(f"✅ 计数器已设置为: {value}")
         print(f"下次上传视频编号将是: #{value + 1}")
     else:
@@ -41,11 +51,12 @@ def set_counter(value):
 
 def reset_counter():
     """重置计数器"""
-    response = requests.delete(
+    response = http_client.delete(
         f"{API_BASE}/api/biliup/counter",
         json={"account": ACCOUNT}
     )
     if response.status_code == 200:
+        get_allocator().set_last_number(ACCOUNT, 0)
         print(f"✅ 计数器已重置")
         print(f"下次上传视频编号将是: #1")
     else:
@@ -59,7 +70,7 @@ def upload_with_auto_number(video_path, **kwargs):
         "auto_number": True,
         **kwargs
     }
-    response = requests.post(f"{API_BASE}/api/biliup/upload", json=payload)
+    response = http_client.post(f"{API_BASE}/api/biliup/upload", json=payload)
     if response.status_code == 200:
         data = response.json()
         task = data['task']
@@ -3,10 +3,11 @@
 只保留最后 4 个视频为未合并状态
 """
 import os
-import json
 import glob
 from datetime import datetime
 
+from merge_index import MergeIndex
+
 def mark_old_videos_as_merged():
     """标记旧视频为已合并，只保留最后 4 个为未合并"""
     
@@ -54,14 +55,10 @@ def mark_old_videos_as_merged():
     
     # 加载或创建合并记录
     merged_record_file = f"logs/merges/{account_name}_merged_record.json"
-    os.makedirs(os.path.dirname(merged_record_file), exist_ok=True)
-    
+    merge_index = MergeIndex(account_name)
     if os.path.exists(merged_record_file):
-        with open(merged_record_file, 'r', encoding='utf-8') as f:
-            record = json.load(f)
-        print(f"\n📝 加载现有记录：{len(record.get('merged_videos', []))} 条")
+        print(f"\n📝 加载现有记录：{len(merge_index.outputs)} 条")
     else:
-        record = {"merged_videos": []}
         print(f"\n📝 创建新记录文件")
     
     # 创建合并记录（标记为已合并）
@@ -73,11 +70,8 @@ def mark_old_videos_as_merged():
         "note": f"手动标记为已合并（保留最后{keep_unmerged}个为未合并）"
     }
     
-    record["merged_videos"].append(merge_info)
-    
-    # 保存记录
-    with open(merged_record_file, 'w', encoding='utf-8') as f:
-        json.dump(record, f, ensure_ascii=False, indent=2)
+    # 保存记录（加锁追加，同时更新反向索引）
+    merge_index.add_merge(merge_info)
     
     print(f"\n✅ 已标记 {len(videos_to_mark)} 个视频为'已合并'")
     print(f"📝 记录文件: {merged_record_file}")
@@ -3,10 +3,11 @@
 这样系统会跳过这些视频，不会重复合并
 """
 import os
-import json
 import glob
 from datetime import datetime
 
+from merge_index import MergeIndex
+
 def mark_videos_as_merged():
     """标记今天下载的 YouTube 视频为已合并"""
     
@@ -33,13 +34,6 @@ def mark_videos_as_merged():
     
     # 加载或创建合并记录
     merged_record_file = f"logs/merges/{account_name}_merged_record.json"
-    os.makedirs(os.path.dirname(merged_record_file), exist_ok=True)
-    
-    if os.path.exists(merged_record_file):
-        with open(merged_record_file, 'r', encoding='utf-8') as f:
-            record = json.load(f)
-    else:
-        record = {"merged_videos": []}
     
     # 创建一个虚拟的合并记录
     merge_info = {
@@ -50,11 +44,8 @@ def mark_videos_as_merged():
         "note": "手动标记为已合并（测试视频）"
     }
     
-    record["merged_videos"].append(merge_info)
-    
-    # 保存记录
-    with open(merged_record_file, 'w', encoding='utf-8') as f:
-        json.dump(record, f, ensure_ascii=False, indent=2)
+    # 保存记录（加锁追加，同时更新反向索引）
+    MergeIndex(account_name).add_merge(merge_info)
     
     print(f"\n✅ 已标记 {len(video_files)} 个视频为'已合并'")
     print(f"📝 记录文件: {merged_record_file}")
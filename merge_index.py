@@ -0,0 +1,190 @@
+"""
+合并反向索引 - 输入视频 -> 合并记录
+
+is_video_merged 以前要遍历每条合并记录的 input_videos，143 次合并 × 15 个视频，
+检查一天的视频就是平方级。这里在合并记录旁边维护：
+
+  logs/merges/{account}_merged_record.json   合并记录（不变）
+  logs/merges/{account}_merged_index.json    反向索引 {视频ID: [合并序号, ...]}
+
+视频 ID 用 path_table.canonical_path（账号相对 ID），不管记录里是什么写法都能命中。
+已经归档（record_archive.py）的合并记录也包含在索引里，合并序号 = archived_count + 在线下标。
+同一个视频可能被合并过多次（重新合并、补合并），每个视频记下所有合并序号，
+pop_last_merge 只去掉最后那一次，之前的合并照样查得到。
+索引里保存了合并记录文件的大小和修改时间；记录被别的程序改过
+（例如 rollback_tool 在容器里 pop 掉最后一条），下次加载会自动重建。
+
+用法:
+  python merge_index.py rebuild ai_vanvan
+  python merge_index.py check ai_vanvan videos/downloads/ai_vanvan/2025-10-14/xxx.mp4
+"""
+import json
+import os
+import sys
+
+from path_table import canonical_path, local_path, merge_input_ids
+from record_writer import update_json_record
+
+MERGE_LOG_DIR = "logs/merges"
+INDEX_VERSION = 2  # 1: 视频ID -> 单个合并序号
+
+
+class MergeIndex:
+    """单个账号的合并反向索引"""
+
+    def __init__(self, account_name, log_dir=MERGE_LOG_DIR):
+        self.account_name = account_name
+        self.record_file = os.path.join(log_dir, f"{account_name}_merged_record.json")
+        self.index_file = os.path.join(log_dir, f"{account_name}_merged_index.json")
+        self.clips = {}    # 视频ID -> [合并序号, ...]（merged_videos 里的下标，从小到大）
+        self.outputs = []  # 合并序号 -> 输出文件
+        self.load()
+
+    def _record_stamp(self):
+        if not os.path.exists(self.record_file):
+            return [0, 0]
+        st = os.stat(self.record_file)
+        return [st.st_size, st.st_mtime_ns]
+
+    def _load_record(self):
+        if os.path.exists(self.record_file):
+            with open(self.record_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {"merged_videos": []}
+
+    def save(self):
+        tmp_file = self.index_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": INDEX_VERSION,
+                "record": self._record_stamp(),
+                "outputs": self.outputs,
+                "clips": self.clips,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_file, self.index_file)
+
+    def load(self):
+        """加载索引；合并记录被外部改过就重建"""
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == INDEX_VERSION and data.get("record") == self._record_stamp():
+                    self.clips = data.get("clips", {})
+                    self.outputs = data.get("outputs", [])
+                    return
+            except (json.JSONDecodeError, OSError):
+                pass
+        self.rebuild()
+
+    def rebuild(self):
+        from record_archive import RecordArchive
+
+        record = self._load_record()
+        self.clips = {}
+        self.outputs = []
+        entries = list(RecordArchive(self.account_name).iter_records("merges")) if record.get("archived_count") else []
+        entries.extend(record.get("merged_videos", []))
+        for merge_id, entry in enumerate(entries):
+            self.outputs.append(entry.get("output_file", ""))
+            self._add_clips(entry, merge_id)
+        self.save()
+        return len(self.clips)
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def lookup(self, video_path):
+        """返回最近一次合并的 (合并序号, 输出文件)，没合并过返回 None"""
+        merge_ids = self.clips.get(canonical_path(video_path, self.account_name))
+        if not merge_ids:
+            return None
+        return merge_ids[-1], self.outputs[merge_ids[-1]]
+
+    def is_video_merged(self, video_path):
+        return canonical_path(video_path, self.account_name) in self.clips
+
+    # ------------------------------------------------------------------
+    # 更新（合并记录和索引一起改）
+    # ------------------------------------------------------------------
+
+    def add_merge(self, merge_info):
+        """追加一条合并记录（加锁写入，多个合并进程不会互相覆盖）"""
+        def append(record):
+            record.setdefault("merged_videos", []).append(merge_info)
+            return record.get("archived_count", 0) + len(record["merged_videos"]) - 1
+
+        merge_id = update_json_record(self.record_file, append, default={"merged_videos": []})
+        if merge_id != len(self.outputs):
+            # 索引和记录对不上（中间有人改过记录），直接重建
+            self.rebuild()
+            self._register_output(merge_info)
+            return merge_id
+        self.outputs.append(merge_info.get("output_file", ""))
+        self._add_clips(merge_info, merge_id)
+        self.save()
+        self._register_output(merge_info)
+        return merge_id
+
+    def _add_clips(self, entry, merge_id):
+        for clip_id in merge_input_ids(entry, self.account_name):
+            merge_ids = self.clips.setdefault(clip_id, [])
+            if merge_id not in merge_ids:
+                merge_ids.append(merge_id)
+
+    def _register_output(self, merge_info):
+        """把编号输出文件登记到 merged_outputs 索引（上传脚本按编号直接查）"""
+        from merged_outputs import MergedOutputs
+
+        output_id = canonical_path(merge_info.get("output_file", ""), self.account_name)
+        if output_id.startswith("merged/"):
+            MergedOutputs(self.account_name).add_output(
+                local_path(output_id, self.account_name), merge_info.get("duration"))
+
+    def pop_last_merge(self):
+        """删除最后一条合并记录（回退用），返回被删除的记录"""
+        def pop(record):
+            if not record.get("merged_videos"):
+                return None
+            last = record["merged_videos"].pop()
+            return last, record.get("archived_count", 0) + len(record["merged_videos"])
+
+        popped = update_json_record(self.record_file, pop, default={"merged_videos": []})
+        if popped is None:
+            return None
+        last, merge_id = popped
+        # 只去掉这次合并；同一个视频更早的合并还在
+        clips = {}
+        for clip_id, merge_ids in self.clips.items():
+            merge_ids = [i for i in merge_ids if i < merge_id]
+            if merge_ids:
+                clips[clip_id] = merge_ids
+        self.clips = clips
+        del self.outputs[merge_id:]
+        self.save()
+        return last
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    command, account = sys.argv[1], sys.argv[2]
+    index = MergeIndex(account)
+
+    if command == "rebuild":
+        count = index.rebuild()
+        print(f"✅ 索引已重建: {count} 个视频, {len(index.outputs)} 次合并 ({index.index_file})")
+    elif command == "check":
+        for video in sys.argv[3:]:
+            found = index.lookup(video)
+            if found:
+                print(f"✅ 已合并: {os.path.basename(video)} → #{found[0]} {found[1]}")
+            else:
+                print(f"❌ 未合并: {os.path.basename(video)}")
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,229 @@
+"""
+合并输出索引 - (前缀, 编号) -> 文件
+
+upload_next_video.py / smart_upload.py 以前要 glob videos/merged/{account}/ins海外离大谱#*.mp4，
+再从每个文件名里解析 #N（洋了二正#3.mp4 这类也一样），才能知道最新编号、某个编号的文件在不在。
+这里维护 logs/merges/{account}_outputs_index.json：
+
+  {"前缀#编号": {"file": 文件名, "size": 字节, "duration": 秒, "created": 时间}}
+
+  - 同一个目录里不同前缀的系列（ins海外离大谱#3、洋了二正#3）编号各算各的，互不覆盖；
+    查询默认查 ins海外离大谱，别的系列传 prefix=
+  - 合并完成后 MergeIndex.add_merge 会调用 add_output() 直接登记（只读已保存的索引，不扫目录，
+    也不更新记下的目录修改时间：目录里还没登记的文件下次查询时照样会扫到）
+  - 第一次查询时才加载索引；合并目录的修改时间变了（手动改名/删除/复制进来的文件）
+    才重新扫一次目录，而且只对新文件调用 ffprobe 取时长
+"最新"、"下一个"、"#N 在不在"都是直接查表。
+
+用法:
+  python merged_outputs.py list ai_vanvan
+  python merged_outputs.py check ai_vanvan 210
+  python merged_outputs.py rebuild ai_vanvan
+"""
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from datetime import datetime
+
+MERGED_DIR = "videos/merged"
+MERGE_LOG_DIR = "logs/merges"
+OUTPUT_PATTERN = re.compile(r"^(.*)#(\d+)\.mp4$")
+DEFAULT_PREFIX = "ins海外离大谱"
+LOCAL_FFPROBE = "tools/ffmpeg/ffprobe.exe"
+
+
+def output_key(filename):
+    """ins海外离大谱#210.mp4 -> ("ins海外离大谱", 210)；不是编号文件返回 None"""
+    match = OUTPUT_PATTERN.search(os.path.basename(str(filename).replace("\\", "/")))
+    return (match.group(1), int(match.group(2))) if match else None
+
+
+def output_number(filename):
+    """ins海外离大谱#210.mp4 -> 210；不是编号文件返回 None"""
+    key = output_key(filename)
+    return key[1] if key else None
+
+
+def probe_duration(path):
+    """ffprobe 取时长（秒），没有 ffprobe 或失败返回 None"""
+    ffprobe = LOCAL_FFPROBE if os.path.exists(LOCAL_FFPROBE) else shutil.which("ffprobe")
+    if not ffprobe:
+        return None
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "json", path],
+            capture_output=True, text=True, timeout=30,
+        )
+        return round(float(json.loads(result.stdout)["format"]["duration"]), 2)
+    except (OSError, subprocess.SubprocessError, ValueError, KeyError):
+        return None
+
+
+class MergedOutputs:
+    """单个账号的合并输出索引"""
+
+    def __init__(self, account_name, merged_dir=MERGED_DIR, log_dir=MERGE_LOG_DIR):
+        self.account_name = account_name
+        self.output_dir = os.path.join(merged_dir, account_name)
+        self.index_file = os.path.join(log_dir, f"{account_name}_outputs_index.json")
+        self.dir_mtime = 0
+        self._outputs = None  # (前缀, 编号) -> {"file", "size", "duration", "created"}，第一次用到才加载
+        self._refreshed = False
+
+    @property
+    def outputs(self):
+        """查询用：加载已保存的索引，目录改过就重新扫一次（每个实例只检查一次）"""
+        if not self._refreshed:
+            self._refreshed = True
+            self.refresh()
+        return self._stored()
+
+    def _stored(self):
+        if self._outputs is None:
+            self.load()
+        return self._outputs
+
+    def load(self):
+        self.dir_mtime, self._outputs = 0, {}
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                outputs = {}
+                for key, info in data.get("outputs", {}).items():
+                    # 旧格式的键只有编号，文件名里有前缀
+                    parsed = output_key(info["file"]) if key.isdigit() else output_key(key + ".mp4")
+                    if parsed:
+                        outputs[parsed] = info
+                self.dir_mtime = data.get("dir_mtime", 0)
+                self._outputs = outputs
+            except (json.JSONDecodeError, OSError, ValueError, KeyError, AttributeError):
+                self.dir_mtime, self._outputs = 0, {}
+
+    def save(self, stamp_dir=True):
+        """
+        stamp_dir=True 只在刚扫完目录时用：记下目录 mtime，之后目录没变就不再扫。
+        只登记/删掉一个文件时不能更新，否则目录里其他还没登记的文件以后都扫不到
+        """
+        os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+        if stamp_dir and os.path.isdir(self.output_dir):
+            self.dir_mtime = os.stat(self.output_dir).st_mtime_ns
+        tmp_file = self.index_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "dir_mtime": self.dir_mtime,
+                "outputs": {f"{prefix}#{n}": info for (prefix, n), info in sorted(self._stored().items())},
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.index_file)
+
+    def _entry(self, path, duration=None):
+        st = os.stat(path)
+        return {
+            "file": os.path.basename(path),
+            "size": st.st_size,
+            "duration": duration if duration is not None else probe_duration(path),
+            "created": datetime.fromtimestamp(st.st_mtime).isoformat(timespec="seconds"),
+        }
+
+    def refresh(self):
+        """目录改过才重新扫描；已登记且大小没变的文件不再 ffprobe"""
+        if not os.path.isdir(self.output_dir):
+            return False
+        stored = self._stored()
+        if os.stat(self.output_dir).st_mtime_ns == self.dir_mtime:
+            return False
+
+        found = {}
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                key = output_key(entry.name)
+                if key is None or not entry.is_file():
+                    continue
+                known = stored.get(key)
+                if known and known["file"] == entry.name and known["size"] == entry.stat().st_size:
+                    found[key] = known
+                else:
+                    found[key] = self._entry(entry.path)
+        self._outputs = found
+        self.save()
+        return True
+
+    def rebuild(self):
+        self._outputs, self.dir_mtime = {}, 0
+        self._refreshed = True
+        self.refresh()
+        return len(self._outputs)
+
+    # ------------------------------------------------------------------
+    # 合并器调用
+    # ------------------------------------------------------------------
+
+    def add_output(self, path, duration=None):
+        """登记一个新生成的合并文件；不是编号文件返回 None"""
+        key = output_key(path)
+        if key is None or not os.path.exists(path):
+            return None
+        self._stored()[key] = self._entry(path, duration)
+        # 下次查询时目录 mtime 对不上会重新扫一次，登记过的文件大小没变不再 ffprobe
+        self.save(stamp_dir=False)
+        return key[1]
+
+    def remove_output(self, number, prefix=DEFAULT_PREFIX):
+        if self._stored().pop((prefix, number), None) is not None:
+            self.save(stamp_dir=False)
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def path(self, number, prefix=DEFAULT_PREFIX):
+        info = self.outputs.get((prefix, number))
+        return os.path.join(self.output_dir, info["file"]) if info else None
+
+    def exists(self, number, prefix=DEFAULT_PREFIX):
+        return (prefix, number) in self.outputs
+
+    def get(self, number, prefix=DEFAULT_PREFIX):
+        return self.outputs.get((prefix, number))
+
+    def latest_number(self, prefix=DEFAULT_PREFIX):
+        numbers = [n for p, n in self.outputs if p == prefix]
+        return max(numbers) if numbers else None
+
+    def next_number(self, prefix=DEFAULT_PREFIX):
+        """最新编号 + 1（真正上传时的编号以 upload_numbers 分配为准）"""
+        latest = self.latest_number(prefix)
+        return latest + 1 if latest is not None else None
+
+    def recent(self, count=5, prefix=DEFAULT_PREFIX):
+        """某个系列最近生成的几个文件 [(编号, 信息)]"""
+        items = [(n, info) for (p, n), info in self.outputs.items() if p == prefix]
+        return sorted(items, key=lambda item: item[1]["created"], reverse=True)[:count]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    command, account = sys.argv[1], sys.argv[2]
+    outputs = MergedOutputs(account)
+
+    if command == "list":
+        for (prefix, number), info in sorted(outputs.outputs.items()):
+            duration = f"{int(info['duration'] // 60)}:{int(info['duration'] % 60):02d}" if info["duration"] else "?"
+            print(f"#{number:<5} {info['file']:30} {duration:>6} {info['size'] / 1024 / 1024:8.2f} MB  {info['created']}")
+        print(f"共 {len(outputs.outputs)} 个，{DEFAULT_PREFIX} 最新 #{outputs.latest_number()}")
+    elif command == "check":
+        for arg in sys.argv[3:]:
+            path = outputs.path(int(arg))
+            print(f"✅ #{arg}: {path}" if path else f"❌ #{arg}: 不存在")
+    elif command == "rebuild":
+        print(f"✅ 索引已重建: {outputs.rebuild()} 个文件 ({outputs.index_file})")
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
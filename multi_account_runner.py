@@ -0,0 +1,255 @@
+"""
+多账号并行执行 - asyncio + 连接池
+
+以前每个账号都要单独跑一次 run_full_workflow.py / trigger_container_download.py，
+一个账号下载慢（ai_vanvan 每个请求间隔 45 秒），其他账号只能干等。
+
+这里用 asyncio 同时驱动 config/accounts.json 里的所有 Instagram 账号
+（scanner / downloader 只支持 Instagram，twitter、youtube 账号不在这里跑）：
+  - 每个账号一条独立的流水线：扫描 → 下载 → 标准化 → 合并 → 上传
+  - 每个账号自己的 download_safety 独立生效：
+      max_posts_per_session  限制扫描/下载数量
+      request_delay          本账号提交扫描任务和提交下载任务之间至少隔这么久；
+                             下载任务里每个帖子之间的间隔由下载服务自己控制，
+                             这个值只是随下载请求传过去，这里不保证它生效
+  - 所有请求共用一个 keep-alive 连接池（http_client.build_session，带重试预算）
+  - 标准化/合并是 CPU 密集型，全局最多同时跑 --heavy-slots 个
+  - 一个账号失败不影响其他账号
+
+用法:
+  python multi_account_runner.py                      # 所有 Instagram 账号
+  python multi_account_runner.py ai_vanvan aigf8728   # 指定账号
+  python multi_account_runner.py --upload -d 10 --heavy-slots 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from http_client import build_session
+from run_full_workflow import API_BASE, STAGE_LABELS, STAGE_TIMEOUTS, has_status, query_task_status
+from workflow_engine import DONE_STATUSES, FAILED_STATUSES, Stage
+
+ACCOUNTS_CONFIG = "config/accounts.json"
+PLATFORMS = ("instagram",)  # scanner / downloader 支持的平台
+HEAVY_STAGES = ("standardize", "merge")
+PLATFORM_STAGES = ("scan", "download")  # 会访问 Instagram 等平台的阶段
+
+
+class PooledClient:
+    """共享连接池的 HTTP 客户端；requests 是阻塞的，放到线程池里执行"""
+
+    def __init__(self, base_url=API_BASE, pool_size=16, timeout=10):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = build_session(pool_size=pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size)
+
+    async def request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, lambda: self.session.request(method, f"{self.base_url}{path}", **kwargs))
+
+    async def post_json(self, path, data):
+        response = await self.request("POST", path, json=data)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    async def call(self, fn, *args):
+        """在线程池里执行一个阻塞函数"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(*args))
+
+    async def get_json(self, path):
+        response = await self.request("GET", path)
+        if response.status_code != 200:
+            return None
+        return response.json()
+
+    def close(self):
+        self.session.close()
+        self._executor.shutdown(wait=False)
+
+
+def load_accounts(names=None, config_file=ACCOUNTS_CONFIG, platforms=PLATFORMS):
+    """读取账号配置；不指定账号时只返回 platforms 里的平台，指定了别的平台的账号报错"""
+    with open(config_file, 'r', encoding='utf-8') as f:
+        accounts = json.load(f)
+    if names:
+        missing = [n for n in names if n not in accounts]
+        if missing:
+            raise ValueError(f"config/accounts.json 里没有这些账号: {', '.join(missing)}")
+        unsupported = [n for n in names if accounts[n].get("platform", "instagram") not in platforms]
+        if unsupported:
+            raise ValueError(f"这些账号的平台不支持: {', '.join(unsupported)}（只支持 {' / '.join(platforms)}）")
+        return {n: accounts[n] for n in names}
+    return {n: c for n, c in accounts.items() if c.get("platform", "instagram") in platforms}
+
+
+class AccountPipeline:
+    """单个账号的流水线"""
+
+    def __init__(self, client, account, config, heavy_slots, download_limit=20, merge_count=15,
+                 resolution="1080x1920", upload=False):
+        self.client = client
+        self.account = account
+        self.config = config
+        self.heavy_slots = heavy_slots
+        safety = config.get("download_safety", {})
+        self.request_delay = safety.get("request_delay", 0)
+        max_posts = safety.get("max_posts_per_session")
+        self.download_limit = min(download_limit, max_posts) if max_posts else download_limit
+        self.scan_limit = min(50, max_posts) if max_posts else 50
+        self.merge_count = merge_count
+        self.resolution = resolution
+        self.upload = upload
+        self._last_platform_call = None
+        self.results = {}
+
+    def log(self, message):
+        print(f"[{self.account}] {message}", flush=True)
+
+    def stages(self):
+        stages = [
+            ("scan", "scanner", "/scanner/scan", {"account": self.account, "limit": self.scan_limit}),
+            ("download", "downloader", "/downloader/download", {
+                "account": self.account,
+                "max_downloads": self.download_limit,
+                "request_delay": self.request_delay,
+            }),
+            ("standardize", "standardizer", "/standardizer/process", {
+                "account": self.account, "resolution": self.resolution}),
+            ("merge", "merger", "/merger/merge", {"account": self.account, "limit": self.merge_count}),
+        ]
+        if self.upload:
+            stages.append(("upload", "uploader", "/uploader/upload", {"account": self.account, "video_path": None}))
+        return stages
+
+    async def _respect_delay(self):
+        """同一账号访问平台的间隔（只影响本账号）"""
+        if self._last_platform_call is not None:
+            wait = self.request_delay - (time.monotonic() - self._last_platform_call)
+            if wait > 0:
+                self.log(f"⏳ 按 request_delay 等待 {wait:.0f} 秒")
+                await asyncio.sleep(wait)
+        self._last_platform_call = time.monotonic()
+
+    async def _wait_task(self, name, service, task_id):
+        """和 run_full_workflow 用同一个状态查询（/tasks/<id>/wait + gateway 上真正存在的状态接口）"""
+        deadline = time.monotonic() + STAGE_TIMEOUTS[name]
+        interval = 0.5
+        stage = Stage(name, None, service=service)
+        while True:
+            info = await self.client.call(query_task_status, stage, task_id, self.account) or {}
+            status = str(info.get("status", "")).lower()
+            if status in DONE_STATUSES:
+                return info
+            if status in FAILED_STATUSES:
+                raise RuntimeError(info.get("error") or f"任务状态: {status}")
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"超时（{STAGE_TIMEOUTS[name]} 秒）")
+            await asyncio.sleep(min(interval, max(0.0, deadline - time.monotonic())))
+            interval = min(interval * 1.5, 5.0)
+
+    async def _run_stage(self, name, service, endpoint, payload):
+        label = STAGE_LABELS[name]
+        if name in PLATFORM_STAGES:
+            await self._respect_delay()
+        started = time.monotonic()
+        result = await self.client.post_json(endpoint, payload)
+        if result.get("status") != "success":
+            raise RuntimeError(result.get("error") or "API调用失败")
+        task_id = result.get("task_id")
+        self.log(f"📤 {label}任务已提交: {task_id}")
+        if task_id and has_status(name):
+            await self._wait_task(name, service, task_id)
+        elif task_id:
+            # 扫描、下载没有状态接口，和 run_full_workflow 一样提交即完成
+            self.log(f"ℹ️  {label}没有状态接口，提交后直接进入下一步")
+        elapsed = time.monotonic() - started
+        self.log(f"✅ {label}完成，耗时 {elapsed:.1f} 秒")
+        return {"status": "completed", "task_id": task_id, "elapsed": elapsed}
+
+    async def run(self):
+        for name, service, endpoint, payload in self.stages():
+            try:
+                if name in HEAVY_STAGES:
+                    async with self.heavy_slots:
+                        self.results[name] = await self._run_stage(name, service, endpoint, payload)
+                else:
+                    self.results[name] = await self._run_stage(name, service, endpoint, payload)
+            except Exception as e:
+                self.results[name] = {"status": "failed", "error": str(e)}
+                self.log(f"❌ {STAGE_LABELS[name]}失败: {e}，本账号流程终止")
+                return False
+        return True
+
+
+async def run_accounts(accounts, download_limit=20, merge_count=15, resolution="1080x1920",
+                       upload=False, heavy_slots=2, base_url=API_BASE):
+    """所有账号同时执行，返回 {账号: (是否成功, 各阶段结果)}"""
+    client = PooledClient(base_url, pool_size=max(4, len(accounts) * 2))
+    heavy = asyncio.Semaphore(heavy_slots)
+    pipelines = [
+        AccountPipeline(client, name, config, heavy, download_limit, merge_count, resolution, upload)
+        for name, config in accounts.items()
+    ]
+    for p in pipelines:
+        p.log(f"🚀 开始 (下载上限 {p.download_limit}, 请求间隔 {p.request_delay} 秒)")
+    try:
+        outcomes = await asyncio.gather(*(p.run() for p in pipelines), return_exceptions=True)
+    finally:
+        client.close()
+    return {
+        p.account: (outcome is True, p.results)
+        for p, outcome in zip(pipelines, outcomes)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多账号并行执行完整流程")
+    parser.add_argument("accounts", nargs="*", help="账号名（默认: config/accounts.json 里的所有 Instagram 账号）")
+    parser.add_argument("-d", "--download", type=int, default=20, help="每个账号下载数量上限 (默认: 20)")
+    parser.add_argument("-m", "--merge", type=int, default=15, help="合并视频数量 (默认: 15)")
+    parser.add_argument("-r", "--resolution", default="1080x1920", choices=["720x1280", "1080x1920"])
+    parser.add_argument("--upload", action="store_true", help="合并后自动上传到B站（默认不上传）")
+    parser.add_argument("--heavy-slots", type=int, default=max(1, (os.cpu_count() or 2) // 4),
+                        help="同时进行的标准化/合并数量")
+    args = parser.parse_args()
+
+    try:
+        accounts = load_accounts(args.accounts)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    start = time.time()
+    results = asyncio.run(run_accounts(
+        accounts,
+        download_limit=args.download,
+        merge_count=args.merge,
+        resolution=args.resolution,
+        upload=args.upload,
+        heavy_slots=args.heavy_slots,
+    ))
+
+    print("\n" + "=" * 70)
+    print(f"  多账号流程完成，总耗时 {time.time() - start:.1f} 秒")
+    print("=" * 70)
+    for account, (ok, stages) in results.items():
+        detail = ", ".join(
+            f"{STAGE_LABELS[n]} {r['elapsed']:.0f}s" if r["status"] == "completed" else f"{STAGE_LABELS[n]} 失败"
+            for n, r in stages.items()
+        )
+        print(f"  {'✅' if ok else '❌'} {account}: {detail}")
+
+    sys.exit(0 if all(ok for ok, _ in results.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+自动编号上传 - 从 upload_numbers 预留编号 + 生成标题 + 放进 biliup:queue
+
+/api/biliup/upload 的 auto_number 以前分三步：读 {账号}:video_counter、拼标题、推队列。
+两个上传（或者两个 uploader 副本）同时进来，读到的是同一个计数，就会出现两个 #N。
+
+编号只有一个来源：upload_numbers.py（videos/upload_numbers.db），和 smart_upload.py、
+upload_next_video.py、record_upload.py 用的是同一个分配器，自动编号和本地脚本同时上传也不会重号：
+  1. upload_numbers.reserve(账号)              预留编号（BEGIN IMMEDIATE，多进程不会拿到同一个）
+  2. 标题模板里的 {number} 换成编号            "ins海外离大谱#{number}" → "ins海外离大谱#125"
+  3. WorkQueue(biliup:queue).enqueue(task)     幂等键是 账号:video_path:编号
+入队失败、或者同一个任务已经在队列里时，编号还回去（release）；发出去了就确认（commit），
+和 smart_upload / upload_next_video 一样，上传成功后 record_upload.py 只是补记 BV 号。
+
+用法（uploader / gateway）:
+    number, task, message_id = enqueue_numbered_upload(redis_client, "/videos/ai_vanvan/merged.mp4")
+    app.register_blueprint(create_blueprint(redis_client), url_prefix="/api")   # POST /biliup/upload
+
+用法（命令行）:
+  python numbered_upload.py /videos/ai_vanvan/merged_20251104.mp4
+"""
+import sys
+
+import redis
+
+from upload_numbers import get_allocator
+from work_queue import WorkQueue
+
+REDIS_URL = "redis://localhost:6379"
+QUEUE = "biliup:queue"
+DEFAULT_ACCOUNT = "ai_vanvan"
+DEFAULT_TITLE = "ins海外离大谱#{number}"
+DEFAULT_TID = 138  # 生活 > 搞笑
+DEFAULT_TAG = "Instagram,搞笑,离大谱,海外,沙雕"
+
+
+def enqueue_numbered_upload(redis_client, video_path, account=DEFAULT_ACCOUNT, title_template=DEFAULT_TITLE,
+                            tid=DEFAULT_TID, tag=DEFAULT_TAG, numbers=None, **fields):
+    """
+    预留下一个编号并放进 biliup:queue，返回 (编号, 任务, 消息ID)。
+    同一个任务已经在队列里或已经处理过时消息ID是 None，编号已经还回去
+    """
+    numbers = numbers or get_allocator()
+    task = {"account": account, "video_path": video_path, "tid": tid, "tag": tag, **fields}
+    task = {key: value for key, value in task.items() if value is not None}
+    number = numbers.reserve(account)
+    task.update({"number": number, "title": title_template.replace("{number}", str(number))})
+    try:
+        message_id = WorkQueue(redis_client, QUEUE).enqueue(task)
+    except BaseException:
+        numbers.release(account, number)
+        raise
+    if message_id is None:
+        numbers.release(account, number)
+    else:
+        numbers.commit(account, number, title=task["title"])
+    return number, task, message_id
+
+
+def create_blueprint(redis_client, name="numbered_upload"):
+    """POST /biliup/upload：auto_number 为 true 时从分配器取编号，否则按给定的标题放进队列"""
+    from flask import Blueprint, jsonify, request
+
+    bp = Blueprint(name, __name__)
+
+    @bp.route("/biliup/upload", methods=["POST"])
+    def upload():
+        data = request.get_json(silent=True) or {}
+        if not data.get("video_path"):
+            return jsonify({"status": "error", "error": "缺少 video_path"}), 400
+        fields = {key: value for key, value in data.items() if key not in ("auto_number", "title")}
+        fields.setdefault("account", DEFAULT_ACCOUNT)
+        if data.get("auto_number"):
+            _, task, message_id = enqueue_numbered_upload(redis_client, **fields)
+        else:
+            if not data.get("title"):
+                return jsonify({"status": "error", "error": "缺少 title（或者传 auto_number: true）"}), 400
+            task = {"tid": DEFAULT_TID, "tag": DEFAULT_TAG, **fields, "title": data["title"]}
+            message_id = WorkQueue(redis_client, QUEUE).enqueue(task)
+        if message_id is None:
+            return jsonify({"status": "error", "error": "同一个任务已经在队列里或已经处理过"}), 409
+        return jsonify({"status": "success", "task": task})
+
+    return bp
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    number, task, message_id = enqueue_numbered_upload(redis.from_url(REDIS_URL), sys.argv[1])
+    if message_id is None:
+        print(f"⏭️  同一个上传任务已经在队列里或已经处理过，#{number} 已还回去")
+        sys.exit(1)
+    print(f"✅ 上传任务已添加: #{number}")
+    print(f"   标题: {task['title']}")
+    print(f"   视频: {task['video_path']}")
+    print(f"   分区: {task['tid']}")
+    print(f"   标签: {task['tag']}")
@@ -0,0 +1,207 @@
+"""
+路径规范化 - 账号相对 ID
+
+下载记录、合并记录里的路径混着好几种写法：
+  videos/downloads/ai_vanvan\\2025-08-25
+  videos\\downloads\\ai_vanvan\\2025-08-25
+  C:\\Code\\social-media-hub\\videos\\downloads\\ai_vanvan\\2025-08-25\\xxx.mp4
+  /app/downloads/ai_vanvan/2025-08-25/xxx.mp4          （容器内）
+每次比较都要重新处理字符串。这里统一成账号相对 ID：
+
+  downloads/2025-08-25/2025-08-24_10-00-00_UTC.mp4
+  merged/ins海外离大谱#210.mp4
+
+ID 都经过 sys.intern，相同路径在内存里只有一份。
+下载记录 / 合并记录 / 上传历史共用这套 ID。
+
+用法:
+  python path_table.py migrate ai_vanvan    # 给记录补上 *_id 字段（原字段保留）
+  python path_table.py stats ai_vanvan      # 查看路径重复情况
+"""
+import json
+import os
+import sys
+
+from record_writer import update_json_record
+
+KINDS = ("downloads", "standardized", "merged")
+MERGE_LOG_DIR = "logs/merges"
+UPLOAD_RECORD_FILE = "videos/upload_history.json"
+
+
+def canonical_path(path, account_name):
+    """任意写法的路径 -> 账号相对 ID（无法识别时返回统一成 / 的原路径）"""
+    if not path:
+        return ""
+    normalized = str(path).replace("\\", "/")
+    parts = [p for p in normalized.split("/") if p and p != "."]
+
+    # videos/downloads/{account}/... 、/app/downloads/{account}/... 等
+    for i in range(len(parts) - 1):
+        if parts[i] in KINDS and parts[i + 1] == account_name:
+            return sys.intern("/".join([parts[i]] + parts[i + 2:]))
+
+    # biliup 容器里 /videos/{account}/ 挂载的是 videos/merged/{account}/
+    if normalized.startswith("/") and len(parts) >= 2 and parts[0] == "videos" and parts[1] == account_name:
+        return sys.intern("/".join(["merged"] + parts[2:]))
+
+    return sys.intern("/".join(parts))
+
+
+def local_path(path_id, account_name, base_dir="videos"):
+    """账号相对 ID -> 本地相对路径（videos/downloads/{account}/...）"""
+    kind, _, rest = path_id.partition("/")
+    if kind not in KINDS:
+        return path_id
+    return "/".join(p for p in (base_dir, kind, account_name, rest) if p)
+
+
+class PathTable:
+    """路径 ID <-> 整数编号，给紧凑的记录模型用"""
+
+    def __init__(self, account_name):
+        self.account_name = account_name
+        self.ids = []
+        self._index = {}
+
+    def intern(self, path):
+        """返回路径对应的整数编号（同一路径只存一份）"""
+        path_id = canonical_path(path, self.account_name)
+        num = self._index.get(path_id)
+        if num is None:
+            num = len(self.ids)
+            self.ids.append(path_id)
+            self._index[path_id] = num
+        return num
+
+    def lookup(self, num):
+        return self.ids[num]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+# ----------------------------------------------------------------------
+# 合并记录
+# ----------------------------------------------------------------------
+
+def merge_input_ids(merge_entry, account_name):
+    """合并记录的输入视频 ID（迁移过的直接用 input_ids）"""
+    if "input_ids" in merge_entry:
+        return [sys.intern(i) for i in merge_entry["input_ids"]]
+    return [canonical_path(v, account_name) for v in merge_entry.get("input_videos", [])]
+
+
+def load_merged_clip_ids(account_name, log_dir=MERGE_LOG_DIR):
+    """所有已合并视频的 ID 集合，is_video_merged 变成一次哈希查找"""
+    record_file = os.path.join(log_dir, f"{account_name}_merged_record.json")
+    if not os.path.exists(record_file):
+        return frozenset()
+    with open(record_file, 'r', encoding='utf-8') as f:
+        record = json.load(f)
+    return frozenset(
+        clip_id
+        for entry in record.get("merged_videos", [])
+        for clip_id in merge_input_ids(entry, account_name)
+    )
+
+
+def is_video_merged(merged_clip_ids, video_path, account_name):
+    return canonical_path(video_path, account_name) in merged_clip_ids
+
+
+# ----------------------------------------------------------------------
+# 迁移
+# ----------------------------------------------------------------------
+
+def migrate_account(account_name):
+    """给下载记录、合并记录、上传历史补上规范化 ID 字段；原来的路径字段不动"""
+    from download_journal import DownloadJournal
+
+    results = {}
+
+    # 1. 下载记录：加锁重写快照，补 folder_id
+    journal = DownloadJournal(account_name)
+    if os.path.exists(journal.snapshot_file) or os.path.exists(journal.journal_file):
+        def add_folder_ids(data):
+            for d in data.get("downloads", []):
+                folder = d.get("download_folder") or d.get("file_path")
+                if folder:
+                    d["folder_id"] = canonical_path(folder, account_name)
+
+        data = journal.rewrite(add_folder_ids)
+        if journal.index is not None:
+            journal.index.upsert_many(data.get("downloads", []))
+        results["downloads"] = len(data.get("downloads", []))
+
+    # 2. 合并记录：补 input_ids / output_id
+    merge_file = os.path.join(MERGE_LOG_DIR, f"{account_name}_merged_record.json")
+    if os.path.exists(merge_file):
+        def add_merge_ids(record):
+            for entry in record.get("merged_videos", []):
+                entry["input_ids"] = [canonical_path(v, account_name) for v in entry.get("input_videos", [])]
+                if entry.get("output_file"):
+                    entry["output_id"] = canonical_path(entry["output_file"], account_name)
+            return len(record.get("merged_videos", []))
+
+        results["merges"] = update_json_record(merge_file, add_merge_ids)
+
+    # 3. 上传历史：按编号补 video_id
+    if os.path.exists(UPLOAD_RECORD_FILE):
+        def add_video_ids(history):
+            uploads = history.get(account_name, {}).get("uploads", [])
+            for upload in uploads:
+                title = upload.get("title") or f"ins海外离大谱#{upload['number']}"
+                upload.setdefault("video_id", sys.intern(f"merged/{title}.mp4"))
+            return len(uploads)
+
+        results["uploads"] = update_json_record(UPLOAD_RECORD_FILE, add_video_ids)
+
+    return results
+
+
+def path_stats(account_name):
+    """统计路径字符串：原始写法数量 vs 规范化后的数量"""
+    from download_journal import DownloadJournal
+
+    raw, ids = [], set()
+    for d in DownloadJournal(account_name).get_downloads():
+        for key in ("file_path", "download_folder"):
+            if d.get(key):
+                raw.append(d[key])
+                ids.add(canonical_path(d[key], account_name))
+
+    merge_file = os.path.join(MERGE_LOG_DIR, f"{account_name}_merged_record.json")
+    if os.path.exists(merge_file):
+        with open(merge_file, 'r', encoding='utf-8') as f:
+            for entry in json.load(f).get("merged_videos", []):
+                raw.extend(entry.get("input_videos", []))
+                ids.update(merge_input_ids(entry, account_name))
+
+    return {
+        "raw_paths": len(raw),
+        "distinct_raw": len(set(raw)),
+        "distinct_ids": len(ids),
+        "raw_bytes": sum(len(p.encode("utf-8")) for p in raw),
+        "id_bytes": sum(len(i.encode("utf-8")) for i in ids),
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    command, account = sys.argv[1], sys.argv[2]
+
+    if command == "migrate":
+        for name, count in migrate_account(account).items():
+            print(f"✅ {name}: {count} 条已补充 ID")
+    elif command == "stats":
+        stats = path_stats(account)
+        print(f"📄 原始路径: {stats['raw_paths']} 个 (不同写法 {stats['distinct_raw']} 个, {stats['raw_bytes'] / 1024:.1f} KB)")
+        print(f"🆔 规范化后: {stats['distinct_ids']} 个 ({stats['id_bytes'] / 1024:.1f} KB)")
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,357 @@
+"""
+下载/合并记录分层归档
+
+现在的做法是整份复制（ai_vanvan_downloads_backup_20251028.json 之类），每份几百 KB，
+而且在线文件一直在变大。这里改成按月分层：
+
+  logs/archive/{account}/downloads-2025-09.json.xz   已经全部合并的月份
+  logs/archive/{account}/merges-2025-09.json.xz      已经全部上传的月份
+  logs/archive/{account}/manifest.json               段列表
+
+  - 段文件是 LZMA 压缩、只写一次的（不会再改）
+  - 在线文件只保留"热"的部分（当前月 + 还没合并/上传的）
+  - 段文件只在需要时才解压（lazy）
+  - 备份只记录当时的段列表 + 热数据，不再整份复制
+
+归档规则:
+  下载记录: 早于 keep_months 个月，且这个月每条成功下载都已合并
+           （merged 标记为真，或这个帖子的视频出现在合并记录的输入里；
+             帖子 -> 视频文件名用下载目录的 .json.xz 索引（sidecar_index.py）对应，
+             找不到对应文件的记录按未合并处理，不归档）
+  合并记录: 早于 keep_months 个月，且这个月的输出都已上传
+           （编号 <= 已确认上传的最大编号；没有编号的旧文件视为已上传）
+
+合并记录归档后，在线文件里会写入 archived_count（已归档条数），
+合并序号 = archived_count + 在线下标，和归档前一致。
+
+用法:
+  python record_archive.py archive ai_vanvan          # 归档（默认保留最近2个月）
+  python record_archive.py backup ai_vanvan           # 增量备份
+  python record_archive.py restore ai_vanvan <备份名>  # 查看/恢复备份
+  python record_archive.py list ai_vanvan
+"""
+import hashlib
+import json
+import lzma
+import os
+import re
+import sys
+from datetime import datetime
+from functools import lru_cache
+
+from download_journal import DownloadJournal
+from merge_index import MergeIndex
+from path_table import canonical_path, local_path
+from record_writer import FileLock, update_json_record, write_json_atomic
+
+ARCHIVE_DIR = "logs/archive"
+MERGE_LOG_DIR = "logs/merges"
+KEEP_MONTHS = 2
+
+
+def _month_of(record, *keys):
+    for key in keys:
+        value = record.get(key)
+        if value:
+            return value[:7]
+    return ""
+
+
+def _cutoff_month(keep_months):
+    """早于这个月份的数据才归档"""
+    now = datetime.now()
+    year, month = now.year, now.month - keep_months + 1
+    while month <= 0:
+        year, month = year - 1, month + 12
+    return f"{year:04d}-{month:02d}"
+
+
+def _output_number(output_file):
+    match = re.search(r"#(\d+)", os.path.basename(str(output_file).replace("\\", "/")))
+    return int(match.group(1)) if match else None
+
+
+@lru_cache(maxsize=32)
+def _read_segment(path):
+    # 缓存解压后的文本，每次调用方拿到的都是新解析出来的对象，改了也不会污染缓存
+    with open(path, 'rb') as f:
+        return lzma.decompress(f.read()).decode('utf-8')
+
+
+@lru_cache(maxsize=32)
+def _segment_successes(path):
+    return frozenset(
+        d["shortcode"] for d in json.loads(_read_segment(path))
+        if d.get("status") == "success" and d.get("shortcode")
+    )
+
+
+class RecordArchive:
+    """单个账号的归档段"""
+
+    def __init__(self, account_name, archive_dir=ARCHIVE_DIR):
+        self.account_name = account_name
+        self.archive_dir = os.path.join(archive_dir, account_name)
+        self.manifest_file = os.path.join(self.archive_dir, "manifest.json")
+        self.lock = FileLock(self.manifest_file)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {"account": self.account_name, "segments": []}
+
+    def _save_manifest(self):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        write_json_atomic(self.manifest_file, self.manifest)
+
+    def segments(self, kind=None):
+        return [s for s in self.manifest["segments"] if kind is None or s["kind"] == kind]
+
+    def write_segment(self, kind, month, records):
+        """写一个新段（段文件只写一次，同一个月再次归档会生成 .2、.3 …）"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        payload = lzma.compress(json.dumps(records, ensure_ascii=False).encode('utf-8'))
+
+        with self.lock:
+            # 加锁后重新读段列表：别的进程可能刚归档过同一个月
+            self.manifest = self._load_manifest()
+            part = 1 + sum(1 for s in self.segments(kind) if s["month"] == month)
+            suffix = "" if part == 1 else f".{part}"
+            filename = f"{kind}-{month}{suffix}.json.xz"
+
+            path = os.path.join(self.archive_dir, filename)
+            with open(path + ".tmp", 'wb') as f:
+                f.write(payload)
+            os.replace(path + ".tmp", path)
+
+            self.manifest["segments"].append({
+                "kind": kind,
+                "month": month,
+                "file": filename,
+                "count": len(records),
+                "sha256": hashlib.sha256(payload).hexdigest(),
+                "created": datetime.now().isoformat(),
+            })
+            self._save_manifest()
+        return filename
+
+    def load_segment(self, segment):
+        """解压一个段（带缓存，同一个段只解压一次；返回的是新列表，可以随便改）"""
+        return json.loads(_read_segment(os.path.join(self.archive_dir, segment["file"])))
+
+    def iter_records(self, kind, months=None):
+        """按需解压：只读指定月份的段"""
+        for segment in self.segments(kind):
+            if months is None or segment["month"] in months:
+                yield from self.load_segment(segment)
+
+    def has_downloaded(self, shortcode):
+        """归档的下载记录里有没有这个帖子的成功下载"""
+        return any(
+            shortcode in _segment_successes(os.path.join(self.archive_dir, segment["file"]))
+            for segment in self.segments("downloads")
+        )
+
+    def archived_count(self, kind):
+        return sum(s["count"] for s in self.segments(kind))
+
+
+# ----------------------------------------------------------------------
+# 归档
+# ----------------------------------------------------------------------
+
+_CLIP_SUFFIX = re.compile(r"(_\d+)?(\.json)?\.[^./]+$")
+
+
+def _clip_key(clip_id):
+    """视频 ID -> (文件夹, 帖子文件名前缀)：多视频帖子的 _1.mp4、_2.mp4 和 .json.xz 都对应同一个帖子"""
+    folder, _, name = clip_id.rpartition("/")
+    return folder, _CLIP_SUFFIX.sub("", name)
+
+
+def archive_downloads(account_name, keep_months=KEEP_MONTHS, archive=None):
+    """把已经全部合并的月份移出在线下载记录，返回 {月份: 条数}"""
+    from sidecar_index import SidecarIndex
+
+    archive = archive or RecordArchive(account_name)
+    journal = DownloadJournal(account_name)
+
+    # 按视频判断：同一个日期文件夹里合并了一部分不代表整个文件夹都合并了
+    # MergeIndex 里包括已归档的合并记录
+    merged_clips = {_clip_key(clip_id) for clip_id in MergeIndex(account_name).clips}
+    download_dir = local_path("downloads", account_name)
+    sidecars = SidecarIndex(download_dir)
+    sidecars.refresh()
+    sidecars.save()
+
+    def is_done(d):
+        if d.get("status") != "success" or d.get("merged"):
+            return True
+        loc = sidecars.lookup(d.get("shortcode"))
+        if loc is None:
+            return False
+        clip_id = canonical_path(os.path.join(download_dir, *loc), account_name)
+        return _clip_key(clip_id) in merged_clips
+
+    cutoff = _cutoff_month(keep_months)
+    archived = {}
+
+    def move_to_archive(data):
+        # 在下载记录的锁里执行，归档期间别的进程追加的下载不会丢
+        downloads = data.get("downloads", [])
+        by_month = {}
+        for d in downloads:
+            by_month.setdefault(_month_of(d, "download_time"), []).append(d)
+
+        for month, records in sorted(by_month.items()):
+            if month and month < cutoff and all(is_done(d) for d in records):
+                archive.write_segment("downloads", month, records)
+                archived[month] = len(records)
+
+        if archived:
+            keep, moved = [], []
+            for d in downloads:
+                (moved if _month_of(d, "download_time") in archived else keep).append(d)
+            data["downloads"] = keep
+            if journal.index is not None:
+                # rewrite 会把索引标成最新，归档走的记录要在同一把锁里从索引删掉
+                # （is_downloaded 查不到时会再查归档）
+                gone = {d["shortcode"] for d in moved if d.get("shortcode")}
+                journal.index.remove(gone)
+                journal.index.upsert_many([d for d in keep if d.get("shortcode") in gone])
+
+    journal.rewrite(move_to_archive)
+    return archived
+
+
+def archive_merges(account_name, keep_months=KEEP_MONTHS, archive=None):
+    """把已经全部上传的月份移出在线合并记录，返回 {月份: 条数}"""
+    from upload_tracker import last_uploaded_number
+
+    archive = archive or RecordArchive(account_name)
+    merge_file = os.path.join(MERGE_LOG_DIR, f"{account_name}_merged_record.json")
+    if not os.path.exists(merge_file):
+        return {}
+    last_uploaded = last_uploaded_number(account_name)
+
+    def is_done(entry):
+        number = _output_number(entry.get("output_file", ""))
+        return number is None or number <= last_uploaded
+
+    cutoff = _cutoff_month(keep_months)
+
+    def move_to_archive(record):
+        # 只能从头部开始连续归档，保证合并序号不变
+        merges = record.get("merged_videos", [])
+        months = [_month_of(e, "timestamp", "merge_time") for e in merges]
+        archived = {}
+        count = 0
+        while count < len(merges):
+            month = months[count]
+            end = count
+            while end < len(merges) and months[end] == month:
+                end += 1
+            block = merges[count:end]
+            # 还在保留期内 / 后面又出现同一个月 / 还有没上传的 → 停止
+            if not month or month >= cutoff or month in months[end:] or not all(is_done(e) for e in block):
+                break
+            archive.write_segment("merges", month, block)
+            archived[month] = len(block)
+            count = end
+
+        if count:
+            record["merged_videos"] = merges[count:]
+            record["archived_count"] = record.get("archived_count", 0) + count
+        return archived
+
+    return update_json_record(merge_file, move_to_archive)
+
+
+# ----------------------------------------------------------------------
+# 增量备份
+# ----------------------------------------------------------------------
+
+def snapshot_backup(account_name, tag=None, archive=None):
+    """备份 = 当前段列表（只记录引用）+ 压缩的热数据"""
+    archive = archive or RecordArchive(account_name)
+    tag = tag or datetime.now().strftime("%Y%m%d_%H%M%S")
+    os.makedirs(archive.archive_dir, exist_ok=True)
+
+    hot = {"downloads": DownloadJournal(account_name).load()}
+    merge_file = os.path.join(MERGE_LOG_DIR, f"{account_name}_merged_record.json")
+    if os.path.exists(merge_file):
+        with open(merge_file, 'r', encoding='utf-8') as f:
+            hot["merges"] = json.load(f)
+
+    hot_file = f"backup-{tag}-hot.json.xz"
+    with open(os.path.join(archive.archive_dir, hot_file), 'wb') as f:
+        f.write(lzma.compress(json.dumps(hot, ensure_ascii=False).encode('utf-8')))
+
+    backup = {
+        "tag": tag,
+        "created": datetime.now().isoformat(),
+        "segments": [s["file"] for s in archive.segments()],
+        "hot": hot_file,
+    }
+    write_json_atomic(os.path.join(archive.archive_dir, f"backup-{tag}.json"), backup)
+    return backup
+
+
+def restore_backup(account_name, tag, archive=None):
+    """还原备份时的完整数据：{"downloads": {...}, "merges": {...}}"""
+    archive = archive or RecordArchive(account_name)
+    with open(os.path.join(archive.archive_dir, f"backup-{tag}.json"), 'r', encoding='utf-8') as f:
+        backup = json.load(f)
+    with open(os.path.join(archive.archive_dir, backup["hot"]), 'rb') as f:
+        hot = json.loads(lzma.decompress(f.read()).decode('utf-8'))
+
+    segments = {s["file"]: s for s in archive.segments()}
+    used = [segments[name] for name in backup["segments"]]
+    downloads = [r for s in used if s["kind"] == "downloads" for r in archive.load_segment(s)]
+    merges = [r for s in used if s["kind"] == "merges" for r in archive.load_segment(s)]
+
+    full = {"downloads": dict(hot["downloads"]), "merges": dict(hot.get("merges", {"merged_videos": []}))}
+    full["downloads"]["downloads"] = downloads + hot["downloads"].get("downloads", [])
+    full["merges"]["merged_videos"] = merges + full["merges"].get("merged_videos", [])
+    full["merges"].pop("archived_count", None)
+    return full
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    command, account = sys.argv[1], sys.argv[2]
+    archive = RecordArchive(account)
+
+    if command == "archive":
+        keep = int(sys.argv[3]) if len(sys.argv) > 3 else KEEP_MONTHS
+        for month, count in archive_downloads(account, keep, archive).items():
+            print(f"📦 下载记录 {month}: {count} 条已归档")
+        for month, count in archive_merges(account, keep, archive).items():
+            print(f"📦 合并记录 {month}: {count} 条已归档")
+        print(f"✅ 归档完成 ({archive.archive_dir})")
+    elif command == "backup":
+        backup = snapshot_backup(account, archive=archive)
+        print(f"✅ 备份完成: {backup['tag']} (引用 {len(backup['segments'])} 个段 + {backup['hot']})")
+    elif command == "restore":
+        if len(sys.argv) < 4:
+            print("用法: python record_archive.py restore <账号> <备份名>")
+            sys.exit(1)
+        full = restore_backup(account, sys.argv[3], archive)
+        out_prefix = f"restored_{account}_{sys.argv[3]}"
+        write_json_atomic(f"{out_prefix}_downloads.json", full["downloads"])
+        write_json_atomic(f"{out_prefix}_merged_record.json", full["merges"])
+        print(f"✅ 已还原到 {out_prefix}_*.json（请确认后手动替换在线文件）")
+    elif command == "list":
+        for s in archive.segments():
+            print(f"  {s['file']:<36} {s['count']:>5} 条")
+        print(f"📊 下载记录已归档 {archive.archived_count('downloads')} 条, "
+              f"合并记录已归档 {archive.archived_count('merges')} 条")
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,583 @@
+"""
+紧凑记录模型 - 下载/合并记录的列式存储
+
+json.load 之后每条记录都是一个 dict，键名（shortcode、download_time、file_path、
+download_folder、blogger_name ...）每条都有一份，文件夹路径和博主名也在每条里重复。
+这里改成按列存储：
+
+  - 重复多的列（状态、文件夹、文件路径、博主、错误信息）存成字符串池 + array('I') 下标
+  - shortcode、下载时间几乎不重复，整列拼成一个字符串 + 偏移数组
+  - merged 存成 array('B')
+  - 不常见的额外字段（imported_from_old_project、sync_added ...）单独放在 {行号: dict}
+  - 行视图 DownloadRecord / MergeRecord 用 __slots__，按需创建
+
+字符串池里保存的是原始写法（to_records() 能原样还原）；
+需要比较路径时用 folder_id()，按字符串池去重后只算一次 canonical_path。
+
+列数据另外缓存到 logs/downloads/{account}_downloads.cols（marshal 格式），
+快照没变、也没有未压缩的日志时直接读缓存，不用再解析 JSON。
+
+用法:
+  python record_model.py bench                 # 对 logs/downloads 下所有账号做对比
+  python record_model.py bench ai_vanvan gf    # 只测指定账号
+"""
+import gc
+import json
+import marshal
+import os
+import sys
+import time
+import tracemalloc
+from array import array
+
+from path_table import canonical_path
+
+DOWNLOAD_LOG_DIR = "logs/downloads"
+MERGE_LOG_DIR = "logs/merges"
+CACHE_VERSION = 2  # 1: 池里的 None 存成了 ""
+
+# 这些字段单独成列，其余字段进 extra
+DOWNLOAD_FIELDS = ("shortcode", "download_time", "status", "file_path", "error",
+                   "merged", "download_folder", "blogger_name")
+POOLED_FIELDS = ("status", "file_path", "error", "download_folder", "blogger_name")
+MERGE_FIELDS = ("timestamp", "output_file", "input_videos", "input_count")
+
+
+class StringPool:
+    """字符串 <-> 整数下标，同一个字符串只存一份"""
+
+    __slots__ = ("values", "_index")
+
+    def __init__(self, values=()):
+        self.values = [sys.intern(v) if isinstance(v, str) else v for v in values]
+        self._index = {v: i for i, v in enumerate(self.values)}
+
+    def add(self, value):
+        """value 可以是 None（原文件里的 null），和 "" 分开存"""
+        num = self._index.get(value)
+        if num is None:
+            if isinstance(value, str):
+                value = sys.intern(value)
+            num = len(self.values)
+            self.values.append(value)
+            self._index[value] = num
+        return num
+
+    def find(self, value):
+        return self._index.get(value)
+
+    def __getitem__(self, num):
+        return self.values[num]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class PackedStrings:
+    """
+    一列几乎不重复的短字符串（shortcode、时间）：拼成一个大字符串 + 偏移数组，
+    取值时再切片。新追加的先放在 _tail 里。
+    """
+
+    __slots__ = ("_text", "_offsets", "_tail")
+
+    def __init__(self, values=()):
+        values = list(values)
+        self._text = "".join(values)
+        self._offsets = array('I', [0])
+        end = 0
+        for v in values:
+            end += len(v)
+            self._offsets.append(end)
+        self._tail = []
+
+    @classmethod
+    def from_packed(cls, text, offsets):
+        packed = cls()
+        packed._text = text
+        packed._offsets = array('I')
+        packed._offsets.frombytes(offsets)
+        return packed
+
+    def pack(self):
+        """-> (拼接后的字符串, 偏移数组 bytes)"""
+        if self._tail:
+            self.__init__(list(self))
+        return self._text, self._offsets.tobytes()
+
+    def append(self, value):
+        self._tail.append(value)
+
+    def __getitem__(self, num):
+        packed = len(self._offsets) - 1
+        if num < 0:
+            num += len(self)
+        if num >= packed:
+            return self._tail[num - packed]
+        return self._text[self._offsets[num]:self._offsets[num + 1]]
+
+    def __len__(self):
+        return len(self._offsets) - 1 + len(self._tail)
+
+    def __iter__(self):
+        text, offsets = self._text, self._offsets
+        for i in range(len(offsets) - 1):
+            yield text[offsets[i]:offsets[i + 1]]
+        yield from self._tail
+
+
+# ----------------------------------------------------------------------
+# 下载记录
+# ----------------------------------------------------------------------
+
+class DownloadRecord:
+    """下载记录的行视图（不复制数据）"""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    @property
+    def shortcode(self):
+        return self._table.shortcodes[self._row]
+
+    @property
+    def download_time(self):
+        return self._table.download_times[self._row]
+
+    @property
+    def status(self):
+        return self._table.pools["status"][self._table.columns["status"][self._row]]
+
+    @property
+    def file_path(self):
+        return self._table.pools["file_path"][self._table.columns["file_path"][self._row]]
+
+    @property
+    def error(self):
+        return self._table.pools["error"][self._table.columns["error"][self._row]]
+
+    @property
+    def merged(self):
+        return bool(self._table.merged[self._row])
+
+    @property
+    def download_folder(self):
+        return self._table.pools["download_folder"][self._table.columns["download_folder"][self._row]]
+
+    @property
+    def blogger_name(self):
+        return self._table.pools["blogger_name"][self._table.columns["blogger_name"][self._row]]
+
+    @property
+    def folder_id(self):
+        return self._table.folder_id(self._row)
+
+    def get(self, key, default=None):
+        extra = self._table.extra.get(self._row, {})
+        if key in DOWNLOAD_FIELDS and key not in extra.get("_missing", ()):
+            return getattr(self, key)
+        return extra.get(key, default)
+
+    def to_dict(self):
+        return self._table.record(self._row)
+
+    def __repr__(self):
+        return f"DownloadRecord({self.shortcode!r}, {self.download_time!r}, {self.status!r})"
+
+
+class DownloadTable:
+    """一个账号的全部下载记录（列式）"""
+
+    def __init__(self, account_name):
+        self.account_name = account_name
+        self.shortcodes = PackedStrings()
+        self.download_times = PackedStrings()
+        self.merged = array('B')
+        self.pools = {name: StringPool() for name in POOLED_FIELDS}
+        self.columns = {name: array('I') for name in POOLED_FIELDS}
+        self.extra = {}  # 行号 -> 额外字段
+        self.meta = {}   # 文件顶层的其他字段（account、merged_sessions ...）
+        self._rows = None
+        self._folder_ids = None
+
+    @classmethod
+    def from_records(cls, account_name, records, meta=None):
+        table = cls(account_name)
+        for record in records:
+            table.append(record)
+        table.meta = meta or {}
+        return table
+
+    def append(self, record):
+        row = len(self.shortcodes)
+        self.shortcodes.append(record.get("shortcode", ""))
+        self.download_times.append(record.get("download_time", ""))
+        self.merged.append(1 if record.get("merged", False) else 0)
+        for name in POOLED_FIELDS:
+            # 缺字段的记在 _missing 里；显式的 null 原样存 None，还原时不会变成 ""
+            value = record[name] if name in record else ""
+            self.columns[name].append(self.pools[name].add(value))
+        extra = {k: v for k, v in record.items() if k not in DOWNLOAD_FIELDS}
+        missing = [k for k in DOWNLOAD_FIELDS if k not in record]
+        if missing:
+            # 旧记录缺字段（比如没有 download_folder），还原时不能凭空补上
+            extra["_missing"] = missing
+        if extra:
+            self.extra[row] = extra
+        if self._rows is not None:
+            self._rows[self.shortcodes[row]] = row
+        return row
+
+    def __len__(self):
+        return len(self.shortcodes)
+
+    def __getitem__(self, row):
+        return DownloadRecord(self, row)
+
+    def __iter__(self):
+        for row in range(len(self.shortcodes)):
+            yield DownloadRecord(self, row)
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def row_of(self, shortcode):
+        """shortcode -> 行号（第一次调用时建表）"""
+        if self._rows is None:
+            self._rows = {sc: row for row, sc in enumerate(self.shortcodes)}
+        return self._rows.get(shortcode)
+
+    def is_downloaded(self, shortcode):
+        row = self.row_of(shortcode)
+        if row is None:
+            return False
+        return self.columns["status"][row] == self.pools["status"].find("success")
+
+    def folder_id(self, row):
+        """行 -> 规范化文件夹 ID；每个不同的文件夹只算一次 canonical_path"""
+        if self._folder_ids is None:
+            self._folder_ids = [canonical_path(v, self.account_name) for v in self.pools["download_folder"].values]
+        folder = self.columns["download_folder"][row]
+        if not self.pools["download_folder"][folder]:
+            return canonical_path(self.pools["file_path"][self.columns["file_path"][row]], self.account_name)
+        return self._folder_ids[folder]
+
+    def unmerged_rows(self):
+        success = self.pools["status"].find("success")
+        status = self.columns["status"]
+        return [row for row in range(len(self.shortcodes)) if status[row] == success and not self.merged[row]]
+
+    def get_unmerged_downloads(self):
+        return [DownloadRecord(self, row) for row in self.unmerged_rows()]
+
+    def blogger_counts(self):
+        """博主 -> 下载条数"""
+        counts = [0] * len(self.pools["blogger_name"])
+        for num in self.columns["blogger_name"]:
+            counts[num] += 1
+        return {self.pools["blogger_name"][i]: c for i, c in enumerate(counts) if c}
+
+    # ------------------------------------------------------------------
+    # 还原 / 缓存
+    # ------------------------------------------------------------------
+
+    def record(self, row):
+        """行 -> 原来的 dict（字段顺序和原文件一致）"""
+        record = {
+            "shortcode": self.shortcodes[row],
+            "download_time": self.download_times[row],
+        }
+        for name in ("status", "file_path", "error"):
+            record[name] = self.pools[name][self.columns[name][row]]
+        record["merged"] = bool(self.merged[row])
+        for name in ("download_folder", "blogger_name"):
+            record[name] = self.pools[name][self.columns[name][row]]
+        extra = dict(self.extra.get(row, {}))
+        for name in extra.pop("_missing", ()):
+            del record[name]
+        record.update(extra)
+        return record
+
+    def to_records(self):
+        return [self.record(row) for row in range(len(self.shortcodes))]
+
+    def dump_columns(self, stamp):
+        return marshal.dumps({
+            "version": CACHE_VERSION,
+            "stamp": stamp,
+            "shortcodes": self.shortcodes.pack(),
+            "download_times": self.download_times.pack(),
+            "merged": self.merged.tobytes(),
+            "pools": {name: pool.values for name, pool in self.pools.items()},
+            "columns": {name: col.tobytes() for name, col in self.columns.items()},
+            "extra": json.dumps(self.extra, ensure_ascii=False),
+            "meta": json.dumps(self.meta, ensure_ascii=False),
+        })
+
+    @classmethod
+    def load_columns(cls, account_name, payload, stamp):
+        """读取列缓存；版本或时间戳不对返回 None"""
+        data = marshal.loads(payload)
+        if data.get("version") != CACHE_VERSION or data.get("stamp") != stamp:
+            return None
+        table = cls(account_name)
+        table.shortcodes = PackedStrings.from_packed(*data["shortcodes"])
+        table.download_times = PackedStrings.from_packed(*data["download_times"])
+        table.merged = array('B', data["merged"])
+        table.pools = {name: StringPool(values) for name, values in data["pools"].items()}
+        for name, raw in data["columns"].items():
+            col = array('I')
+            col.frombytes(raw)
+            table.columns[name] = col
+        table.extra = {int(row): fields for row, fields in json.loads(data["extra"]).items()}
+        table.meta = json.loads(data["meta"])
+        return table
+
+
+def _file_stamp(path):
+    if not os.path.exists(path):
+        return [0, 0]
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def load_download_table(account_name, log_dir=DOWNLOAD_LOG_DIR, use_cache=True):
+    """
+    加载紧凑下载记录（快照 + 日志）。
+    没有未压缩的日志时优先读列缓存，缓存过期就从 JSON 重建并重新缓存。
+    """
+    from download_journal import DownloadJournal
+
+    journal = DownloadJournal(account_name, log_dir=log_dir)
+    cache_file = os.path.join(log_dir, f"{account_name}_downloads.cols")
+    has_journal = os.path.exists(journal.journal_file) and os.path.getsize(journal.journal_file) > 0
+    stamp = _file_stamp(journal.snapshot_file)
+
+    if use_cache and not has_journal and os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'rb') as f:
+                table = DownloadTable.load_columns(account_name, f.read(), stamp)
+            if table is not None:
+                return table
+        except (ValueError, EOFError, KeyError, OSError):
+            pass
+
+    data = journal.load()
+    downloads = data.pop("downloads", [])
+    table = DownloadTable.from_records(account_name, downloads, meta=data)
+
+    if use_cache and not has_journal and os.path.exists(journal.snapshot_file):
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(table.dump_columns(stamp))
+        os.replace(tmp_file, cache_file)
+    return table
+
+
+# ----------------------------------------------------------------------
+# 合并记录
+# ----------------------------------------------------------------------
+
+class MergeRecord:
+    """合并记录的行视图"""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    @property
+    def timestamp(self):
+        return self._table.timestamps[self._row]
+
+    @property
+    def output_file(self):
+        return self._table.outputs[self._row]
+
+    @property
+    def input_videos(self):
+        return self._table.input_videos(self._row)
+
+    @property
+    def input_count(self):
+        return self._table.offsets[self._row + 1] - self._table.offsets[self._row]
+
+    def get(self, key, default=None):
+        extra = self._table.extra.get(self._row, {})
+        if key in MERGE_FIELDS and key not in extra.get("_missing", ()):
+            return getattr(self, key)
+        return extra.get(key, default)
+
+    def to_dict(self):
+        return self._table.record(self._row)
+
+    def __repr__(self):
+        return f"MergeRecord({self.timestamp!r}, {self.output_file!r}, {self.input_count})"
+
+
+class MergeTable:
+    """一个账号的合并记录：所有输入视频放在一个扁平数组里，用 offsets 切分"""
+
+    def __init__(self, account_name):
+        self.account_name = account_name
+        self.timestamps = []
+        self.outputs = []
+        self.videos = StringPool()
+        self.inputs = array('I')
+        self.offsets = array('I', [0])
+        self.extra = {}
+        self.meta = {}
+
+    @classmethod
+    def from_record(cls, account_name, record):
+        table = cls(account_name)
+        for entry in record.get("merged_videos", []):
+            table.append(entry)
+        table.meta = {k: v for k, v in record.items() if k != "merged_videos"}
+        return table
+
+    def append(self, entry):
+        row = len(self.timestamps)
+        self.timestamps.append(entry.get("timestamp") or entry.get("merge_time", ""))
+        self.outputs.append(entry.get("output_file", ""))
+        for video in entry.get("input_videos", []):
+            self.inputs.append(self.videos.add(video))
+        self.offsets.append(len(self.inputs))
+        extra = {k: v for k, v in entry.items() if k not in MERGE_FIELDS}
+        missing = [k for k in MERGE_FIELDS if k not in entry]
+        if missing:
+            extra["_missing"] = missing
+        if entry.get("input_count", len(entry.get("input_videos", []))) != len(entry.get("input_videos", [])):
+            extra["input_count"] = entry["input_count"]
+        if extra:
+            self.extra[row] = extra
+        return row
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, row):
+        return MergeRecord(self, row)
+
+    def __iter__(self):
+        for row in range(len(self.timestamps)):
+            yield MergeRecord(self, row)
+
+    def input_videos(self, row):
+        values = self.videos.values
+        return [values[i] for i in self.inputs[self.offsets[row]:self.offsets[row + 1]]]
+
+    def merged_clip_ids(self):
+        """所有已合并视频的 ID；每个不同的路径只算一次 canonical_path"""
+        ids = [canonical_path(v, self.account_name) for v in self.videos.values]
+        return frozenset(ids[i] for i in set(self.inputs))
+
+    def record(self, row):
+        extra = dict(self.extra.get(row, {}))
+        entry = {
+            "timestamp": self.timestamps[row],
+            "output_file": self.outputs[row],
+            "input_videos": self.input_videos(row),
+            "input_count": extra.pop("input_count", self.offsets[row + 1] - self.offsets[row]),
+        }
+        for name in extra.pop("_missing", ()):
+            del entry[name]
+        entry.update(extra)
+        return entry
+
+    def to_record(self):
+        record = dict(self.meta)
+        record["merged_videos"] = [self.record(row) for row in range(len(self.timestamps))]
+        return record
+
+
+def load_merge_table(account_name, log_dir=MERGE_LOG_DIR):
+    record_file = os.path.join(log_dir, f"{account_name}_merged_record.json")
+    if not os.path.exists(record_file):
+        return MergeTable(account_name)
+    with open(record_file, 'r', encoding='utf-8') as f:
+        return MergeTable.from_record(account_name, json.load(f))
+
+
+# ----------------------------------------------------------------------
+# 对比测试
+# ----------------------------------------------------------------------
+
+def _measure(fn):
+    """返回 (结果, 耗时秒, 结果占用的内存字节)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current
+
+
+def benchmark(account_name, log_dir=DOWNLOAD_LOG_DIR, repeat=5):
+    """dict 模型 vs 紧凑模型：内存和加载时间"""
+    snapshot_file = os.path.join(log_dir, f"{account_name}_downloads.json")
+
+    def load_dicts():
+        with open(snapshot_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    results = {"account": account_name}
+    dicts, _, results["dict_bytes"] = _measure(load_dicts)
+    results["records"] = len(dicts.get("downloads", []))
+    del dicts
+
+    # 第一次：从 JSON 构建并写缓存
+    _, results["build_seconds"], _ = _measure(lambda: load_download_table(account_name, log_dir))
+    table, _, results["compact_bytes"] = _measure(lambda: load_download_table(account_name, log_dir))
+    assert table.to_records() == load_dicts().get("downloads", []), "紧凑模型还原结果和原文件不一致"
+    del table
+
+    def best_of(fn):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    results["dict_seconds"] = best_of(load_dicts)
+    results["compact_seconds"] = best_of(lambda: load_download_table(account_name, log_dir))
+    return results
+
+
+def _bench_accounts(log_dir=DOWNLOAD_LOG_DIR):
+    suffix = "_downloads.json"
+    return sorted(name[:-len(suffix)] for name in os.listdir(log_dir) if name.endswith(suffix))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "bench":
+        accounts = sys.argv[2:] or _bench_accounts()
+        print(f"{'账号':<16}{'条数':>7}{'dict 内存':>12}{'紧凑内存':>12}{'dict 加载':>12}{'紧凑加载':>12}{'首次构建':>12}")
+        for account in accounts:
+            r = benchmark(account)
+            print(f"{account:<16}{r['records']:>8}"
+                  f"{r['dict_bytes'] / 1024:>11.0f}K{r['compact_bytes'] / 1024:>11.0f}K"
+                  f"{r['dict_seconds'] * 1000:>10.2f}ms{r['compact_seconds'] * 1000:>10.2f}ms"
+                  f"{r['build_seconds'] * 1000:>10.2f}ms")
+            print(f"{'':<16}{'':>8}  内存 {(r['compact_bytes'] / r['dict_bytes'] - 1) * 100:+.0f}%"
+                  f"  加载 {(r['compact_seconds'] / r['dict_seconds'] - 1) * 100:+.0f}%")
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,206 @@
+"""
+记录文件写入器 - 跨进程加锁 + 批量提交 + 原子替换
+
+下载器、合并器、mark_*_youtube_* 脚本、rollback_tool 都会"读-改-写"同一批记录 JSON，
+没有任何锁：两个进程同时写，后写的会把先写的覆盖掉。而且每次都要整份写一遍。
+
+这里统一通过 RecordWriter 修改记录文件：
+  - {文件}.lock 上的跨进程文件锁（Linux 用 fcntl，Windows 用 msvcrt）
+  - 同一进程里并发提交的修改合并成一次写入（group commit）
+  - 写临时文件 + os.replace，读的一方永远看不到写了一半的文件
+
+用法:
+    from record_writer import update_json_record
+
+    def add_merge(record):
+        record["merged_videos"].append(merge_info)
+
+    update_json_record("logs/merges/ai_vanvan_merged_record.json", add_merge,
+                       default={"merged_videos": []})
+"""
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class _HeldLock:
+    """一次加锁：自己的文件描述符，释放后关闭"""
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def release(self):
+        if self.fd is None:
+            return
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+        os.close(self.fd)
+        self.fd = None
+
+
+class FileLock:
+    """
+    跨进程文件锁（阻塞等待）。
+    每次加锁单独打开一个描述符，同一个 FileLock 被多个线程同时使用也不会互相释放对方的锁
+    （flock 按打开的文件区分，同进程的两个线程之间也会互斥）。
+    """
+
+    def __init__(self, path):
+        self.lock_file = path + ".lock"
+        self._local = threading.local()
+
+    def acquire(self):
+        """加锁，返回 _HeldLock，用完调用它的 release()"""
+        os.makedirs(os.path.dirname(self.lock_file) or ".", exist_ok=True)
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                # msvcrt.LK_LOCK 最多重试 10 秒，这里循环到拿到为止
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+        except BaseException:
+            os.close(fd)
+            raise
+        return _HeldLock(fd)
+
+    def __enter__(self):
+        held = self.acquire()
+        if not hasattr(self._local, "held"):
+            self._local.held = []
+        self._local.held.append(held)
+        return held
+
+    def __exit__(self, *exc):
+        self._local.held.pop().release()
+
+
+def write_json_atomic(path, data, indent=2):
+    """写临时文件再替换，保证文件要么是旧的要么是新的"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+class _Pending:
+    def __init__(self, mutator):
+        self.mutator = mutator
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RecordWriter:
+    """单个 JSON 记录文件的写入器"""
+
+    def __init__(self, path, default=None, indent=2):
+        self.path = path
+        self.default = default if default is not None else {}
+        self.indent = indent
+        self.lock = FileLock(path)
+        self._mutex = threading.Lock()
+        self._pending = []
+        self._committing = False
+        self.commits = 0  # 实际写文件的次数（统计用）
+
+    def _load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return json.loads(json.dumps(self.default))
+
+    def _commit(self, batch):
+        """拿锁 → 读一次 → 依次执行这批修改 → 写一次"""
+        with self.lock:
+            data = self._load()
+            applied = []
+            for item in batch:
+                try:
+                    item.result = item.mutator(data)
+                    applied.append(item)
+                except Exception as e:  # 一个修改失败不影响同批的其他修改
+                    item.error = e
+                    # 改到一半的数据不能写进文件：重新读一次，把这批里已经成功的修改再做一遍。
+                    # 只有出错时才多读一次文件，正常提交不复制整份记录
+                    data = self._load()
+                    for done in applied:
+                        done.result = done.mutator(data)
+            if applied:
+                write_json_atomic(self.path, data, self.indent)
+                self.commits += 1
+
+    def submit(self, mutator):
+        """
+        提交一个修改函数 mutator(data)，在拿到锁之后、写文件之前执行。
+        返回 mutator 的返回值；mutator 抛出的异常会在这里重新抛出。
+        """
+        item = _Pending(mutator)
+        with self._mutex:
+            self._pending.append(item)
+            if self._committing:
+                leader = False
+            else:
+                self._committing = True
+                leader = True
+
+        if leader:
+            # 负责提交的线程：一直提交到没有新的修改为止
+            while True:
+                with self._mutex:
+                    batch, self._pending = self._pending, []
+                    if not batch:
+                        self._committing = False
+                        break
+                try:
+                    self._commit(batch)
+                except Exception as e:
+                    for b in batch:
+                        b.error = b.error or e
+                for b in batch:
+                    b.done.set()
+
+        item.done.wait()
+        if item.error:
+            raise item.error
+        return item.result
+
+    def read(self):
+        """加锁读取（保证读到的是完整提交后的数据）"""
+        with self.lock:
+            return self._load()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path, default=None):
+    """同一个文件在进程内共用一个 RecordWriter，这样才能合并提交"""
+    key = os.path.abspath(path)
+    with _writers_lock:
+        if key not in _writers:
+            _writers[key] = RecordWriter(path, default=default)
+        return _writers[key]
+
+
+def update_json_record(path, mutator, default=None):
+    """加锁修改一个 JSON 记录文件"""
+    return get_writer(path, default).submit(mutator)
@@ -1,6 +1,8 @@
 import redis
 import json
 
+from work_queue import WorkQueue
+
 # 连接 Redis
 redis_client = redis.from_url("redis://localhost:6379")
 
@@ -10,7 +12,9 @@ task = {
     "video_path": "/videos/ai_vanvan/ins海外离大谱#123.mp4",
     "title": "ins海外离大谱#123",
     "tid": 138,  # 生活 > 搞笑（修正！）
-    "tag": "Instagram,搞笑,离大谱,海外,沙雕"
+    "tag": "Instagram,搞笑,离大谱,海外,沙雕",
+    # 同一个视频同一个编号换分区重新上传，幂等键带上分区，不会被当成第一次上传的重复任务
+    "idempotency_key": "ai_vanvan:/videos/ai_vanvan/ins海外离大谱#123.mp4:123:tid138"
 }
 
 print("=" * 70)
@@ -29,7 +33,8 @@ choice = input("\n继续上传? (y/n): ")
 
 if choice.lower() == 'y':
     # 发送到队列
-    redis_client.rpush("biliup:queue", json.dumps(task))
+    # 没设置 WORK_QUEUE_STREAMS=1 时写旧列表（服务还在 BRPOP），切换步骤见 work_queue.py 的迁移说明
+    WorkQueue(redis_client, "biliup:queue").enqueue(task)
     print(f"\n✅ 任务已发送到 biliup:queue")
     print(f"\n查看日志: docker logs biliup-uploader --tail 30 --follow")
 else:
@@ -14,6 +14,9 @@ import os
 from datetime import datetime
 import argparse
 
+from download_journal import DownloadJournal
+from merge_index import MergeIndex
+
 
 def execute_docker_command(container, command, description):
     """执行 Docker 命令"""
@@ -35,6 +38,13 @@ def execute_docker_command(container, command, description):
         return False, result.stderr
 
 
+def refresh_merge_index(account):
+    """容器里改过合并记录后，重建本地的合并反向索引"""
+    if os.path.exists(f"logs/merges/{account}_merged_record.json"):
+        index = MergeIndex(account)  # 记录文件变了会自动重建
+        print(f"   ✅ 合并索引: {len(index.outputs)} 次合并, {len(index.clips)} 个视频")
+
+
 def rollback_by_date(account, date_str):
     """
     按日期回退测试数据
@@ -60,16 +70,20 @@ def rollback_by_date(account, date_str):
     )
     
     # 3. 删除下载日志
+    # DownloadJournal.remove_by_date 加锁重写快照 + 日志，SQLite 索引、seen 集合、
+    # 未合并游标在同一把锁里一起更新；只删索引的话，下次重建索引时记录又会回来
     print("\n3️⃣ 删除下载日志记录...")
     execute_docker_command(
         "social-media-hub-downloader-1",
-        f"python -c \"import json,os; "
-        f"log_file='/app/logs/downloads/{account}_download.json'; "
-        f"data=json.load(open(log_file)) if os.path.exists(log_file) else {{'downloads':[]}}; "
-        f"data['downloads']=[d for d in data['downloads'] if d.get('timestamp','')[:10]!='{date_str}']; "
-        f"json.dump(data,open(log_file,'w'),indent=2)\"",
+        f"cd /app && python -c \"from download_journal import DownloadJournal; "
+        f"print(DownloadJournal('{account}').remove_by_date('{date_str}'))\"",
         f"删除 {date_str} 的下载记录"
     )
+
+    # 本地也有这个账号的下载记录时一并删除
+    journal = DownloadJournal(account)
+    if os.path.exists(journal.snapshot_file) or os.path.exists(journal.journal_file):
+        print(f"   ✅ 本地下载记录: 删除 {journal.remove_by_date(date_str)} 条")
     
     # 4. 删除标准化视频
     print("\n4️⃣ 删除标准化视频...")
@@ -113,11 +127,14 @@ def rollback_by_date(account, date_str):
         "social-media-hub-merger-1",
         f"python -c \"import json,os; "
         f"log_file='/app/logs/merges/{account}_merged_record.json'; "
+        f"import fcntl; lk=open(log_file+'.lock','a'); fcntl.flock(lk,fcntl.LOCK_EX); "
         f"data=json.load(open(log_file)) if os.path.exists(log_file) else {{'merged_videos':[]}}; "
         f"data['merged_videos']=[m for m in data['merged_videos'] if m.get('timestamp','')[:10]!='{date_str}']; "
-        f"json.dump(data,open(log_file,'w'),indent=2,ensure_ascii=False)\"",
+        f"json.dump(data,open(log_file+'.tmp','w'),indent=2,ensure_ascii=False); "
+        f"os.replace(log_file+'.tmp',log_file)\"",
         f"删除 {date_str} 的合并记录"
     )
+    refresh_merge_index(account)
     
     # 7. 清理Redis缓存
     print("\n7️⃣ 清理Redis缓存...")
@@ -188,11 +205,14 @@ def rollback_from_record(record_file):
         "social-media-hub-merger-1",
         f"python -c \"import json,os; "
         f"log_file='/app/logs/merges/{account}_merged_record.json'; "
+        f"import fcntl; lk=open(log_file+'.lock','a'); fcntl.flock(lk,fcntl.LOCK_EX); "
         f"data=json.load(open(log_file)) if os.path.exists(log_file) else {{'merged_videos':[]}}; "
         f"data['merged_videos']=data['merged_videos'][:-1] if data['merged_videos'] else []; "
-        f"json.dump(data,open(log_file,'w'),indent=2,ensure_ascii=False)\"",
+        f"json.dump(data,open(log_file+'.tmp','w'),indent=2,ensure_ascii=False); "
+        f"os.replace(log_file+'.tmp',log_file)\"",
         "删除最后一条合并记录"
     )
+    refresh_merge_index(account)
     
     # 显示上传的视频
     if record.get('uploaded_videos'):
@@ -254,11 +274,14 @@ def rollback_last_merge(account):
         "social-media-hub-merger-1",
         f"python -c \"import json,os; "
         f"log_file='/app/logs/merges/{account}_merged_record.json'; "
+        f"import fcntl; lk=open(log_file+'.lock','a'); fcntl.flock(lk,fcntl.LOCK_EX); "
         f"data=json.load(open(log_file)); "
         f"data['merged_videos'].pop(); "
-        f"json.dump(data,open(log_file,'w'),indent=2,ensure_ascii=False)\"",
+        f"json.dump(data,open(log_file+'.tmp','w'),indent=2,ensure_ascii=False); "
+        f"os.replace(log_file+'.tmp',log_file)\"",
         "删除记录（序号回退）"
     )
+    refresh_merge_index(account)
     
     # 4. 清理Redis
     print("\n4️⃣ 清理Redis缓存...")
@@ -3,14 +3,24 @@
 完整流程执行脚本 (Docker版本)
 通过API Gateway调用容器服务
 扫描  下载  合并  上传
-失败立即停止
+每一步等上一步的任务真正完成后立即开始（workflow_engine），不再固定 sleep；
+查不到状态的阶段（扫描、下载）提交成功就进入下一步
+失败或超时立即停止
+--stream: 下载、标准化、合并逐个视频交接（clip_stream.py），三步同时进行
+--resume: 从上一次失败/中断的地方继续（workflow_checkpoints.py），已完成的阶段不再执行
+--server: 整个计划一次提交给 gateway 的 /workflow（workflow_api.py），由服务端执行，
+          客户端可以跟踪进度，也可以 --detach 提交完就退出
 """
 import requests
+import http_client
 import time
 import argparse
 import json
 import sys
 
+from workflow_checkpoints import get_checkpoints
+from workflow_engine import FAILED_STATUSES, Stage, StageFailed, WorkflowEngine
+
 
 API_BASE = "http://localhost:8080/api"
 
@@ -36,7 +46,7 @@ def call_api(endpoint, data):
         print(f" 调用API: {url}")
         print(f" 参数: {json.dumps(data, ensure_ascii=False)}")
         
-        response = requests.post(url, json=data, timeout=10)
+        response = http_client.post(url, json=data, timeout=10)
         
         # 检查HTTP状态码
         if response.status_code != 200:
@@ -56,12 +66,250 @@ def call_api(endpoint, data):
         return None
 
 
+STAGE_TIMEOUTS = {
+    "scan": 300,
+    "download": 1800,
+    "standardize": 1800,
+    "merge": 1800,
+    "upload": 3600,
+}
+
+STAGE_LABELS = {
+    "scan": "扫描",
+    "download": "下载",
+    "standardize": "标准化",
+    "merge": "合并",
+    "upload": "上传",
+}
+
+
+# gateway 上真正存在的状态接口：只有标准化按 task_id 查，合并/上传按账号查，
+# 扫描和下载没有状态接口，服务也还不发 publish_task_event，这两个阶段提交即完成（has_status）
+STATUS_ROUTES = {
+    "standardize": "/standardize/status/{task_id}",
+    "merge": "/merge/status/{account}",
+    "upload": "/upload/status/{account}",
+}
+
+
+def query_task_status(stage, task_id, account=None):
+    """
+    查询任务状态：优先用长轮询 /tasks/{task_id}/wait（task_events.py，状态一变就返回），
+    这个任务还没有事件（404）时，退回 STATUS_ROUTES 里这个阶段的状态接口。
+    状态接口返回 404 说明路由不存在或任务不存在，当作失败，不当作"还在运行"。
+    两边都查不到时返回 {"status": "unknown"}，阶段继续等到自己的超时。
+    """
+    try:
+        response = http_client.get(f"{API_BASE}/tasks/{task_id}/wait", params={"timeout": 20}, timeout=30)
+        if response.status_code == 200:
+            return response.json()
+    except requests.exceptions.RequestException:
+        pass
+
+    route = STATUS_ROUTES.get(stage.name)
+    if route is None:
+        return {"status": "unknown"}
+    url = API_BASE + route.format(task_id=task_id, account=account)
+    try:
+        response = http_client.get(url, timeout=10)
+    except requests.exceptions.RequestException:
+        # 网关暂时连不上就当作还在运行，超时由阶段自己控制
+        return {"status": "unknown"}
+    if response.status_code == 404:
+        return {"status": "error", "error": f"状态接口 404: {url}"}
+    if response.status_code != 200:
+        return {"status": "unknown"}
+    info = response.json()
+    if "{account}" in route and info.get("task_id") not in (None, task_id):
+        # 按账号查询返回的是这个账号别的任务
+        return {"status": "unknown"}
+    return info
+
+
+def has_status(stage_name):
+    """
+    这个阶段的任务能不能查到状态。扫描和下载没有状态接口，服务也不发 publish_task_event，
+    /tasks/<task_id>/wait 永远是 404：这两个阶段提交成功就当作完成，不去等到超时
+    """
+    return stage_name in STATUS_ROUTES
+
+
+def make_status_fn(account):
+    """WorkflowEngine 用的 status_fn(stage, task_id)，按账号查询的阶段带上账号"""
+    def status_fn(stage, task_id):
+        return query_task_status(stage, task_id, account)
+    return status_fn
+
+
+def submit_task(step_num, total_steps, label, endpoint, data, stage=None):
+    """
+    提交一个阶段的任务，返回 task_id；失败抛出 StageFailed。
+    stage 是没有状态接口的阶段（has_status）时返回 None，WorkflowEngine 当作提交即完成
+    """
+    print_step(step_num, total_steps, label)
+    result = call_api(endpoint, data)
+    if not result or result.get("status") != "success":
+        error = result.get("error") if result else "API调用失败"
+        raise StageFailed(error)
+    task_id = result.get("task_id")
+    print(f" 任务已提交: {task_id}")
+    if stage is not None and not has_status(stage):
+        print(f" {STAGE_LABELS.get(stage, stage)}没有状态接口，提交后直接进入下一步")
+        return None
+    return task_id
+
+
+def build_stages(account, download_limit, merge_count, resolution, upload, run_id=None, stream=False):
+    """
+    扫描 → 下载 → 标准化 → 合并 → 上传，每一步等上一步的任务完成后才开始。
+    stream=True 时按流式执行：扫描完成后下载和合并同时开始，下载完一个视频就交给
+    标准化（常驻消费 clips:downloaded 流），合并服务凑够片段就合并，
+    这一轮的片段全部处理完时合并任务结束。
+    run_id 随任务传给服务端，重试时服务端据此跳过这一轮已经处理过的视频。
+    """
+    if stream:
+        return build_streaming_stages(account, download_limit, merge_count, resolution, upload, run_id)
+    total = 5 if upload else 4
+    stages = [
+        Stage("scan", lambda ctx: submit_task(1, total, " 扫描新内容", "/scanner/scan", {
+            "account": account,
+            "limit": 50
+        }, stage="scan"), timeout=STAGE_TIMEOUTS["scan"], service="scanner"),
+        Stage("download", lambda ctx: submit_task(2, total, f"  下载视频 (限制 {download_limit} 个)", "/downloader/download", {
+            "account": account,
+            "max_downloads": download_limit,
+            "run_id": run_id
+        }, stage="download"), after=["scan"], timeout=STAGE_TIMEOUTS["download"], service="downloader"),
+        Stage("standardize", lambda ctx: submit_task(3, total, f" 标准化处理 (分辨率: {resolution})", "/standardizer/process", {
+            "account": account,
+            "resolution": resolution,
+            "run_id": run_id
+        }, stage="standardize"), after=["download"], timeout=STAGE_TIMEOUTS["standardize"], service="standardizer"),
+        Stage("merge", lambda ctx: submit_task(4, total, f" 合并视频 (数量: {merge_count})", "/merger/merge", {
+            "account": account,
+            "limit": merge_count,
+            "run_id": run_id
+        }, stage="merge"), after=["standardize"], timeout=STAGE_TIMEOUTS["merge"], service="merger"),
+    ]
+    if upload:
+        stages.append(Stage("upload", lambda ctx: submit_task(5, total, "  上传到B站", "/uploader/upload", {
+            "account": account,
+            "video_path": None
+        }, stage="upload"), after=["merge"], timeout=STAGE_TIMEOUTS["upload"], service="uploader"))
+    return stages
+
+
+def build_streaming_stages(account, download_limit, merge_count, resolution, upload, run_id):
+    total = 4 if upload else 3
+    stages = [
+        Stage("scan", lambda ctx: submit_task(1, total, " 扫描新内容", "/scanner/scan", {
+            "account": account,
+            "limit": 50
+        }, stage="scan"), timeout=STAGE_TIMEOUTS["scan"], service="scanner"),
+        Stage("download", lambda ctx: submit_task(2, total, f"  下载视频 (限制 {download_limit} 个，逐个交给标准化)", "/downloader/download", {
+            "account": account,
+            "max_downloads": download_limit,
+            "stream": True,
+            "run_id": run_id
+        }, stage="download"), after=["scan"], timeout=STAGE_TIMEOUTS["download"], service="downloader"),
+        Stage("merge", lambda ctx: submit_task(3, total, f" 标准化 + 合并 (分辨率: {resolution}, 每 {merge_count} 个合并一次)", "/merger/merge", {
+            "account": account,
+            "limit": merge_count,
+            "resolution": resolution,
+            "stream": True,
+            "run_id": run_id
+        }, stage="merge"), after=["scan"], timeout=STAGE_TIMEOUTS["download"] + STAGE_TIMEOUTS["merge"], service="merger"),
+    ]
+    if upload:
+        stages.append(Stage("upload", lambda ctx: submit_task(4, total, "  上传到B站", "/uploader/upload", {
+            "account": account,
+            "video_path": None
+        }, stage="upload"), after=["merge"], timeout=STAGE_TIMEOUTS["upload"], service="uploader"))
+    return stages
+
+
+def task_still_valid(stage, task_id, account=None):
+    """
+    中断前提交的任务在服务端是否还在跑或已经完成（是的话接着等，不重新提交）。
+    查不到这个任务的状态时按无效处理，重新提交（服务端按 run_id 跳过已经处理过的视频）。
+    """
+    status = str(query_task_status(stage, task_id, account).get("status", "")).lower()
+    return status not in ("", "unknown", "pending") + FAILED_STATUSES
+
+
+def make_resumable(stages, checkpoints, run_id):
+    """
+    恢复执行时：上次已经提交、服务端还有效的任务直接接着等；
+    提交新任务后马上记下 task_id，下次中断也能接上。
+    """
+    previous = checkpoints.stages(run_id)
+    account = (checkpoints.get_run(run_id) or {}).get("account")
+    for stage in stages:
+        def submit(ctx, stage=stage, submit_new=stage.submit):
+            task_id = (previous.get(stage.name) or {}).get("task_id")
+            if (task_id and previous[stage.name]["status"] == "running"
+                    and task_still_valid(stage, task_id, account)):
+                print(f" 接着等待上次提交的{STAGE_LABELS.get(stage.name, stage.name)}任务: {task_id}")
+                return task_id
+            task_id = submit_new(ctx)
+            checkpoints.mark_stage(run_id, stage.name, "running", task_id=task_id)
+            return task_id
+        stage.submit = submit
+    return stages
+
+
+def record_event(checkpoints, run_id, on_event):
+    """
+    阶段完成/失败时写断点，然后交给 on_event。
+    被连带取消的阶段保持 running：服务端的任务可能还在跑，恢复时接着等
+    """
+    def handler(event, stage, info):
+        if event == "completed":
+            checkpoints.mark_stage(run_id, stage.name, "completed", result=info)
+        elif event == "failed":
+            checkpoints.mark_stage(run_id, stage.name, "failed", result=info)
+        on_event(event, stage, info)
+    return handler
+
+
+def print_event(event, stage, info):
+    """阶段状态变化时打印"""
+    label = STAGE_LABELS.get(stage.name, stage.name)
+    if event == "progress" and info.get("progress"):
+        progress = info["progress"]
+        print(f"   {label}进度: {progress.get('completed', 0)}/{progress.get('total', 0)}")
+    elif event == "completed":
+        print(f" {label}完成，耗时 {info['elapsed']:.1f} 秒")
+    elif event == "failed":
+        print(f"\n {label}失败: {info.get('error')}")
+        print(" 流程终止")
+
+
 def run_full_workflow(account: str, 
                      download_limit: int = 20,
                      merge_count: int = 15,
                      resolution: str = "1080x1920",
-                     skip_upload: bool = False):
-    """执行完整工作流程"""
+                     skip_upload: bool = False,
+                     stream: bool = False,
+                     resume: str = None):
+    """执行完整工作流程；resume 是 run_id 或 "latest"（这个账号最近一次没完成的执行）"""
+    checkpoints = get_checkpoints()
+    run = None
+    if resume:
+        run = checkpoints.get_run(resume) if resume != "latest" else checkpoints.latest_unfinished(account)
+        if run is None:
+            print(f" 没有可以恢复的执行 ({resume})，重新开始")
+        elif run["status"] == "completed":
+            print(f" {run['run_id']} 已经完成，不需要恢复")
+            return True
+        else:
+            # 恢复时沿用当时的参数，保证跳过的阶段和接下来的阶段是同一批视频
+            account = run["account"]
+            download_limit = run["params"].get("download_limit", download_limit)
+            merge_count = run["params"].get("merge_count", merge_count)
+            resolution = run["params"].get("resolution", resolution)
+            stream = run["params"].get("stream", stream)
+    
     
     print_banner(" 开始执行完整工作流程 (Docker版本)")
     print(f"\n 配置:")
@@ -71,150 +319,151 @@ def run_full_workflow(account: str,
     print(f"   分辨率: {resolution}")
     print(f"   API地址: {API_BASE}")
     print(f"   跳过上传: {'是' if skip_upload else '否'}")
+    print(f"   流式交接: {'是' if stream else '否'}")
+    if run:
+        print(f"   恢复执行: {run['run_id']}")
+    
+    # 上传确认放在最前面，流程开始后不再需要人等着
+    upload = False
+    if not skip_upload:
+        confirm = input("\n  流程完成后上传视频到B站吗？(y/N): ").strip().lower()
+        upload = confirm == 'y'
+        if not upload:
+            print("  跳过上传步骤")
+    
+    if run:
+        run_id = run["run_id"]
+        checkpoints.set_run_status(run_id, "running")
+    else:
+        run_id = checkpoints.start_run(account, {
+            "download_limit": download_limit,
+            "merge_count": merge_count,
+            "resolution": resolution,
+            "stream": stream,
+            "upload": upload,
+        })
+    
+    # 已完成的阶段放进 results，引擎不会再执行它们
+    context = {"account": account, "run_id": run_id, "results": checkpoints.completed_stages(run_id)}
+    if context["results"]:
+        done = ", ".join(STAGE_LABELS.get(name, name) for name in context["results"])
+        print(f"\n 跳过已完成的阶段: {done}")
     
     start_time = time.time()
-    task_ids = []
+    engine = WorkflowEngine(
+        make_resumable(build_stages(account, download_limit, merge_count, resolution, upload, run_id, stream),
+                       checkpoints, run_id),
+        status_fn=make_status_fn(account),
+        on_event=record_event(checkpoints, run_id, print_event),
+    )
     
     try:
-        # 步骤1: 扫描新内容
-        print_step(1, 5, " 扫描新内容")
-        print("  扫描会在遇到已下载视频时自动停止，避免封号风险\n")
-        
-        result = call_api("/scanner/scan", {
-            "account": account,
-            "limit": 50
-        })
-        
-        if not result or result.get("status") != "success":
-            error = result.get("error") if result else "API调用失败"
-            print(f"\n 步骤1失败: {error}")
-            print(" 流程终止")
-            return False
-        
-        task_id = result.get("task_id")
-        task_ids.append(("扫描", task_id))
-        print(f" 扫描任务已提交: {task_id}")
-        
-        print("\n 等待 3 秒...")
-        time.sleep(3)
-        
-        # 步骤2: 下载视频
-        print_step(2, 5, f"  下载视频 (限制 {download_limit} 个)")
-        print("开始下载新视频，智能去重...\n")
-        
-        result = call_api("/downloader/download", {
-            "account": account,
-            "max_downloads": download_limit
-        })
-        
-        if not result or result.get("status") != "success":
-            error = result.get("error") if result else "API调用失败"
-            print(f"\n 步骤2失败: {error}")
-            print(" 流程终止")
-            return False
-        
-        task_id = result.get("task_id")
-        task_ids.append(("下载", task_id))
-        print(f" 下载任务已提交: {task_id}")
-        
-        print("\n 等待 5 秒...")
-        time.sleep(5)
-        
-        # 步骤3: 标准化处理
-        print_step(3, 5, f" 标准化处理 (分辨率: {resolution})")
-        print("转换视频分辨率...\n")
-        
-        result = call_api("/standardizer/process", {
-            "account": account,
-            "resolution": resolution
-        })
-        
-        if not result or result.get("status") != "success":
-            error = result.get("error") if result else "API调用失败"
-            print(f"\n 步骤3失败: {error}")
-            print(" 流程终止")
-            return False
-        
-        task_id = result.get("task_id")
-        task_ids.append(("标准化", task_id))
-        print(f" 标准化任务已提交: {task_id}")
-        
-        print("\n 等待 5 秒...")
-        time.sleep(5)
-        
-        # 步骤4: 合并视频
-        print_step(4, 5, f" 合并视频 (数量: {merge_count})")
-        print("合并多个视频...\n")
-        
-        result = call_api("/merger/merge", {
-            "account": account,
-            "limit": merge_count
-        })
-        
-        if not result or result.get("status") != "success":
-            error = result.get("error") if result else "API调用失败"
-            print(f"\n 步骤4失败: {error}")
-            print(" 流程终止")
-            return False
-        
-        task_id = result.get("task_id")
-        task_ids.append(("合并", task_id))
-        print(f" 合并任务已提交: {task_id}")
-        
-        print("\n 等待 5 秒...")
-        time.sleep(5)
-        
-        # 步骤5: 上传B站
-        if not skip_upload:
-            print_step(5, 5, "  上传到B站")
-            
-            confirm = input("  确定要上传视频到B站吗？(y/N): ").strip().lower()
-            if confirm == 'y':
-                result = call_api("/uploader/upload", {
-                    "account": account,
-                    "video_path": None
-                })
-                
-                if not result or result.get("status") != "success":
-                    error = result.get("error") if result else "API调用失败"
-                    print(f"\n 步骤5失败: {error}")
-                    print(" 流程终止")
-                    return False
-                
-                task_id = result.get("task_id")
-                task_ids.append(("上传", task_id))
-                print(f" 上传任务已提交: {task_id}")
-            else:
-                print("  跳过上传步骤")
-        else:
-            print_step(5, 5, "  跳过上传步骤")
-        
-        # 完成
-        elapsed = time.time() - start_time
-        print_banner(f" 完整流程执行完成！耗时: {elapsed:.1f} 秒")
-        
-        # 显示所有任务ID
-        if task_ids:
-            print("\n 已提交的任务:")
-            for name, task_id in task_ids:
-                print(f"   {name}: {task_id}")
-        
-        print("\n 提示: 任务正在后台处理中，可以通过以下命令查看日志:")
-        print(f"   docker logs social-media-hub-scanner-1 -f")
-        print(f"   docker logs social-media-hub-downloader-1 -f")
-        print(f"   docker logs social-media-hub-merger-1 -f")
-        print(f"   docker logs social-media-hub-uploader-1 -f")
-        
-        return True
-        
+        results = engine.run(context)
     except KeyboardInterrupt:
+        engine.cancel()
+        checkpoints.set_run_status(run_id, "failed")
         print("\n\n  用户中断执行")
+        print(f"   继续执行: python run_full_workflow.py {account} --resume {run_id}")
         return False
     except Exception as e:
         print(f"\n 流程执行出错: {e}")
         import traceback
         traceback.print_exc()
+        checkpoints.set_run_status(run_id, "failed")
+        return False
+    
+    elapsed = time.time() - start_time
+    
+    # 显示所有任务ID
+    print("\n 任务:")
+    for name, result in results.items():
+        label = STAGE_LABELS.get(name, name)
+        if result["status"] == "completed":
+            print(f"   {label}: {result.get('task_id')} ({result.get('elapsed', 0):.1f} 秒)")
+        else:
+            print(f"   {label}: {result['status']} {result.get('error', '')}")
+    
+    if context.get("failed"):
+        print_banner(f" 流程在「{STAGE_LABELS.get(context['failed'], context['failed'])}」失败，耗时: {elapsed:.1f} 秒")
+        print("\n 查看日志:")
+        print(f"   docker logs social-media-hub-{engine.stages[context['failed']].service}-1 --tail 50")
+        print(f"\n 修复后从失败的阶段继续: python run_full_workflow.py {account} --resume {run_id}")
+        checkpoints.set_run_status(run_id, "failed")
+        return False
+    
+    checkpoints.set_run_status(run_id, "completed")
+    print_banner(f" 完整流程执行完成！耗时: {elapsed:.1f} 秒")
+    return True
+
+
+def run_on_server(account: str,
+                  download_limit: int = 20,
+                  merge_count: int = 15,
+                  resolution: str = "1080x1920",
+                  skip_upload: bool = False,
+                  stream: bool = False,
+                  resume: str = None,
+                  detach: bool = False):
+    """把整个计划提交给 gateway 的 /workflow，服务端执行；detach=False 时跟踪到结束"""
+    from workflow_api import follow_workflow
+    
+    print_banner(" 提交完整工作流程到服务端")
+    if resume:
+        plan = {"account": account, "resume": resume}
+        if resume == "latest":
+            response = http_client.get(f"{API_BASE}/workflow", params={"account": account}, timeout=10)
+            response.raise_for_status()
+            unfinished = [r for r in response.json()["runs"] if r["status"] in ("running", "failed") and not r["active"]]
+            if not unfinished:
+                print(f" {account} 没有可以恢复的执行")
+                return False
+            plan["resume"] = unfinished[0]["run_id"]
+    else:
+        upload = False
+        if not skip_upload:
+            upload = input("\n  流程完成后上传视频到B站吗？(y/N): ").strip().lower() == 'y'
+        plan = {
+            "account": account,
+            "download_limit": download_limit,
+            "merge_count": merge_count,
+            "resolution": resolution,
+            "upload": upload,
+            "stream": stream,
+        }
+    
+    result = call_api("/workflow", plan)
+    if not result or result.get("status") != "success":
+        print(f" 提交失败: {result.get('error') if result else 'API调用失败'}")
+        return False
+    run_id = result["run_id"]
+    print(f"\n 已提交: {run_id}")
+    if detach:
+        print(f"   查看进度: GET {API_BASE}/workflow/{run_id}")
+        return True
+    
+    def on_change(stage):
+        label = STAGE_LABELS.get(stage["name"], stage["name"])
+        if stage.get("progress") and stage["status"] == "running":
+            print(f"   {label}进度: {stage['progress'].get('completed', 0)}/{stage['progress'].get('total', 0)}")
+        elif stage["status"] == "running":
+            print(f" {label}开始: {stage.get('task_id')}")
+        elif stage["status"] == "completed":
+            print(f" {label}完成，耗时 {stage.get('elapsed') or 0:.1f} 秒")
+        elif stage["status"] == "failed":
+            print(f" {label}失败: {stage.get('error')}")
+    
+    try:
+        status = follow_workflow(API_BASE, run_id, on_change=on_change)
+    except KeyboardInterrupt:
+        print(f"\n\n  停止跟踪（服务端继续执行）: GET {API_BASE}/workflow/{run_id}")
+        return True
+    
+    if status["status"] != "completed":
+        print_banner(f" 流程{status['status']}: {run_id}")
+        print(f"\n 修复后继续: python run_full_workflow.py {status['account']} --server --resume {run_id}")
         return False
+    print_banner(f" 完整流程执行完成！({run_id})")
+    return True
 
 
 def main():
@@ -227,6 +476,9 @@ def main():
   python run_full_workflow.py ai_vanvan -d 20 -m 15        # 下载20个，合并15个
   python run_full_workflow.py aigf8728 -r 720x1280         # 使用720p分辨率
   python run_full_workflow.py ai_vanvan --skip-upload      # 跳过上传
+  python run_full_workflow.py ai_vanvan --stream           # 下载/标准化/合并同时进行
+  python run_full_workflow.py ai_vanvan --resume           # 从上次失败的阶段继续
+  python run_full_workflow.py ai_vanvan --server --detach  # 交给服务端执行，提交完就退出
 
 注意: 需要确保Docker容器正在运行 (docker-compose up -d)
         """
@@ -241,15 +493,28 @@ def main():
                        help="目标分辨率 (默认: 1080x1920)")
     parser.add_argument("--skip-upload", action="store_true",
                        help="跳过上传步骤")
+    parser.add_argument("--stream", action="store_true",
+                       help="逐个视频交接：下载完一个就标准化，凑够就合并（需要服务端消费 clip_stream 流）")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="RUN_ID",
+                       help="从上次没完成的执行继续（不写 RUN_ID 就是这个账号最近一次）")
+    parser.add_argument("--server", action="store_true",
+                       help="整个计划提交给 gateway 的 /workflow，由服务端执行")
+    parser.add_argument("--detach", action="store_true",
+                       help="和 --server 一起用：提交后直接退出，不跟踪进度")
     
     args = parser.parse_args()
     
-    success = run_full_workflow(
+    run = run_on_server if args.server else run_full_workflow
+    options = {"detach": args.detach} if args.server else {}
+    success = run(
         account=args.account,
         download_limit=args.download,
         merge_count=args.merge,
         resolution=args.resolution,
-        skip_upload=args.skip_upload
+        skip_upload=args.skip_upload,
+        stream=args.stream,
+        resume=args.resume,
+        **options
     )
     
     sys.exit(0 if success else 1)
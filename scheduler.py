@@ -0,0 +1,370 @@
+"""
+定时执行 - 按账号随机时段运行，带每天/每周下载上限
+
+以前要么手动跑，要么照 BILIUP_API_GUIDE.md 里的 CronJob 每天固定时间 curl 一次。
+AI_VANVAN_BAN_ANALYSIS.md 的结论是固定时间、每天都跑、短时间大量下载最容易被封。
+
+这里常驻一个调度进程（和 API Gateway 放在一起）：
+  - 每个账号每天在配置的时间窗口里随机挑时间运行（有一定概率整天不运行），
+    两次运行至少隔 min_gap_hours 小时；当天的计划保存在 logs/scheduler_state.json，重启不会重新抽
+  - 每次下载数量 = min(downloads_per_run, 今天剩余额度, 最近 7 天剩余额度)，额度用完就跳过
+  - 标准化/合并是 CPU 密集型：全局最多 --heavy-slots 个同时跑，而且机器负载
+    （1 分钟 load / CPU 数）低于 --max-load 才开始；几个账号同时触发时，重活排队等空闲
+  - 调度进程停掉期间错过的时间点不补跑（避免一启动就集中下载）
+
+每个账号的配置写在 config/accounts.json 的 "schedule" 里（没写的项用 DEFAULT_SCHEDULE）：
+    "schedule": {
+      "windows": ["09:30-12:00", "20:00-23:30"],
+      "runs_per_day": 1,
+      "max_daily_downloads": 10,
+      "max_weekly_downloads": 30
+    }
+
+用法:
+  python scheduler.py run                    # config 里有 "schedule" 的账号
+  python scheduler.py run ai_vanvan          # 指定账号（没有 "schedule" 就用默认值）
+  python scheduler.py plan                   # 今天的计划
+  python scheduler.py budget                 # 额度使用情况
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+from multi_account_runner import AccountPipeline, PooledClient, load_accounts
+from record_writer import write_json_atomic
+from run_full_workflow import API_BASE
+
+STATE_FILE = "logs/scheduler_state.json"
+MISSED_GRACE = timedelta(minutes=30)  # 超过这么久才发现的时间点算错过
+HISTORY_DAYS = 8
+
+DEFAULT_SCHEDULE = {
+    "windows": ["09:30-12:00", "14:00-18:30", "20:00-23:30"],
+    "runs_per_day": 1,
+    "skip_day_chance": 0.3,       # 不要每天都运行
+    "min_gap_hours": 4,
+    "downloads_per_run": 5,
+    "max_daily_downloads": 10,
+    "max_weekly_downloads": 30,
+    "merge_count": 15,
+    "resolution": "1080x1920",
+    "upload": False,
+}
+
+
+def parse_window(text):
+    """"09:30-12:00" -> (570, 720)（当天的分钟数），不支持跨午夜"""
+    start, _, end = text.partition("-")
+    minutes = []
+    for part in (start, end):
+        hour, _, minute = part.strip().partition(":")
+        minutes.append(int(hour) * 60 + int(minute or 0))
+    if not 0 <= minutes[0] < minutes[1] <= 24 * 60:
+        raise ValueError(f"时间窗口格式不对: {text}")
+    return minutes[0], minutes[1]
+
+
+def plan_day(day, schedule, rng=random):
+    """在时间窗口里随机挑当天的运行时间，返回排好序的 [datetime]"""
+    if rng.random() < schedule["skip_day_chance"]:
+        return []
+    windows = [parse_window(w) for w in schedule["windows"]]
+    total = sum(end - start for start, end in windows)
+    min_gap = timedelta(hours=schedule["min_gap_hours"])
+    midnight = datetime.combine(day, datetime.min.time())
+    slots = []
+    for _ in range(50):
+        if len(slots) >= schedule["runs_per_day"]:
+            break
+        # 按窗口长度加权随机挑一分钟，再随机到秒
+        offset = rng.uniform(0, total)
+        for start, end in windows:
+            if offset < end - start:
+                break
+            offset -= end - start
+        slot = (midnight + timedelta(minutes=start + min(offset, end - start - 1))).replace(microsecond=0)
+        if all(abs(slot - other) >= min_gap for other in slots):
+            slots.append(slot)
+    return sorted(slots)
+
+
+def recorded_downloads(account, since):
+    """本地下载记录里 since 之后成功下载的个数；没有记录返回 0"""
+    from record_model import load_download_table
+
+    try:
+        table = load_download_table(account)
+    except (OSError, ValueError):
+        return 0
+    since_text = since.isoformat()
+    return sum(1 for record in table if record.status == "success" and record.download_time >= since_text)
+
+
+class IdleGate:
+    """标准化/合并的闸门：最多 slots 个同时跑，而且机器空闲才开始"""
+
+    def __init__(self, slots=1, max_load=0.75, check_interval=30):
+        self.max_load = max_load
+        self.check_interval = check_interval
+        self._semaphore = asyncio.Semaphore(slots)
+
+    def busy(self):
+        if not hasattr(os, "getloadavg"):
+            return False
+        return os.getloadavg()[0] / (os.cpu_count() or 1) > self.max_load
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            while self.busy():
+                await asyncio.sleep(self.check_interval)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._semaphore.release()
+
+
+class Scheduler:
+    """按计划触发各账号的流水线"""
+
+    def __init__(self, accounts, state_file=STATE_FILE, heavy_slots=1, max_load=0.75,
+                 base_url=API_BASE, rng=None):
+        self.accounts = accounts
+        self.state_file = state_file
+        self.heavy_slots = heavy_slots
+        self.max_load = max_load
+        self.base_url = base_url
+        self.rng = rng or random.SystemRandom()
+        self.state = self.load_state()
+
+    def log(self, message):
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+    # ------------------------------------------------------------------
+    # 状态
+    # ------------------------------------------------------------------
+
+    def load_state(self):
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                state.setdefault("plans", {})
+                state.setdefault("history", {})
+                return state
+            except (json.JSONDecodeError, OSError):
+                pass
+        return {"plans": {}, "history": {}}
+
+    def save_state(self):
+        cutoff = (datetime.now() - timedelta(days=HISTORY_DAYS)).isoformat()
+        for account, runs in self.state["history"].items():
+            self.state["history"][account] = [run for run in runs if run["time"] >= cutoff]
+        write_json_atomic(self.state_file, self.state)
+
+    def schedule_for(self, account):
+        return {**DEFAULT_SCHEDULE, **self.accounts[account].get("schedule", {})}
+
+    # ------------------------------------------------------------------
+    # 计划
+    # ------------------------------------------------------------------
+
+    def ensure_plans(self, today=None):
+        """每个账号当天的计划，没有就抽一次"""
+        today = today or date.today()
+        changed = False
+        for account in self.accounts:
+            plan = self.state["plans"].get(account)
+            if plan and plan["date"] == today.isoformat():
+                continue
+            slots = plan_day(today, self.schedule_for(account), self.rng)
+            self.state["plans"][account] = {
+                "date": today.isoformat(),
+                "slots": [slot.isoformat() for slot in slots],
+                "done": {},
+            }
+            changed = True
+            self.log(f"📅 {account} 今天的计划: {', '.join(s.strftime('%H:%M') for s in slots) or '不运行'}")
+        if changed:
+            self.save_state()
+
+    def due(self, now):
+        """到点了还没处理的 [(账号, 时间点)]"""
+        return [
+            (account, slot)
+            for account, plan in self.state["plans"].items()
+            if account in self.accounts
+            for slot in plan["slots"]
+            if slot not in plan["done"] and datetime.fromisoformat(slot) <= now
+        ]
+
+    def next_wakeup(self, now):
+        upcoming = [
+            datetime.fromisoformat(slot)
+            for account, plan in self.state["plans"].items()
+            if account in self.accounts
+            for slot in plan["slots"]
+            if slot not in plan["done"] and datetime.fromisoformat(slot) > now
+        ]
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        return min(upcoming + [tomorrow, now + timedelta(minutes=10)])
+
+    # ------------------------------------------------------------------
+    # 额度
+    # ------------------------------------------------------------------
+
+    def used_downloads(self, account, since):
+        """
+        since 之后用掉的下载额度：调度器按每次申请的数量记账（上限，偏保守），
+        本地有下载记录时再和实际下载数取大的（手动跑的也算进去）
+        """
+        scheduled = sum(
+            run["downloads"] for run in self.state["history"].get(account, [])
+            if run["time"] >= since.isoformat()
+        )
+        return max(scheduled, recorded_downloads(account, since))
+
+    def budget(self, account, now=None):
+        now = now or datetime.now()
+        schedule = self.schedule_for(account)
+        day_used = self.used_downloads(account, datetime.combine(now.date(), datetime.min.time()))
+        week_used = self.used_downloads(account, now - timedelta(days=7))
+        return {
+            "day_used": day_used,
+            "week_used": week_used,
+            "allowed": max(0, min(
+                schedule["downloads_per_run"],
+                schedule["max_daily_downloads"] - day_used,
+                schedule["max_weekly_downloads"] - week_used,
+            )),
+        }
+
+    # ------------------------------------------------------------------
+    # 执行
+    # ------------------------------------------------------------------
+
+    async def run_slot(self, client, gate, account, slot, now):
+        plan = self.state["plans"][account]
+        if now - datetime.fromisoformat(slot) > MISSED_GRACE:
+            plan["done"][slot] = "missed"
+            self.save_state()
+            self.log(f"⏭️  {account} {slot} 已经错过，不补跑")
+            return
+
+        allowed = self.budget(account, now)["allowed"]
+        if allowed <= 0:
+            plan["done"][slot] = "no_budget"
+            self.save_state()
+            self.log(f"⏭️  {account} 下载额度已用完，跳过这一次")
+            return
+
+        # 先记账再执行：执行中途重启也不会多下载
+        plan["done"][slot] = "running"
+        run = {"time": now.isoformat(), "slot": slot, "downloads": allowed, "ok": None}
+        self.state["history"].setdefault(account, []).append(run)
+        self.save_state()
+
+        schedule = self.schedule_for(account)
+        pipeline = AccountPipeline(
+            client, account, self.accounts[account], gate,
+            download_limit=allowed,
+            merge_count=schedule["merge_count"],
+            resolution=schedule["resolution"],
+            upload=schedule["upload"],
+        )
+        pipeline.log(f"⏰ 按计划开始 (下载 {pipeline.download_limit} 个)")
+        try:
+            ok = await pipeline.run()
+        except Exception as e:
+            pipeline.log(f"❌ 执行出错: {e}")
+            ok = False
+        run["ok"] = ok
+        plan["done"][slot] = "completed" if ok else "failed"
+        self.save_state()
+
+    async def run(self, stop=None):
+        """常驻执行，stop（asyncio.Event）被设置时结束"""
+        stop = stop or asyncio.Event()
+        client = PooledClient(self.base_url, pool_size=max(4, len(self.accounts) * 2))
+        gate = IdleGate(self.heavy_slots, self.max_load)
+        running = set()
+        self.log(f"🚀 调度器启动: {', '.join(self.accounts)}")
+        try:
+            while not stop.is_set():
+                now = datetime.now()
+                self.ensure_plans(now.date())
+                for account, slot in self.due(now):
+                    task = asyncio.create_task(self.run_slot(client, gate, account, slot, now))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                wait = (self.next_wakeup(now) - datetime.now()).total_seconds()
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=max(1.0, wait))
+                except asyncio.TimeoutError:
+                    pass
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        finally:
+            client.close()
+
+
+def select_accounts(names):
+    accounts = load_accounts(names or None)
+    if not names:
+        accounts = {name: config for name, config in accounts.items() if "schedule" in config}
+        if not accounts:
+            raise ValueError('config/accounts.json 里没有配置 "schedule" 的账号，请在命令行指定账号')
+    return accounts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按账号随机时段定时执行完整流程")
+    parser.add_argument("command", choices=["run", "plan", "budget"])
+    parser.add_argument("accounts", nargs="*", help='账号名（默认: 配置了 "schedule" 的账号）')
+    parser.add_argument("--heavy-slots", type=int, default=1, help="同时进行的标准化/合并数量 (默认: 1)")
+    parser.add_argument("--max-load", type=float, default=0.75,
+                        help="1 分钟负载 / CPU 数 超过这个值时标准化/合并等待 (默认: 0.75)")
+    args = parser.parse_args()
+
+    try:
+        accounts = select_accounts(args.accounts)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    scheduler = Scheduler(accounts, heavy_slots=args.heavy_slots, max_load=args.max_load)
+
+    if args.command == "run":
+        try:
+            asyncio.run(scheduler.run())
+        except KeyboardInterrupt:
+            print("\n⏹️  调度器已停止")
+    elif args.command == "plan":
+        scheduler.ensure_plans()
+        for account, plan in scheduler.state["plans"].items():
+            if account not in accounts:
+                continue
+            slots = [
+                f"{datetime.fromisoformat(s).strftime('%H:%M')}"
+                + (f" ({plan['done'][s]})" if s in plan["done"] else "")
+                for s in plan["slots"]
+            ]
+            print(f"📅 {account} {plan['date']}: {', '.join(slots) or '今天不运行'}")
+    elif args.command == "budget":
+        for account in accounts:
+            schedule = scheduler.schedule_for(account)
+            budget = scheduler.budget(account)
+            print(f"📊 {account}: 今天 {budget['day_used']}/{schedule['max_daily_downloads']}, "
+                  f"7 天 {budget['week_used']}/{schedule['max_weekly_downloads']}, "
+                  f"下一次最多下载 {budget['allowed']} 个")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+已下载 shortcode 集合 - 扫描器提前停止用
+
+扫描遇到已下载的帖子就停止。以前判断"是否已下载"要把整个下载历史读进来，
+或者像 test_function.check_if_downloaded 那样遍历 .json.xz 文件。
+这里给每个账号维护一个紧凑的磁盘集合，加载只要几毫秒：
+
+  logs/cache/{account}_seen.bin    头部 + 布隆过滤器 + 排好序的 64 位哈希数组
+  logs/cache/{account}_seen.tail   新增的 shortcode（每行一个，只追加）
+
+查询先过布隆过滤器（绝大多数新帖子在这里就返回 False），再二分查找哈希数组。
+tail 超过阈值后合并进 .bin。追加、合并、删除都拿 {account}_seen.bin.lock，
+合并时不会丢掉别的进程刚追加的 shortcode。
+删除下载记录（DownloadJournal.remove / remove_by_date、rollback_tool）时要同步 remove()，
+否则扫描器会把已经删掉的帖子当成下载过，提前停止。
+
+用法:
+  python seen_shortcodes.py build ai_vanvan                 # 从下载记录重建
+  python seen_shortcodes.py check ai_vanvan DMSpQtdt9F_ ... # 查询
+"""
+import hashlib
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from record_writer import FileLock
+
+CACHE_DIR = "logs/cache"
+MAGIC = b"SEEN1"
+HEADER = struct.Struct("<5sIIQ")  # magic, 布隆位数, 哈希函数个数, 哈希个数
+BITS_PER_ITEM = 10                # 约 1% 误判率
+NUM_HASHES = 7
+TAIL_COMPACT_THRESHOLD = 1000
+
+
+def shortcode_hash(shortcode):
+    """shortcode -> 64 位整数"""
+    return int.from_bytes(hashlib.blake2b(shortcode.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class SeenShortcodes:
+    """单个账号已下载 shortcode 的集合"""
+
+    def __init__(self, account_name, cache_dir=CACHE_DIR):
+        self.account_name = account_name
+        self.cache_dir = cache_dir
+        self.bin_file = os.path.join(cache_dir, f"{account_name}_seen.bin")
+        self.tail_file = os.path.join(cache_dir, f"{account_name}_seen.tail")
+        self.hashes = array("Q")
+        self.bloom = bytearray()
+        self.bloom_bits = 0
+        self.num_hashes = NUM_HASHES
+        self.tail = set()
+        self.lock = FileLock(self.bin_file)
+        self.load()
+
+    # ------------------------------------------------------------------
+    # 布隆过滤器
+    # ------------------------------------------------------------------
+
+    def _bloom_positions(self, h):
+        # 双重哈希：用 64 位哈希的高低 32 位生成 k 个位置
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(h1 + i * h2) % self.bloom_bits for i in range(self.num_hashes)]
+
+    def _bloom_add(self, h):
+        for pos in self._bloom_positions(h):
+            self.bloom[pos >> 3] |= 1 << (pos & 7)
+
+    def _bloom_maybe(self, h):
+        if not self.bloom_bits:
+            return True
+        return all(self.bloom[pos >> 3] & (1 << (pos & 7)) for pos in self._bloom_positions(h))
+
+    # ------------------------------------------------------------------
+    # 读写
+    # ------------------------------------------------------------------
+
+    def load(self):
+        self.hashes = array("Q")
+        self.bloom = bytearray()
+        self.bloom_bits = 0
+        self.tail = set()
+
+        if os.path.exists(self.bin_file):
+            with open(self.bin_file, "rb") as f:
+                magic, bloom_bits, num_hashes, count = HEADER.unpack(f.read(HEADER.size))
+                if magic != MAGIC:
+                    raise ValueError(f"不是 seen 文件: {self.bin_file}")
+                self.bloom_bits = bloom_bits
+                self.num_hashes = num_hashes
+                self.bloom = bytearray(f.read((bloom_bits + 7) // 8))
+                self.hashes.frombytes(f.read(count * 8))
+                if sys.byteorder != "little":
+                    self.hashes.byteswap()
+
+        if os.path.exists(self.tail_file):
+            with open(self.tail_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    shortcode = line.strip()
+                    if shortcode:
+                        self.tail.add(shortcode)
+                        if self.bloom_bits:
+                            self._bloom_add(shortcode_hash(shortcode))
+
+    def _write_bin(self, hashes):
+        hashes = array("Q", sorted(set(hashes)))
+        bloom_bits = max(len(hashes) * BITS_PER_ITEM, 64)
+        self.hashes = hashes
+        self.bloom_bits = bloom_bits
+        self.num_hashes = NUM_HASHES
+        self.bloom = bytearray((bloom_bits + 7) // 8)
+        for h in hashes:
+            self._bloom_add(h)
+
+        data = array("Q", hashes)
+        if sys.byteorder != "little":
+            data.byteswap()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_file = self.bin_file + ".tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(HEADER.pack(MAGIC, bloom_bits, NUM_HASHES, len(hashes)))
+            f.write(self.bloom)
+            f.write(data.tobytes())
+        os.replace(tmp_file, self.bin_file)
+
+    def _replace(self, hashes):
+        """写新的 .bin 并清空 tail（调用方已经拿着锁）"""
+        self._write_bin(hashes)
+        if os.path.exists(self.tail_file):
+            os.remove(self.tail_file)
+        self.tail = set()
+
+    def compact(self):
+        """把 tail 合并进 .bin"""
+        with self.lock:
+            # 重新读一遍，带上别的进程追加的 shortcode
+            self.load()
+            self._replace(list(self.hashes) + [shortcode_hash(s) for s in self.tail])
+
+    def rebuild(self, shortcodes):
+        """用完整的 shortcode 列表重建"""
+        with self.lock:
+            self._replace(shortcode_hash(s) for s in shortcodes)
+        return len(self.hashes)
+
+    def remove(self, shortcodes):
+        """删掉一批 shortcode（下载记录被删除、回退时调用），返回删掉的个数"""
+        targets = {shortcode_hash(s) for s in shortcodes}
+        if not targets:
+            return 0
+        with self.lock:
+            self.load()
+            hashes = list(self.hashes) + [shortcode_hash(s) for s in self.tail]
+            remaining = [h for h in hashes if h not in targets]
+            if len(remaining) == len(hashes):
+                return 0
+            self._replace(remaining)
+        return len(hashes) - len(remaining)
+
+    def add(self, shortcode):
+        """下载成功后调用"""
+        if shortcode in self:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self.lock:
+            with open(self.tail_file, "a", encoding="utf-8") as f:
+                f.write(shortcode + "\n")
+        self.tail.add(shortcode)
+        if self.bloom_bits:
+            self._bloom_add(shortcode_hash(shortcode))
+        if len(self.tail) >= TAIL_COMPACT_THRESHOLD:
+            self.compact()
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def __contains__(self, shortcode):
+        if shortcode in self.tail:
+            return True
+        h = shortcode_hash(shortcode)
+        if not self._bloom_maybe(h):
+            return False
+        i = bisect_left(self.hashes, h)
+        return i < len(self.hashes) and self.hashes[i] == h
+
+    def __len__(self):
+        return len(self.hashes) + len(self.tail)
+
+    def first_known(self, shortcodes):
+        """扫描页（从新到旧）中第一个已下载帖子的位置，没有则返回 None"""
+        for i, shortcode in enumerate(shortcodes):
+            if shortcode in self:
+                return i
+        return None
+
+
+def build_from_history(account_name, cache_dir=CACHE_DIR):
+    """从下载记录重建（只在第一次或修复时需要）"""
+    from download_journal import DownloadJournal
+
+    journal = DownloadJournal(account_name)
+    shortcodes = [d["shortcode"] for d in journal.get_downloads()
+                  if d.get("status") == "success" and d.get("shortcode")]
+    seen = SeenShortcodes(account_name, cache_dir=cache_dir)
+    seen.rebuild(shortcodes)
+    return seen
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    command, account = sys.argv[1], sys.argv[2]
+
+    if command == "build":
+        seen = build_from_history(account)
+        size_kb = os.path.getsize(seen.bin_file) / 1024
+        print(f"✅ 已重建: {seen.bin_file} ({len(seen)} 个, {size_kb:.1f} KB)")
+    elif command == "check":
+        seen = SeenShortcodes(account)
+        for shortcode in sys.argv[3:]:
+            status = "✅ 已下载" if shortcode in seen else "❌ 未下载"
+            print(f"{status}: {shortcode}")
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
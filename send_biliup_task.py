@@ -1,6 +1,8 @@
 import redis
 import json
 
+from work_queue import WorkQueue
+
 # 连接 Redis
 redis_client = redis.from_url("redis://localhost:6379")
 
@@ -14,7 +16,8 @@ task = {
 }
 
 # 发送到队列
-redis_client.rpush("biliup:queue", json.dumps(task))
+# 没设置 WORK_QUEUE_STREAMS=1 时写旧列表（服务还在 BRPOP），切换步骤见 work_queue.py 的迁移说明
+WorkQueue(redis_client, "biliup:queue").enqueue(task)
 
 print("✅ 任务已发送到 biliup:queue")
 print(f"账号: {task['account']}")
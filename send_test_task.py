@@ -2,6 +2,8 @@
 import redis
 import json
 
+from work_queue import WorkQueue
+
 # 连接Redis
 r = redis.Redis(host='localhost', port=6379, decode_responses=True)
 
@@ -17,5 +19,6 @@ task = {
 }
 
 # 发送任务
-r.lpush('upload_queue', json.dumps(task, ensure_ascii=False))
+# 没设置 WORK_QUEUE_STREAMS=1 时写旧列表（服务还在 BRPOP），切换步骤见 work_queue.py 的迁移说明
+WorkQueue(r, 'upload_queue').enqueue(task)
 print(f"✅ 任务已发送: {task['title']}")
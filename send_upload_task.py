@@ -2,12 +2,11 @@
 import redis
 import json
 
+from work_queue import WorkQueue
+
 # 连接Redis
 r = redis.Redis(host='localhost', port=6379, decode_responses=True)
 
-# 清空队列
-r.delete('upload_queue')
-
 # 创建任务
 task = {
     "account": "ai_vanvan",
@@ -17,11 +16,13 @@ task = {
     "tags": ["搞笑", "海外", "生活"]
 }
 
-# 推送到队列
-r.lpush('upload_queue', json.dumps(task))
-
-print(f"✅ 任务已发送: {task}")
+# 推送到队列（写流时同一个视频已经在队列里或已经处理过不会重复放入，不用再清空队列）
+# 没设置 WORK_QUEUE_STREAMS=1 时写旧列表（服务还在 BRPOP），切换步骤见 work_queue.py 的迁移说明
+if WorkQueue(r, 'upload_queue').enqueue(task) is None:
+    print(f"⏭️  同一个任务已经在队列里或已经处理过: {task['title']}")
+else:
+    print(f"✅ 任务已发送: {task}")
 
 # 验证
-length = r.llen('upload_queue')
+length = WorkQueue(r, 'upload_queue').backlog()
 print(f"📊 队列长度: {length}")
@@ -0,0 +1,176 @@
+"""
+.json.xz 元数据索引 - shortcode -> (文件夹, 文件名)
+
+instaloader 下载每个帖子都会写一个 .json.xz 元数据文件。
+以前检查一个 shortcode 是否已下载要遍历所有日期文件夹、解压每个 .json.xz，
+检查 N 个 shortcode 就要解压 N 遍整棵目录树。
+
+这里维护一个增量索引 {download_dir}/.shortcode_index.json：
+  - 第一次建立时解压所有 .json.xz
+  - 之后 refresh() 只看修改时间变化过的文件夹，只解压新出现的文件
+  - instaloader 写完新文件后可以直接调用 add_sidecar()
+一整页扫描结果用 lookup_many() 一次查完。
+
+用法:
+  python sidecar_index.py build /app/downloads/ai_vanvan
+  python sidecar_index.py check /app/downloads/ai_vanvan DKS1nTJyWhY DMLRQLZtjan
+"""
+import json
+import lzma
+import os
+import sys
+
+INDEX_FILENAME = ".shortcode_index.json"
+
+
+def read_sidecar_shortcode(json_file_path):
+    """读取 .json.xz 里的 shortcode（instaloader 的结构：shortcode 在 node 层级）"""
+    try:
+        with open(json_file_path, 'rb') as f:
+            data = json.loads(lzma.decompress(f.read()).decode('utf-8'))
+        return data.get('node', {}).get('shortcode')
+    except Exception:
+        return None
+
+
+class SidecarIndex:
+    """单个下载目录的 shortcode 索引"""
+
+    def __init__(self, download_dir):
+        self.download_dir = download_dir
+        self.index_file = os.path.join(download_dir, INDEX_FILENAME)
+        self.folders = {}     # 相对路径 -> {"mtime": ns, "files": [文件名]}
+        self.shortcodes = {}  # shortcode -> [相对路径, 文件名]
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.folders = data.get('folders', {})
+                self.shortcodes = data.get('shortcodes', {})
+            except (json.JSONDecodeError, OSError):
+                # 索引损坏就从头建立
+                self.folders, self.shortcodes = {}, {}
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'folders': self.folders, 'shortcodes': self.shortcodes}, f, ensure_ascii=False)
+        os.replace(tmp_file, self.index_file)
+        self._dirty = False
+
+    def _scan_folder(self, rel_folder):
+        """只解压这个文件夹里还没索引过的 .json.xz"""
+        folder_path = os.path.join(self.download_dir, rel_folder) if rel_folder else self.download_dir
+        mtime = os.stat(folder_path).st_mtime_ns
+        entry = self.folders.get(rel_folder)
+        if entry and entry['mtime'] == mtime:
+            return 0
+
+        known = set(entry['files']) if entry else set()
+        listing = os.listdir(folder_path)
+
+        # 文件被删掉（例如回退）时把对应的 shortcode 也去掉
+        gone = known - set(listing)
+        if gone:
+            self.shortcodes = {sc: loc for sc, loc in self.shortcodes.items()
+                               if not (loc[0] == rel_folder and loc[1] in gone)}
+            known -= gone
+
+        added = 0
+        unreadable = False
+        for filename in listing:
+            if filename.endswith('.json.xz') and filename not in known:
+                shortcode = read_sidecar_shortcode(os.path.join(folder_path, filename))
+                if shortcode:
+                    self.shortcodes[shortcode] = [rel_folder, filename]
+                    known.add(filename)
+                    added += 1
+                else:
+                    # 可能还在写（instaloader 写完不会改文件夹的 mtime），下次再试
+                    unreadable = True
+
+        # 有没读出来的文件时不记 mtime，下次 refresh 会再列这个目录，只重试这些文件
+        self.folders[rel_folder] = {'mtime': None if unreadable else mtime, 'files': sorted(known)}
+        self._dirty = True
+        return added
+
+    def refresh(self):
+        """增量更新：根目录 + 每个日期子目录，返回新增条数"""
+        if not os.path.isdir(self.download_dir):
+            return 0
+
+        added = self._scan_folder('')
+        current = {''}
+        for name in os.listdir(self.download_dir):
+            if os.path.isdir(os.path.join(self.download_dir, name)):
+                current.add(name)
+                added += self._scan_folder(name)
+
+        # 被删除的文件夹（例如回退）要从索引里移除
+        removed = set(self.folders) - current
+        if removed:
+            for rel_folder in removed:
+                del self.folders[rel_folder]
+            self.shortcodes = {sc: loc for sc, loc in self.shortcodes.items() if loc[0] not in removed}
+            self._dirty = True
+
+        self.save()
+        return added
+
+    def add_sidecar(self, json_file_path):
+        """instaloader 写完新的 .json.xz 后调用"""
+        shortcode = read_sidecar_shortcode(json_file_path)
+        if not shortcode:
+            return None
+        folder_path, filename = os.path.split(os.path.abspath(json_file_path))
+        rel_folder = os.path.relpath(folder_path, os.path.abspath(self.download_dir))
+        rel_folder = '' if rel_folder == '.' else rel_folder
+
+        self.shortcodes[shortcode] = [rel_folder, filename]
+        entry = self.folders.get(rel_folder)
+        if entry and filename not in entry['files']:
+            # 不更新 mtime：下次 refresh 仍会列目录，但已知文件不会再解压
+            entry['files'].append(filename)
+        self._dirty = True
+        self.save()
+        return shortcode
+
+    def lookup(self, shortcode):
+        """返回 (文件夹, 文件名)，没有则返回 None"""
+        loc = self.shortcodes.get(shortcode)
+        return tuple(loc) if loc else None
+
+    def lookup_many(self, shortcodes):
+        """一页扫描结果一次查完：{shortcode: (文件夹, 文件名)}，只包含已下载的"""
+        return {sc: tuple(self.shortcodes[sc]) for sc in shortcodes if sc in self.shortcodes}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    command, download_dir = sys.argv[1], sys.argv[2]
+    index = SidecarIndex(download_dir)
+    added = index.refresh()
+
+    if command == "build":
+        print(f"✅ 索引已更新: 新增 {added} 个, 共 {len(index.shortcodes)} 个 ({index.index_file})")
+    elif command == "check":
+        found = index.lookup_many(sys.argv[3:])
+        for shortcode in sys.argv[3:]:
+            if shortcode in found:
+                folder, filename = found[shortcode]
+                print(f"✅ 已下载: {shortcode} in {folder or '.'}/{filename}")
+            else:
+                print(f"❌ 未下载: {shortcode}")
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
@@ -3,44 +3,46 @@
 """
 import redis
 import json
-from pathlib import Path
-from upload_tracker import get_next_number, record_upload
+from merged_outputs import MergedOutputs
+from upload_numbers import get_allocator
+from work_queue import WorkQueue
 
 # 连接 Redis
 redis_client = redis.from_url("redis://localhost:6379")
 
-# 获取下一个编号
+# 预留下一个编号（同时跑的上传不会拿到同一个编号）
 account = "ai_vanvan"
-next_number = get_next_number(account)
+numbers = get_allocator()
+next_number = numbers.reserve(account)
 
 print("=" * 70)
 print(f"📤 准备上传 #{next_number}")
 print("=" * 70)
 
-# 检查对应文件是否存在
-video_file = Path(f"videos/merged/{account}/ins海外离大谱#{next_number}.mp4")
+# 检查对应文件是否存在（查合并输出索引，不再扫目录）
+outputs = MergedOutputs(account)
+output = outputs.get(next_number)
 
-if not video_file.exists():
-    print(f"\n❌ 文件不存在: {video_file}")
+if output is None:
+    print(f"\n❌ 文件不存在: videos/merged/{account}/ins海外离大谱#{next_number}.mp4")
     print(f"\n可用的视频文件:")
     
-    merged_dir = Path(f"videos/merged/{account}")
-    if merged_dir.exists():
-        files = sorted(merged_dir.glob("ins海外离大谱#*.mp4"), 
-                      key=lambda x: x.stat().st_mtime, reverse=True)
-        for f in files[:5]:
-            size_mb = f.stat().st_size / 1024 / 1024
-            print(f"  - {f.name} ({size_mb:.2f} MB)")
+    for number, info in outputs.recent(5):
+        size_mb = info["size"] / 1024 / 1024
+        print(f"  - {info['file']} ({size_mb:.2f} MB)")
     
     print(f"\n💡 提示:")
     print(f"  1. 如果想上传现有文件，请重命名为: ins海外离大谱#{next_number}.mp4")
     print(f"  2. 或者先运行合并任务生成新视频")
+    numbers.release(account, next_number)
     exit(1)
 
 # 文件存在，准备上传
-file_size_mb = video_file.stat().st_size / 1024 / 1024
-print(f"\n✅ 找到视频文件: {video_file.name}")
+file_size_mb = output["size"] / 1024 / 1024
+print(f"\n✅ 找到视频文件: {output['file']}")
 print(f"   大小: {file_size_mb:.2f} MB")
+if output.get("duration"):
+    print(f"   时长: {int(output['duration'] // 60)}:{int(output['duration'] % 60):02d}")
 
 # 准备任务数据
 task = {
@@ -57,9 +59,21 @@ print(f"  标题: {task['title']}")
 print(f"  分区: 138 (生活 > 搞笑)")
 print(f"  标签: {task['tag']}")
 
-# 发送到队列
-redis_client.rpush("biliup:queue", json.dumps(task))
+# 发送到队列（发送失败就把编号还回去）
+# 没设置 WORK_QUEUE_STREAMS=1 时写旧列表（服务还在 BRPOP），切换步骤见 work_queue.py 的迁移说明
+try:
+    message_id = WorkQueue(redis_client, "biliup:queue").enqueue(task)
+except BaseException:
+    numbers.release(account, next_number)
+    raise
 
+if message_id is None:
+    print(f"\n⏭️  #{next_number} 的上传任务已经在队列里或已经处理过，没有重复发送")
+    # 这次没有发出任务，预留的编号还回去
+    numbers.release(account, next_number)
+    exit(0)
+# 任务已经发出，编号确认下来（不再依赖手动 record_upload；它之后只是补记 BV 号）
+numbers.commit(account, next_number, title=task["title"])
 print(f"\n✅ 任务已发送到 biliup:queue")
 print(f"\n📊 查看进度:")
 print(f"   docker logs biliup-uploader --tail 30 --follow")
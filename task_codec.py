@@ -0,0 +1,94 @@
+"""
+任务编码 - msgpack + 版本号，队列里的任务不再是 JSON 字符串
+
+以前每个任务都是一段 JSON，"account"、"video_path"、"idempotency_key" 这些键名
+每个任务都原样存一遍；中文按 \\uXXXX 转义时一个字 6 个字节。
+
+这里任务编码成 msgpack：[版本号, {键编号: 值}]
+  - 常用的键按 SCHEMAS[版本号] 里的位置编成小整数，不在表里的键照原样存字符串
+  - 表只追加不修改：新增常用键时加一个新版本，旧版本的任务照样能解码
+  - decode() 也认旧的 JSON 任务（以 { 开头），迁移期间新旧任务可以混在同一个队列里
+
+msgpack 是二进制，decode_responses=True 的 Redis 客户端读出来会解码失败；
+读队列的地方用 binary_client() 换成返回 bytes 的客户端（连接参数不变）。
+
+用法:
+    from task_codec import decode, encode
+    pipe.xadd(stream, {"data": encode(task)})
+    task = decode(fields[b"data"])
+
+    python task_codec.py size '{"account": "ai_vanvan", "video_path": "..."}'
+"""
+import json
+import sys
+import weakref
+
+import msgpack
+import redis
+
+VERSION = 1
+SCHEMAS = {
+    1: (
+        "account", "video_path", "title", "tid", "tag", "tags", "description", "cover_path", "category",
+        "shortcode", "shortcodes", "max_downloads", "limit", "resolution", "number", "run_id",
+        "idempotency_key", "type", "path", "source", "source_id", "error", "total", "stream",
+        "username", "platform", "profile_url", "firefox_profile",
+    ),
+}
+_INDEX = {version: {key: i for i, key in enumerate(keys)} for version, keys in SCHEMAS.items()}
+
+
+def encode(task, version=VERSION):
+    """任务 dict -> bytes"""
+    index = _INDEX[version]
+    packed = {index.get(key, key): value for key, value in task.items()}
+    return msgpack.packb([version, packed], use_bin_type=True)
+
+
+def decode(payload):
+    """bytes（msgpack 或旧的 JSON）-> 任务 dict"""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    if payload[:1] == b"{":
+        return json.loads(payload)
+    version, packed = msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    keys = SCHEMAS.get(version)
+    if keys is None:
+        raise ValueError(f"不认识的任务编码版本: {version}")
+    return {keys[key] if isinstance(key, int) else key: value for key, value in packed.items()}
+
+
+_binary_clients = weakref.WeakKeyDictionary()  # 原连接池 -> 返回 bytes 的客户端
+
+
+def binary_client(redis_client):
+    """
+    同样连接参数、但返回 bytes 的客户端（本来就返回 bytes 时原样返回）。
+    每个原连接池只建一个，每次 WorkQueue(...) 都调用也不会越开越多连接池
+    """
+    pool = redis_client.connection_pool
+    kwargs = pool.connection_kwargs
+    if not kwargs.get("decode_responses"):
+        return redis_client
+    client = _binary_clients.get(pool)
+    if client is None:
+        client = _binary_clients[pool] = redis.Redis(connection_pool=redis.ConnectionPool(
+            connection_class=pool.connection_class, **{**kwargs, "decode_responses": False}))
+    return client
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    command = sys.argv[1]
+    if command == "size":
+        task = json.loads(sys.argv[2])
+        as_json = len(json.dumps(task).encode("utf-8"))
+        as_msgpack = len(encode(task))
+        print(f"JSON: {as_json} 字节, msgpack v{VERSION}: {as_msgpack} 字节 ({as_msgpack / as_json:.0%})")
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
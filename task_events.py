@@ -0,0 +1,277 @@
+"""
+任务状态推送 - Redis pub/sub + SSE / 长轮询
+
+以前客户端（ContainerTester.monitor_pipeline_status、test_merge_upload.py、
+test_full_flow_with_rollback.test_download）只能 sleep 30~60 秒，或者每 10 秒
+GET 一次 /upload/status/<account>：完成了也要等到下一次查询，而且一直在给服务加压。
+
+这里：
+  worker  每次状态变化调用 publish_task_event()
+            - SET task:state:{task_id}            最新状态（后订阅的客户端也能拿到）
+            - PUBLISH task:events:{task_id}        按任务订阅
+            - PUBLISH task:events:account:{account} 按账号订阅
+  gateway 注册 create_blueprint(redis_client)：
+            GET /tasks/<task_id>/events            SSE，状态一变就推送，结束后关闭
+            GET /tasks/<task_id>/wait?timeout=30   长轮询，结束或超时才返回
+            （两个接口对没发过事件的任务都返回 404，客户端改用各服务的状态接口）
+            GET /tasks/account/<account>/events    SSE，这个账号所有任务的状态
+  客户端  wait_for_task() / wait_for_account_event()，毫秒级拿到完成通知
+
+用法（worker）:
+    publish_task_event(r, task_id, "ai_vanvan", "running", service="merger", progress={...})
+    publish_task_event(r, task_id, "ai_vanvan", "completed", service="merger", result={...})
+
+用法（gateway）:
+    from task_events import create_blueprint
+    app.register_blueprint(create_blueprint(redis_client), url_prefix="/api")
+
+用法（命令行）:
+  python task_events.py watch <task_id>
+  python task_events.py account ai_vanvan
+"""
+import json
+import sys
+import time
+
+import http_client
+import redis
+
+from workflow_engine import DONE_STATUSES, FAILED_STATUSES
+
+REDIS_URL = "redis://localhost:6379"
+API_BASE = "http://localhost:8080/api"
+STATE_KEY = "task:state:{task_id}"
+TASK_CHANNEL = "task:events:{task_id}"
+ACCOUNT_CHANNEL = "task:events:account:{account}"
+STATE_TTL = 7 * 24 * 3600
+KEEPALIVE_SECONDS = 15
+
+
+def is_terminal(status):
+    return str(status).lower() in DONE_STATUSES + FAILED_STATUSES
+
+
+def is_success(status):
+    return str(status).lower() in DONE_STATUSES
+
+
+# ----------------------------------------------------------------------
+# worker 端
+# ----------------------------------------------------------------------
+
+def publish_task_event(redis_client, task_id, account, status, **fields):
+    """记录最新状态并推送给订阅者（一次往返）"""
+    event = {
+        "task_id": task_id,
+        "account": account,
+        "status": status,
+        "time": time.time(),
+        **fields,
+    }
+    payload = json.dumps(event, ensure_ascii=False)
+    state_key = STATE_KEY.format(task_id=task_id)
+    pipe = redis_client.pipeline()
+    pipe.set(state_key, payload, ex=STATE_TTL)
+    pipe.publish(TASK_CHANNEL.format(task_id=task_id), payload)
+    pipe.publish(ACCOUNT_CHANNEL.format(account=account), payload)
+    pipe.execute()
+    return event
+
+
+def get_task_state(redis_client, task_id):
+    payload = redis_client.get(STATE_KEY.format(task_id=task_id))
+    return json.loads(payload) if payload else None
+
+
+# ----------------------------------------------------------------------
+# 订阅
+# ----------------------------------------------------------------------
+
+def iter_task_events(redis_client, task_id, timeout=None):
+    """
+    依次产出任务的状态事件，任务结束后停止；空闲时产出 None（用来发心跳）。
+    先订阅再读当前状态，订阅之前发生的变化也不会漏掉。
+    """
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(TASK_CHANNEL.format(task_id=task_id))
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        state = get_task_state(redis_client, task_id)
+        if state:
+            yield state
+            if is_terminal(state["status"]):
+                return
+        while deadline is None or time.monotonic() < deadline:
+            wait = KEEPALIVE_SECONDS if deadline is None else min(KEEPALIVE_SECONDS, max(0.0, deadline - time.monotonic()))
+            message = pubsub.get_message(timeout=wait)
+            if message is None:
+                yield None
+                continue
+            event = json.loads(message["data"])
+            yield event
+            if is_terminal(event["status"]):
+                return
+    finally:
+        pubsub.close()
+
+
+def iter_account_events(redis_client, account, timeout=None):
+    """账号下所有任务的状态事件（不会自动结束）；空闲时产出 None"""
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(ACCOUNT_CHANNEL.format(account=account))
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            wait = KEEPALIVE_SECONDS if deadline is None else min(KEEPALIVE_SECONDS, max(0.0, deadline - time.monotonic()))
+            message = pubsub.get_message(timeout=wait)
+            yield json.loads(message["data"]) if message else None
+    finally:
+        pubsub.close()
+
+
+# ----------------------------------------------------------------------
+# gateway 端（Flask）
+# ----------------------------------------------------------------------
+
+def _sse(events):
+    for event in events:
+        if event is None:
+            yield ": ping\n\n"
+        else:
+            yield f"event: status\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def create_blueprint(redis_client, name="task_events"):
+    """SSE + 长轮询接口，注册到 API Gateway 的 Flask app 上"""
+    from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+    bp = Blueprint(name, __name__)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+    @bp.route("/tasks/<task_id>/events")
+    def task_events(task_id):
+        if get_task_state(redis_client, task_id) is None:
+            # 和 /wait 一样：服务没接入 publish_task_event 时流永远不会有事件，不要让客户端干等
+            return jsonify({"task_id": task_id, "status": "unknown"}), 404
+        return Response(stream_with_context(_sse(iter_task_events(redis_client, task_id))),
+                        mimetype="text/event-stream", headers=headers)
+
+    @bp.route("/tasks/<task_id>/wait")
+    def task_wait(task_id):
+        try:
+            timeout = min(float(request.args.get("timeout", 30)), 120)
+        except ValueError:
+            return jsonify({"status": "error", "error": "timeout 必须是数字"}), 400
+        if not timeout >= 0:
+            return jsonify({"status": "error", "error": "timeout 不能是负数"}), 400
+        last = get_task_state(redis_client, task_id)
+        if last is None:
+            # 没发过事件的任务（服务还没接入 publish_task_event）立刻返回，客户端改用状态查询
+            return jsonify({"task_id": task_id, "status": "unknown"}), 404
+        for event in iter_task_events(redis_client, task_id, timeout=timeout):
+            if event is None:
+                continue
+            last = event
+            if is_terminal(event["status"]):
+                break
+        return jsonify(last)
+
+    @bp.route("/tasks/account/<account>/events")
+    def account_events(account):
+        return Response(stream_with_context(_sse(iter_account_events(redis_client, account))),
+                        mimetype="text/event-stream", headers=headers)
+
+    return bp
+
+
+# ----------------------------------------------------------------------
+# 客户端
+# ----------------------------------------------------------------------
+
+def _read_sse(response):
+    """解析 SSE 响应，产出 data 里的 JSON；心跳产出 None"""
+    data = []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data:
+                yield json.loads("\n".join(data))
+                data = []
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+        elif line.startswith(":"):
+            yield None
+
+
+def wait_for_task(task_id, base_url=API_BASE, timeout=1800, on_event=None, session=None):
+    """
+    通过 gateway 的 SSE 等待任务结束，返回最后一个事件。
+    超时抛出 TimeoutError；gateway 没有这个接口时抛出 requests.HTTPError。
+    """
+    http = session or http_client.get_session()
+    deadline = time.monotonic() + timeout
+    with http.get(f"{base_url}/tasks/{task_id}/events", stream=True,
+                  timeout=(10, KEEPALIVE_SECONDS * 2)) as response:
+        response.raise_for_status()
+        for event in _read_sse(response):
+            if event is not None:
+                if on_event:
+                    on_event(event)
+                if is_terminal(event["status"]):
+                    return event
+            if time.monotonic() > deadline:
+                break
+    raise TimeoutError(f"等待任务 {task_id} 超时（{timeout} 秒）")
+
+
+def wait_for_account_event(account, match, base_url=API_BASE, timeout=1800, on_event=None, session=None,
+                           poll=None):
+    """
+    订阅账号的事件流，直到 match(event) 为真，返回该事件。
+    例如等上传结束: match=lambda e: e.get("service") == "uploader" and is_terminal(e["status"])
+    poll() 在每次心跳（空闲 KEEPALIVE_SECONDS 秒）时调用，返回一个事件或 None：
+    服务没有发布事件时事件流一直是空的，靠它查状态接口，完成了也能返回
+    """
+    http = session or http_client.get_session()
+    deadline = time.monotonic() + timeout
+    with http.get(f"{base_url}/tasks/account/{account}/events", stream=True,
+                  timeout=(10, KEEPALIVE_SECONDS * 2)) as response:
+        response.raise_for_status()
+        for event in _read_sse(response):
+            if event is None and poll is not None:
+                event = poll()
+            if event is not None:
+                if on_event:
+                    on_event(event)
+                if match(event):
+                    return event
+            if time.monotonic() > deadline:
+                break
+    raise TimeoutError(f"等待 {account} 的任务事件超时（{timeout} 秒）")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    command, target = sys.argv[1], sys.argv[2]
+    client = redis.from_url(REDIS_URL)
+
+    if command == "watch":
+        events = iter_task_events(client, target)
+    elif command == "account":
+        events = iter_account_events(client, target)
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
+
+    try:
+        for event in events:
+            if event is not None:
+                print(f"📡 [{event.get('service', '?')}] {event['task_id']}: {event['status']}"
+                      f" {json.dumps(event.get('progress', ''), ensure_ascii=False) if event.get('progress') else ''}")
+    except KeyboardInterrupt:
+        pass
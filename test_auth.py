@@ -1,6 +1,8 @@
 ﻿import redis
 import json
 
+from work_queue import WorkQueue
+
 # 连接Redis
 r = redis.Redis(host='localhost', port=6379)
 
@@ -13,6 +15,7 @@ task = {
 }
 
 # 推送到auth队列
-r.lpush('auth_queue', json.dumps(task))
+# 没设置 WORK_QUEUE_STREAMS=1 时写旧列表（服务还在 BRPOP），切换步骤见 work_queue.py 的迁移说明
+WorkQueue(r, 'auth_queue').enqueue(task)
 print(' 登录测试任务已推送到auth_queue')
 print(f' 任务内容: {json.dumps(task, indent=2)}')
@@ -5,10 +5,13 @@ AI VanVan 容器化系统测试脚本
 """
 
 import requests
+import http_client
 import json
 import time
 import sys
 
+from task_events import is_success, is_terminal, wait_for_account_event
+
 class ContainerTester:
     def __init__(self, api_gateway_url="http://localhost:8080"):
         self.api_gateway_url = api_gateway_url
@@ -17,7 +20,7 @@ class ContainerTester:
         """测试服务健康状态"""
         print("🏥 检查服务健康状态...")
         try:
-            response = requests.get(f"{self.api_gateway_url}/")
+            response = http_client.get(f"{self.api_gateway_url}/")
             if response.status_code == 200:
                 print("✅ API Gateway 运行正常")
                 return True
@@ -38,10 +41,11 @@ class ContainerTester:
         }
         
         try:
-            response = requests.post(
+            response = http_client.post(
                 f"{self.api_gateway_url}/pipeline",
                 json=data,
-                headers={"Content-Type": "application/json"}
+                headers={"Content-Type": "application/json"},
+                timeout=1200,  # 网关同步跑完整条流水线才返回，默认 60 秒读超时不够
             )
             
             if response.status_code == 200:
@@ -57,17 +61,62 @@ class ContainerTester:
             print(f"❌ 请求失败: {e}")
             return False
     
+    def upload_status_poller(self, account_name):
+        """
+        给 wait_for_account_event 的 poll：查 /upload/status，状态变了才返回事件。
+        上传服务不发布事件时事件流一直是空的，靠它发现上传已经结束
+        """
+        last = {"status": None}
+
+        def poll():
+            try:
+                response = http_client.get(f"{self.api_gateway_url}/upload/status/{account_name}", timeout=10)
+            except requests.exceptions.RequestException:
+                return None
+            if response.status_code != 200:
+                return None
+            status_data = response.json()
+            if status_data.get("status") == last["status"]:
+                return None
+            last["status"] = status_data.get("status")
+            return {"service": "uploader", "status": "unknown", **status_data}
+        return poll
+
     def monitor_pipeline_status(self, account_name="ai_vanvan", timeout=1800):
         """监控流水线执行状态"""
         print(f"👀 监控 {account_name} 流水线状态...")
         
+        # 优先订阅网关的事件流（task_events.py），上传一结束马上返回；
+        # 每次心跳时也查一次上传状态，服务没发布事件也不会干等到超时
+        try:
+            event = wait_for_account_event(
+                account_name,
+                lambda e: e.get("service") == "uploader" and is_terminal(e["status"]),
+                base_url=self.api_gateway_url,
+                timeout=timeout,
+                on_event=lambda e: print(f"📊 状态更新: [{e.get('service', '?')}] {e['status']}"),
+                poll=self.upload_status_poller(account_name),
+            )
+            if is_success(event["status"]):
+                print(f"🎉 流水线执行完成！")
+                print(f"📄 结果: {event.get('result', 'N/A')}")
+                return True
+            print(f"❌ 流水线执行失败")
+            print(f"📄 错误: {event.get('error', 'N/A')}")
+            return False
+        except TimeoutError:
+            print(f"⏰ 监控超时 ({timeout}秒)")
+            return False
+        except requests.exceptions.RequestException:
+            print("ℹ️  网关不支持事件流，改为轮询状态")
+        
         start_time = time.time()
         last_status = None
         
         while time.time() - start_time < timeout:
             try:
                 # 检查上传状态（最后一步）
-                response = requests.get(f"{self.api_gateway_url}/upload/status/{account_name}")
+                response = http_client.get(f"{self.api_gateway_url}/upload/status/{account_name}")
                 
                 if response.status_code == 200:
                     status_data = response.json()
@@ -103,7 +152,7 @@ class ContainerTester:
         print("📥 测试下载服务...")
         download_data = {"account": account_name, "max_posts": 2}
         try:
-            response = requests.post(f"{self.api_gateway_url}/download", json=download_data)
+            response = http_client.post(f"{self.api_gateway_url}/download", json=download_data, timeout=300)
             if response.status_code == 200:
                 print("✅ 下载服务测试通过")
             else:
@@ -120,7 +169,7 @@ class ContainerTester:
             "video_folder": f"/app/downloads/{account_name}"
         }
         try:
-            response = requests.post(f"{self.api_gateway_url}/standardize", json=standardize_data)
+            response = http_client.post(f"{self.api_gateway_url}/standardize", json=standardize_data, timeout=600)
             if response.status_code == 200:
                 print("✅ 标准化服务测试通过")
             else:
@@ -134,7 +183,7 @@ class ContainerTester:
         print("🎬 测试合并服务...")
         merge_data = {"account": account_name}
         try:
-            response = requests.post(f"{self.api_gateway_url}/merge", json=merge_data)
+            response = http_client.post(f"{self.api_gateway_url}/merge", json=merge_data, timeout=600)
             if response.status_code == 200:
                 print("✅ 合并服务测试通过")
             else:
@@ -148,7 +197,7 @@ class ContainerTester:
         print("📤 测试上传服务...")
         upload_data = {"account": account_name}
         try:
-            response = requests.post(f"{self.api_gateway_url}/upload", json=upload_data)
+            response = http_client.post(f"{self.api_gateway_url}/upload", json=upload_data, timeout=1200)
             if response.status_code == 200:
                 print("✅ 上传服务测试通过")
             else:
@@ -1,6 +1,8 @@
 ﻿import redis
 import json
 
+from work_queue import WorkQueue
+
 r = redis.Redis(host='localhost', port=6379)
 
 # 创建下载任务 - 基于scanner找到的shortcode
@@ -10,6 +12,7 @@ task = {
     'max_downloads': 1
 }
 
-r.lpush('download_queue', json.dumps(task))
+# 没设置 WORK_QUEUE_STREAMS=1 时写旧列表（服务还在 BRPOP），切换步骤见 work_queue.py 的迁移说明
+WorkQueue(r, 'download_queue').enqueue(task)
 print(' 下载任务已推送到download_queue')
 print(f' 任务: {json.dumps(task, indent=2)}')
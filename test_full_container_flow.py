@@ -2,7 +2,7 @@
 测试完整容器化流程
 ai_vanvan 账号：下载 → 标准化 → 合并
 """
-import requests
+import http_client
 import time
 import json
 
@@ -25,7 +25,7 @@ def test_download():
     print(f"📦 参数: {json.dumps(payload, indent=2)}")
     
     try:
-        response = requests.post(url, json=payload, timeout=300)
+        response = http_client.post(url, json=payload, timeout=300)
         print(f"📊 状态码: {response.status_code}")
         
         if response.status_code == 200:
@@ -73,7 +73,7 @@ def wait_for_standardize(task_id, max_wait=300):
     
     while time.time() - start_time < max_wait:
         try:
-            response = requests.get(url, timeout=10)
+            response = http_client.get(url, timeout=10)
             if response.status_code == 200:
                 result = response.json()
                 status = result.get('status')
@@ -109,7 +109,7 @@ def test_merge():
     print(f"🔗 查询合并状态: GET {status_url}")
     
     try:
-        response = requests.get(status_url, timeout=30)
+        response = http_client.get(status_url, timeout=30)
         print(f"📊 状态码: {response.status_code}")
         
         if response.status_code == 200:
@@ -130,7 +130,7 @@ def test_merge():
                 "limit": None  # 合并所有未合并的视频
             }
             
-            merge_response = requests.post(merge_url, json=merge_payload, timeout=600)
+            merge_response = http_client.post(merge_url, json=merge_payload, timeout=600)
             print(f"📊 合并状态码: {merge_response.status_code}")
             
             if merge_response.status_code == 200:
@@ -169,7 +169,7 @@ def main():
     
     # 检查服务是否在线
     try:
-        response = requests.get(f"{API_BASE}/health", timeout=5)
+        response = http_client.get(f"{API_BASE}/health", timeout=5)
         if response.status_code == 200:
             print("✅ API Gateway 在线")
         else:
@@ -2,7 +2,7 @@
 测试完整的微服务流程
 Standardizer → Merger (不记录到merged_record)
 """
-import requests
+import http_client
 import subprocess
 import time
 import os
@@ -39,7 +39,7 @@ payload = {
 }
 
 print("📤 发送标准化请求...")
-response = requests.post("http://localhost:8080/standardize-batch", json=payload, timeout=10)
+response = http_client.post("http://localhost:8080/standardize-batch", json=payload, timeout=10)
 
 if response.status_code != 200:
     print(f"❌ 标准化请求失败: {response.status_code}")
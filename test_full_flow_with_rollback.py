@@ -16,12 +16,15 @@
 """
 
 import requests
+import http_client
 import time
 import json
 import os
 import subprocess
 from datetime import datetime
 
+from task_events import wait_for_task
+
 API_BASE = "http://localhost:8080"
 ACCOUNT = "ai_vanvan"
 
@@ -101,16 +104,27 @@ def test_download(limit=3):
     print(f"📦 参数: limit={limit}")
     
     try:
-        response = requests.post(url, json=payload, timeout=300)
+        response = http_client.post(url, json=payload, timeout=300)
         print(f"📊 状态码: {response.status_code}")
         
         if response.status_code == 200:
             result = response.json()
             print(f"✅ 下载任务已启动")
             
-            # 等待下载完成
-            print("⏳ 等待下载完成（最多等待60秒）...")
-            time.sleep(60)
+            # 等待下载完成：有 task_id 就订阅任务事件，完成立刻继续
+            task_id = result.get("task_id")
+            waited = False
+            if task_id:
+                print(f"⏳ 等待下载任务 {task_id} 完成...")
+                try:
+                    event = wait_for_task(task_id, base_url=API_BASE, timeout=600)
+                    print(f"📡 下载任务结束: {event['status']}")
+                    waited = True
+                except (TimeoutError, requests.exceptions.RequestException) as e:
+                    print(f"⚠️  无法订阅任务事件（{e}）")
+            if not waited:
+                print("⏳ 等待下载完成（最多等待60秒）...")
+                time.sleep(60)
             
             # 检查下载结果
             print("\n📋 检查下载结果...")
@@ -150,7 +164,7 @@ def test_merge():
     print(f"🔗 查询合并状态: GET {status_url}")
     
     try:
-        response = requests.get(status_url, timeout=30)
+        response = http_client.get(status_url, timeout=30)
         print(f"📊 状态码: {response.status_code}")
         
         if response.status_code == 200:
@@ -171,7 +185,7 @@ def test_merge():
                 "limit": None
             }
             
-            merge_response = requests.post(merge_url, json=merge_payload, timeout=600)
+            merge_response = http_client.post(merge_url, json=merge_payload, timeout=600)
             print(f"📊 合并状态码: {merge_response.status_code}")
             
             if merge_response.status_code == 200:
@@ -216,7 +230,7 @@ def test_upload(video_path):
     print(f"📦 参数: video_path={video_path}")
     
     try:
-        response = requests.post(url, json=payload, timeout=1200)
+        response = http_client.post(url, json=payload, timeout=1200)
         print(f"📊 状态码: {response.status_code}")
         
         if response.status_code == 200:
@@ -430,7 +444,7 @@ def main():
     
     # 检查服务状态
     try:
-        response = requests.get(f"{API_BASE}/health", timeout=5)
+        response = http_client.get(f"{API_BASE}/health", timeout=5)
         if response.status_code != 200:
             print("⚠️  API Gateway 状态异常，但继续测试...")
     except Exception as e:
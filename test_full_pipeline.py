@@ -4,7 +4,7 @@
 测试链路: 下载 → 标准化 → 合并 → 上传
 """
 
-import requests
+import http_client
 import time
 import json
 
@@ -16,13 +16,16 @@ def print_step(step_num, title):
     print(f"步骤 {step_num}: {title}")
     print("="*60)
 
+# 这些接口处理完才返回，http_client 默认的 60 秒读超时不够（和 test_full_flow_with_rollback 一样）
+STEP_TIMEOUTS = {"/download": 300, "/standardize": 600, "/merge": 600, "/upload": 1200}
+
 def call_api(endpoint, data, description):
     """调用API并显示结果"""
     print(f"\n📡 调用 API: {endpoint}")
     print(f"📋 请求数据: {json.dumps(data, indent=2, ensure_ascii=False)}")
     
     try:
-        response = requests.post(f"{BASE_URL}{endpoint}", json=data)
+        response = http_client.post(f"{BASE_URL}{endpoint}", json=data, timeout=STEP_TIMEOUTS.get(endpoint))
         print(f"📊 状态码: {response.status_code}")
         
         if response.status_code == 200:
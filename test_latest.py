@@ -1,13 +1,11 @@
 ﻿import redis
 import json
 
+from work_queue import WorkQueue
+
 # 连接到Redis
 r = redis.Redis(host='localhost', port=6380, decode_responses=True)
 
-# 清空队列
-r.delete('biliup:queue')
-print('已清空队列')
-
 # 推送最新视频上传任务
 task = {
     'account': 'ai_vanvan',
@@ -15,7 +13,10 @@ task = {
 }
 
 print(f'推送任务: {task}')
-r.lpush('biliup:queue', json.dumps(task))
-print(' 任务已推送到队列')
-queue_len = r.llen('biliup:queue')
+# 没设置 WORK_QUEUE_STREAMS=1 时写旧列表（服务还在 BRPOP），切换步骤见 work_queue.py 的迁移说明
+if WorkQueue(r, 'biliup:queue').enqueue(task) is None:
+    print(' 同一个任务已经在队列里或已经处理过，没有重复推送')
+else:
+    print(' 任务已推送到队列')
+queue_len = WorkQueue(r, 'biliup:queue').backlog()
 print(f'当前队列长度: {queue_len}')
@@ -2,13 +2,11 @@
 测试合并记录检查逻辑
 """
 import os
-import sys
-sys.path.append('.')
 
-from src.utils.video_merger import VideoMerger
+from merge_index import MergeIndex
 
-# 初始化VideoMerger
-merger = VideoMerger("ai_vanvan")
+# 合并反向索引（视频 -> 合并记录），查询是一次字典查找
+merger = MergeIndex("ai_vanvan")
 
 # 测试刚才的3个视频
 test_videos = [
@@ -21,9 +19,11 @@ print("检查这3个视频的合并状态：\n")
 
 for video in test_videos:
     video_abs = os.path.abspath(video)
-    is_merged = merger.is_video_merged(video_abs)
-    status = "✅ 已合并" if is_merged else "❌ 未合并"
-    print(f"{status}: {os.path.basename(video)}")
+    found = merger.lookup(video_abs)
+    if found:
+        print(f"✅ 已合并: {os.path.basename(video)} → {os.path.basename(found[1])}")
+    else:
+        print(f"❌ 未合并: {os.path.basename(video)}")
 
 # 统计今天所有视频的合并状态
 print("\n" + "="*60)
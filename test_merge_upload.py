@@ -3,9 +3,12 @@
 """
 
 import requests
+import http_client
 import time
 import json
 
+from task_events import is_success, wait_for_task
+
 BASE_URL = "http://localhost:8080"
 ACCOUNT = "ai_vanvan"
 
@@ -27,6 +30,21 @@ def check_response(response, step_name):
         print(f"   响应: {response.text}")
         return None
 
+def wait_task(result, step_name, fallback_seconds):
+    """有 task_id 就订阅任务事件等它结束，否则按老办法等固定时间"""
+    task_id = result.get("task_id")
+    if task_id:
+        print(f"\n⏳ 等待{step_name}任务 {task_id} 完成...")
+        try:
+            event = wait_for_task(task_id, base_url=BASE_URL, timeout=1800,
+                                  on_event=lambda e: print(f"   📡 {e['status']} {e.get('progress', '')}"))
+            print(f"   {'✅' if is_success(event['status']) else '❌'} {step_name}任务结束: {event['status']}")
+            return
+        except (TimeoutError, requests.exceptions.RequestException) as e:
+            print(f"   ⚠️  无法订阅任务事件（{e}），改为固定等待")
+    print(f"\n⏳ 等待 {fallback_seconds} 秒让{step_name}完成...")
+    time.sleep(fallback_seconds)
+
 def main():
     print_separator("测试合并和上传功能")
     
@@ -42,19 +60,19 @@ def main():
     }
     
     try:
-        resp = requests.post(
+        resp = http_client.post(
             f"{BASE_URL}/merge",
-            json=merge_data
+            json=merge_data,
+            timeout=600,  # 合并完才返回
         )
         result = check_response(resp, "视频合并")
         
         if result:
-            print(f"\n⏳ 等待 30 秒让合并完成...")
-            time.sleep(30)
+            wait_task(result, "合并", fallback_seconds=30)
             
             # 检查合并状态
             print("\n🔍 检查合并状态...")
-            status_resp = requests.get(f"{BASE_URL}/merge/status/{ACCOUNT}")
+            status_resp = http_client.get(f"{BASE_URL}/merge/status/{ACCOUNT}")
             check_response(status_resp, "合并状态查询")
     except Exception as e:
         print(f"❌ 合并失败: {e}")
@@ -71,19 +89,19 @@ def main():
     }
     
     try:
-        resp = requests.post(
+        resp = http_client.post(
             f"{BASE_URL}/upload",
-            json=upload_data
+            json=upload_data,
+            timeout=1200,  # 上传完才返回
         )
         result = check_response(resp, "视频上传")
         
         if result:
-            print(f"\n⏳ 等待 60 秒让上传启动...")
-            time.sleep(60)
+            wait_task(result, "上传", fallback_seconds=60)
             
             # 检查上传状态
             print("\n🔍 检查上传状态...")
-            status_resp = requests.get(f"{BASE_URL}/upload/status/{ACCOUNT}")
+            status_resp = http_client.get(f"{BASE_URL}/upload/status/{ACCOUNT}")
             check_response(status_resp, "上传状态查询")
     except Exception as e:
         print(f"❌ 上传失败: {e}")
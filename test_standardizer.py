@@ -3,6 +3,7 @@
 单独测试视频标准化功能
 """
 import requests
+import http_client
 import time
 import os
 import glob
@@ -36,7 +37,7 @@ payload = {
 
 print("📤 发送标准化请求...")
 try:
-    response = requests.post(url, json=payload, timeout=10)
+    response = http_client.post(url, json=payload, timeout=10)
     
     if response.status_code == 200:
         result = response.json()
@@ -2,6 +2,8 @@
 import json
 import sys
 
+from work_queue import WorkQueue
+
 r = redis.Redis(host='localhost', port=6380, decode_responses=True)
 
 task = {
@@ -12,7 +14,8 @@ task = {
     "tag": "测试,AI"
 }
 
-r.rpush("upload_queue", json.dumps(task, ensure_ascii=False))
+# 没设置 WORK_QUEUE_STREAMS=1 时写旧列表（服务还在 BRPOP），切换步骤见 work_queue.py 的迁移说明
+WorkQueue(r, "upload_queue").enqueue(task)
 print(" 已发送上传任务到队列")
 print(f"标题: {task['title']}")
 print("查看日志: docker logs -f biliup-uploader")
@@ -2,6 +2,8 @@
 import json
 import time
 
+from work_queue import WorkQueue
+
 # 连接到Redis
 r = redis.Redis(host='localhost', port=6380, decode_responses=True)
 
@@ -12,10 +14,11 @@ task = {
 }
 
 print(f'推送任务到队列: {task}')
-r.lpush('biliup:queue', json.dumps(task))
+# 没设置 WORK_QUEUE_STREAMS=1 时写旧列表（服务还在 BRPOP），切换步骤见 work_queue.py 的迁移说明
+WorkQueue(r, 'biliup:queue').enqueue(task)
 print('任务已推送')
 
 # 检查队列
 time.sleep(1)
-queue_length = r.llen('biliup:queue')
+queue_length = WorkQueue(r, 'biliup:queue').backlog()
 print(f'当前队列长度: {queue_length}')
@@ -1,4 +1,4 @@
-import requests
+import http_client
 import json
 import time
 
@@ -14,7 +14,7 @@ def trigger_full_pipeline(account_name, max_posts=20):
     # 步骤1: 登录认证
     print("\n📱 步骤1: 发送登录任务...")
     try:
-        response = requests.post(
+        response = http_client.post(
             f"{API_BASE}/login",
             json={"account": account_name}
         )
@@ -31,13 +31,14 @@ def trigger_full_pipeline(account_name, max_posts=20):
     # 步骤2: 启动下载任务
     print(f"\n📥 步骤2: 发送下载任务 (最多{max_posts}个帖子)...")
     try:
-        response = requests.post(
+        response = http_client.post(
             f"{API_BASE}/download",
             json={
                 "account": account_name,
                 "max_posts": max_posts,
                 "type": "saved_posts"
-            }
+            },
+            timeout=300,  # 下载完才返回
         )
         print(f"   状态: {response.status_code}")
         print(f"   响应: {response.json()}")
@@ -0,0 +1,96 @@
+"""
+未合并下载游标
+
+未合并的视频永远只是最近下载的一小段，但 get_unmerged_downloads() 每次都要过滤整个历史。
+这里单独维护 logs/downloads/{account}_unmerged.json，只保存还没合并的记录：
+  - 下载成功 → 加入
+  - 合并 / 删除 → 移除
+读取和写入的代价只和积压数量有关，和历史总量无关。
+
+游标里记录了建立时快照文件的大小和修改时间。如果快照被别的程序（没走 DownloadJournal）
+改过，下次读取时会自动从完整记录重建一次。
+"""
+import json
+import os
+
+DOWNLOAD_LOG_DIR = "logs/downloads"
+
+
+def _is_unmerged(record):
+    return record.get("status") == "success" and not record.get("merged", False)
+
+
+class UnmergedCursor:
+    """单个账号的未合并记录"""
+
+    def __init__(self, account_name, snapshot_file, log_dir=DOWNLOAD_LOG_DIR):
+        self.account_name = account_name
+        self.snapshot_file = snapshot_file
+        self.cursor_file = os.path.join(log_dir, f"{account_name}_unmerged.json")
+
+    def _snapshot_stamp(self):
+        if not os.path.exists(self.snapshot_file):
+            return [0, 0]
+        st = os.stat(self.snapshot_file)
+        return [st.st_size, st.st_mtime_ns]
+
+    def load(self):
+        """读取未合并记录；游标不存在或快照被外部改过时返回 None"""
+        if not os.path.exists(self.cursor_file):
+            return None
+        try:
+            with open(self.cursor_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return None
+        if data.get("snapshot") != self._snapshot_stamp():
+            return None
+        return data.get("items", [])
+
+    def save(self, items):
+        tmp_file = self.cursor_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "account": self.account_name,
+                "snapshot": self._snapshot_stamp(),
+                "items": items,
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.cursor_file)
+
+    def invalidate(self):
+        if os.path.exists(self.cursor_file):
+            os.remove(self.cursor_file)
+
+    def rebuild(self, downloads):
+        """从完整下载记录重建"""
+        items = [d for d in downloads if _is_unmerged(d)]
+        self.save(items)
+        return items
+
+    def apply_event(self, event):
+        """同步一个日志事件；游标无效时什么也不做，等下次读取时重建"""
+        items = self.load()
+        if items is None:
+            return
+
+        op = event.get("op")
+        if op == "add":
+            if _is_unmerged(event["record"]):
+                items.append(event["record"])
+        elif op == "update":
+            fields = event.get("fields", {})
+            if ("merged" in fields and not fields["merged"]) or fields.get("status") == "success":
+                # 记录可能从"已合并"变回"未合并"，游标里没有完整记录，只能重建
+                self.invalidate()
+                return
+            for d in items:
+                if d.get("shortcode") == event["shortcode"]:
+                    d.update(fields)
+            items = [d for d in items if _is_unmerged(d)]
+        elif op in ("merged", "remove"):
+            targets = set(event.get("shortcodes", []))
+            items = [d for d in items if d.get("shortcode") not in targets]
+        elif op == "remove_date":
+            date_str = event["date"]
+            items = [d for d in items if not d.get("download_time", "").startswith(date_str)]
+        self.save(items)
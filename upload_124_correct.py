@@ -2,6 +2,8 @@ import redis
 import json
 from pathlib import Path
 
+from work_queue import WorkQueue
+
 # 连接 Redis
 redis_client = redis.from_url("redis://localhost:6379")
 
@@ -38,6 +40,7 @@ print(f"  - 这次上传为 #124，使用正确分区 138")
 print(f"  - 可以稍后在B站删除旧的 #123")
 
 # 直接上传，无需确认
-redis_client.rpush("biliup:queue", json.dumps(task))
+# 没设置 WORK_QUEUE_STREAMS=1 时写旧列表（服务还在 BRPOP），切换步骤见 work_queue.py 的迁移说明
+WorkQueue(redis_client, "biliup:queue").enqueue(task)
 print(f"\n✅ 任务已发送到 biliup:queue")
 print(f"\n查看进度: docker logs biliup-uploader --tail 30 --follow")
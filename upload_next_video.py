@@ -1,28 +1,20 @@
 import redis
 import json
-from pathlib import Path
+
+from merged_outputs import MergedOutputs
+from upload_numbers import get_allocator
+from work_queue import WorkQueue
 
 # 连接 Redis
 redis_client = redis.from_url("redis://localhost:6379")
 
-# 获取下一个视频编号
-merged_dir = Path("videos/merged/ai_vanvan")
-existing_videos = list(merged_dir.glob("ins海外离大谱#*.mp4"))
-if existing_videos:
-    # 提取编号
-    numbers = []
-    for video in existing_videos:
-        try:
-            num = int(video.stem.split('#')[1])
-            numbers.append(num)
-        except:
-            pass
-    next_number = max(numbers) + 1 if numbers else 124
-else:
-    next_number = 124
+# 预留下一个视频编号（和 smart_upload / record_upload 共用 upload_numbers 分配器）
+account = "ai_vanvan"
+numbers = get_allocator()
+next_number = numbers.reserve(account)
 
-print(f"📊 当前最新视频编号: #{max(numbers) if numbers else '无'}")
-print(f"🎬 下一个视频编号: #{next_number}")
+print(f"📊 已分配到编号: #{numbers.last_number(account)}")
+print(f"🎬 本次视频编号: #{next_number}")
 
 # 准备任务数据
 task = {
@@ -39,15 +31,27 @@ print(f"  分区: 138 (生活 > 搞笑)")
 print(f"  标签: {task['tag']}")
 print(f"  路径: {task['video_path']}")
 
-# 检查文件是否存在
-local_path = Path(f"videos/merged/ai_vanvan/ins海外离大谱#{next_number}.mp4")
-if not local_path.exists():
-    print(f"\n❌ 文件不存在: {local_path}")
+# 检查文件是否存在（查合并输出索引，不再扫目录）
+output = MergedOutputs(account).get(next_number)
+if output is None:
+    print(f"\n❌ 文件不存在: videos/merged/ai_vanvan/ins海外离大谱#{next_number}.mp4")
     print(f"\n💡 提示: 先运行合并任务生成视频")
+    numbers.release(account, next_number)
 else:
-    file_size_mb = local_path.stat().st_size / 1024 / 1024
+    file_size_mb = output["size"] / 1024 / 1024
     print(f"\n✅ 文件存在: {file_size_mb:.2f} MB")
     
-    # 发送到队列
-    redis_client.rpush("biliup:queue", json.dumps(task))
-    print(f"\n✅ 任务已发送到 biliup:queue")
+    # 发送到队列（发送失败、或者同一个任务已经在队列里，就把编号还回去；发出去了就确认）
+    # 没设置 WORK_QUEUE_STREAMS=1 时写旧列表（服务还在 BRPOP），切换步骤见 work_queue.py 的迁移说明
+    try:
+        message_id = WorkQueue(redis_client, "biliup:queue").enqueue(task)
+    except BaseException:
+        numbers.release(account, next_number)
+        raise
+    if message_id is None:
+        print(f"\n⏭️  #{next_number} 的上传任务已经在队列里或已经处理过，没有重复发送")
+        numbers.release(account, next_number)
+    else:
+        numbers.commit(account, next_number, title=task["title"])
+        print(f"\n✅ 任务已发送到 biliup:queue")
+        print(f"   上传成功后运行 python record_upload.py {next_number} <BV号> 补记 BV 号")
@@ -0,0 +1,297 @@
+"""
+上传编号分配器 - SQLite，预留 / 确认 / 释放
+
+以前编号分散在三个地方：upload_history.json（upload_tracker）、
+biliup 的 /api/biliup/counter（manage_video_counter.py）、
+upload_next_video.py 里对合并文件名的 glob。每次取编号都要整份读写 JSON，
+两个上传同时跑会拿到同一个编号。
+
+这里统一成 videos/upload_numbers.db：
+  counters       每个账号一行 last_number（已经分配出去的最大编号）
+  reservations   每个编号一行，状态 reserved / committed / released
+
+  reserve(account)          → 编号（优先复用 released 的，否则 last_number + 1，跳过已经有记录的编号）
+  commit(account, n, bv_id) → 任务发出 / 上传成功（已经释放的编号不能再确认，要确认就重新预留；
+                              已经确认、还没有 BV 号的编号可以再确认一次补上 BV 号）
+  release(account, n)       → 上传没成功，编号还回去给下一次用
+
+分配都在 BEGIN IMMEDIATE 事务里完成，多进程、多账号同时上传也不会重号；
+代价是一次主键查询，和历史多长无关。
+第一次使用某个账号时，从 upload_history.json 的 last_number 接着编。
+预留不会自动过期（任务可能已经在 biliup 队列里传成功了，自动回收会重号），
+确定没传上去的用 release 手动释放。
+
+用法:
+  python upload_numbers.py status ai_vanvan
+  python upload_numbers.py reserve ai_vanvan
+  python upload_numbers.py commit ai_vanvan 210 BV1xxxx
+  python upload_numbers.py release ai_vanvan 210
+  python upload_numbers.py set ai_vanvan 209       # 下一个编号是 210
+"""
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+DB_PATH = "videos/upload_numbers.db"
+DEFAULT_LAST_NUMBER = 123
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    account      TEXT PRIMARY KEY,
+    last_number  INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    account      TEXT NOT NULL,
+    number       INTEGER NOT NULL,
+    status       TEXT NOT NULL,
+    reserved_at  REAL NOT NULL,
+    updated_at   TEXT NOT NULL DEFAULT '',
+    bv_id        TEXT,
+    title        TEXT,
+    PRIMARY KEY (account, number)
+);
+CREATE INDEX IF NOT EXISTS idx_reservations_status ON reservations(account, status, number);
+"""
+
+
+class NumberConflict(Exception):
+    """编号状态不允许这个操作（例如确认一个已经释放的编号）"""
+
+
+class UploadNumbers:
+    """上传编号分配器"""
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        # isolation_level=None：事务自己用 BEGIN IMMEDIATE 控制
+        self.conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """写事务：一开始就拿写锁，读到的 last_number 在提交前不会被别人改"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def _last_number(self, conn, account):
+        row = conn.execute("SELECT last_number FROM counters WHERE account = ?", (account,)).fetchone()
+        if row is not None:
+            return row["last_number"]
+        # 第一次用：接着 upload_history.json 编
+        from upload_tracker import load_upload_history
+
+        last = load_upload_history().get(account, {}).get("last_number", DEFAULT_LAST_NUMBER)
+        conn.execute("INSERT INTO counters (account, last_number) VALUES (?, ?)", (account, last))
+        return last
+
+    @staticmethod
+    def _next_free(conn, account, last):
+        """last 之后第一个没有记录的编号（set 把计数调小以后，后面的编号可能已经确认或预留过）"""
+        number = last + 1
+        while conn.execute(
+            "SELECT 1 FROM reservations WHERE account = ? AND number = ?", (account, number)
+        ).fetchone() is not None:
+            number += 1
+        return number
+
+    # ------------------------------------------------------------------
+    # 分配
+    # ------------------------------------------------------------------
+
+    def reserve(self, account):
+        """预留一个编号"""
+        with self._transaction() as conn:
+            last = self._last_number(conn, account)
+            row = conn.execute(
+                "SELECT number FROM reservations WHERE account = ? AND status = 'released' "
+                "ORDER BY number LIMIT 1", (account,)
+            ).fetchone()
+            if row is not None:
+                number = row["number"]
+                conn.execute(
+                    "UPDATE reservations SET status = 'reserved', reserved_at = ?, updated_at = ? "
+                    "WHERE account = ? AND number = ?",
+                    (time.time(), datetime.now().isoformat(), account, number),
+                )
+                return number
+
+            number = self._next_free(conn, account, last)
+            conn.execute("UPDATE counters SET last_number = ? WHERE account = ?", (number, account))
+            conn.execute(
+                "INSERT INTO reservations (account, number, status, reserved_at, updated_at) "
+                "VALUES (?, ?, 'reserved', ?, ?)",
+                (account, number, time.time(), datetime.now().isoformat()),
+            )
+        return number
+
+    def commit(self, account, number, bv_id=None, title=None):
+        """上传成功：确认编号（手动补记的编号也可以直接确认）"""
+        with self._transaction() as conn:
+            last = self._last_number(conn, account)
+            row = conn.execute(
+                "SELECT status, bv_id FROM reservations WHERE account = ? AND number = ?", (account, number)
+            ).fetchone()
+            if row is not None and row["status"] == "committed":
+                if bv_id is None or row["bv_id"] not in (None, bv_id):
+                    raise NumberConflict(f"{account} #{number} 已经确认过")
+                # 入队时确认过，上传成功后补记 BV 号
+                conn.execute(
+                    "UPDATE reservations SET updated_at = ?, bv_id = ?, title = COALESCE(?, title) "
+                    "WHERE account = ? AND number = ?",
+                    (datetime.now().isoformat(), bv_id, title, account, number),
+                )
+                return
+            if row is not None and row["status"] == "released":
+                # 释放的编号可能已经被下一次 reserve 拿走了
+                raise NumberConflict(f"{account} #{number} 已经释放，不能确认")
+            if row is not None:
+                conn.execute(
+                    "UPDATE reservations SET status = 'committed', updated_at = ?, bv_id = ?, title = ? "
+                    "WHERE account = ? AND number = ?",
+                    (datetime.now().isoformat(), bv_id, title, account, number),
+                )
+            else:
+                conn.execute(
+                    "INSERT INTO reservations (account, number, status, reserved_at, updated_at, bv_id, title) "
+                    "VALUES (?, ?, 'committed', ?, ?, ?, ?)",
+                    (account, number, time.time(), datetime.now().isoformat(), bv_id, title),
+                )
+            if number > last:
+                conn.execute("UPDATE counters SET last_number = ? WHERE account = ?", (number, account))
+
+    def release(self, account, number):
+        """上传失败：把预留的编号还回去"""
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE reservations SET status = 'released', updated_at = ? "
+                "WHERE account = ? AND number = ? AND status = 'reserved'",
+                (datetime.now().isoformat(), account, number),
+            )
+            if cur.rowcount == 0:
+                raise NumberConflict(f"{account} #{number} 不是预留状态，不能释放")
+
+    @contextmanager
+    def reserved(self, account):
+        """with numbers.reserved(account) as n: ... 出异常自动释放"""
+        number = self.reserve(account)
+        try:
+            yield number
+        except BaseException:
+            self.release(account, number)
+            raise
+
+    # ------------------------------------------------------------------
+    # 查询 / 管理
+    # ------------------------------------------------------------------
+
+    def peek(self, account):
+        """下一次 reserve 会拿到的编号（不分配）"""
+        with self._transaction() as conn:
+            last = self._last_number(conn, account)
+            row = conn.execute(
+                "SELECT number FROM reservations WHERE account = ? AND status = 'released' "
+                "ORDER BY number LIMIT 1", (account,)
+            ).fetchone()
+            return row["number"] if row is not None else self._next_free(conn, account, last)
+
+    def last_number(self, account):
+        with self._transaction() as conn:
+            return self._last_number(conn, account)
+
+    def last_committed(self, account):
+        row = self.conn.execute(
+            "SELECT MAX(number) AS n FROM reservations WHERE account = ? AND status = 'committed'", (account,)
+        ).fetchone()
+        return row["n"]
+
+    def set_last_number(self, account, value):
+        """手动设置计数（下一个编号是 value + 1），比 value 大的释放记录一并清掉"""
+        with self._transaction() as conn:
+            self._last_number(conn, account)
+            conn.execute("UPDATE counters SET last_number = ? WHERE account = ?", (value, account))
+            conn.execute(
+                "DELETE FROM reservations WHERE account = ? AND number > ? AND status = 'released'",
+                (account, value),
+            )
+
+    def status(self, account):
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) AS n FROM reservations WHERE account = ? GROUP BY status", (account,)
+        ).fetchall()
+        counts = {row["status"]: row["n"] for row in rows}
+        pending = [
+            row["number"] for row in self.conn.execute(
+                "SELECT number FROM reservations WHERE account = ? AND status = 'reserved' ORDER BY number",
+                (account,),
+            )
+        ]
+        return {
+            "last_number": self.last_number(account),
+            "next_number": self.peek(account),
+            "counts": counts,
+            "reserved": pending,
+        }
+
+
+_default = None
+
+
+def get_allocator():
+    """进程内共用一个分配器"""
+    global _default
+    if _default is None:
+        _default = UploadNumbers()
+    return _default
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    command, account = sys.argv[1], sys.argv[2]
+    numbers = UploadNumbers()
+
+    try:
+        if command == "status":
+            status = numbers.status(account)
+            print(f"📊 {account}: 已分配到 #{status['last_number']}, 下一个 #{status['next_number']}")
+            for name, count in sorted(status["counts"].items()):
+                print(f"   {name}: {count}")
+            if status["reserved"]:
+                print(f"   ⏳ 预留中: {', '.join(f'#{n}' for n in status['reserved'])}")
+        elif command == "reserve":
+            print(f"✅ 已预留 #{numbers.reserve(account)}")
+        elif command == "commit":
+            number = int(sys.argv[3])
+            numbers.commit(account, number, sys.argv[4] if len(sys.argv) > 4 else None)
+            print(f"✅ 已确认 #{number}")
+        elif command == "release":
+            number = int(sys.argv[3])
+            numbers.release(account, number)
+            print(f"↩️  已释放 #{number}")
+        elif command == "set":
+            value = int(sys.argv[3])
+            numbers.set_last_number(account, value)
+            print(f"✅ 计数已设置为 {value}，下一个编号 #{numbers.peek(account)}")
+        else:
+            print(f"未知命令: {command}")
+            print(__doc__)
+            sys.exit(1)
+    except NumberConflict as e:
+        print(f"❌ {e}")
+        sys.exit(1)
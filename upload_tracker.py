@@ -1,11 +1,17 @@
 """
 上传记录管理 - 追踪已上传的视频编号
+
+编号的分配由 upload_numbers.py（SQLite）负责，这里的 upload_history.json 只是上传日志（BV 号、时间）。
 """
 import json
 from pathlib import Path
 from datetime import datetime
 
+from record_writer import update_json_record, write_json_atomic
+from upload_numbers import NumberConflict, get_allocator
+
 UPLOAD_RECORD_FILE = "videos/upload_history.json"
+DEFAULT_HISTORY = {"ai_vanvan": {"last_number": 123, "uploads": []}}  # 文件还不存在时的内容
 
 def load_upload_history():
     """加载上传历史"""
@@ -13,33 +19,30 @@ def load_upload_history():
     if record_file.exists():
         with open(record_file, 'r', encoding='utf-8') as f:
             return json.load(f)
-    return {"ai_vanvan": {"last_number": 123, "uploads": []}}
+    return json.loads(json.dumps(DEFAULT_HISTORY))
 
 def save_upload_history(history):
     """保存上传历史"""
-    record_file = Path(UPLOAD_RECORD_FILE)
-    record_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(record_file, 'w', encoding='utf-8') as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+    write_json_atomic(UPLOAD_RECORD_FILE, history)
 
 def get_next_number(account="ai_vanvan"):
-    """获取下一个视频编号"""
-    history = load_upload_history()
-    if account not in history:
-        history[account] = {"last_number": 123, "uploads": []}
-    return history[account]["last_number"] + 1
+    """获取下一个视频编号（只查看，不分配；真正上传请用 get_allocator().reserve）"""
+    return get_allocator().peek(account)
+
+def last_uploaded_number(account):
+    """已确认上传的最大编号"""
+    committed = get_allocator().last_committed(account) or 0
+    return max(committed, load_upload_history().get(account, {}).get("last_number", 0))
 
 def record_upload(account, number, bv_id=None, title=None):
-    """记录上传"""
-    history = load_upload_history()
-    if account not in history:
-        history[account] = {"last_number": 123, "uploads": []}
-    
-    # 更新最大编号
-    if number > history[account]["last_number"]:
-        history[account]["last_number"] = number
-    
-    # 添加上传记录
+    """记录上传：在分配器里确认编号，再追加一条上传日志"""
+    try:
+        # 入队时已经确认、还没有 BV 号的编号，这里补上 BV 号
+        get_allocator().commit(account, number, bv_id, title)
+    except NumberConflict as e:
+        # 已经释放、或者记过别的 BV 号：分配器里不改，日志照常追加，但要让人知道
+        print(f"⚠️  分配器没有确认 #{number}: {e}")
+
     upload_record = {
         "number": number,
         "title": title or f"ins海外离大谱#{number}",
@@ -47,20 +50,31 @@ def record_upload(account, number, bv_id=None, title=None):
         "upload_time": datetime.now().isoformat(),
         "status": "uploaded"
     }
-    history[account]["uploads"].append(upload_record)
+
+    def add_upload(history):
+        if account not in history:
+            history[account] = {"last_number": 123, "uploads": []}
+        
+        # 更新最大编号
+        if number > history[account]["last_number"]:
+            history[account]["last_number"] = number
+        
+        # 添加上传记录
+        history[account]["uploads"].append(upload_record)
     
-    save_upload_history(history)
+    update_json_record(UPLOAD_RECORD_FILE, add_upload, default=DEFAULT_HISTORY)
     return upload_record
 
 def mark_deleted(account, number):
     """标记视频已删除（但不减少编号）"""
-    history = load_upload_history()
-    if account in history:
-        for upload in history[account]["uploads"]:
-            if upload["number"] == number:
-                upload["status"] = "deleted"
-                upload["delete_time"] = datetime.now().isoformat()
-        save_upload_history(history)
+    def set_deleted(history):
+        if account in history:
+            for upload in history[account]["uploads"]:
+                if upload["number"] == number:
+                    upload["status"] = "deleted"
+                    upload["delete_time"] = datetime.now().isoformat()
+    
+    update_json_record(UPLOAD_RECORD_FILE, set_deleted, default=DEFAULT_HISTORY)
 
 if __name__ == "__main__":
     # 初始化/检查上传历史
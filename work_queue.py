@@ -0,0 +1,413 @@
+"""
+任务队列 - Redis Streams + 消费组（至少一次投递）
+
+以前任务放在普通的 Redis 列表里（auth_queue / download_queue / upload_queue / biliup:queue ...）：
+  - 生产者方向不统一：send_upload_task.py、test_download.py 用 lpush，
+    smart_upload.py、test_upload_queue.py 用 rpush，消费者 BRPOP 时一半任务是后进先出
+  - 弹出即删除：服务在处理中途崩溃，这个任务就丢了
+  - 同一个服务开多个副本，谁拿到哪个任务、有没有处理完都没有记录
+
+这里每个队列是一条流 stream:{队列名}，服务按消费组读取：
+  - XADD 只有一个方向，同一个队列严格先进先出
+  - 处理成功才 XACK；没确认的留在消费组的待确认列表（PEL）里
+  - 服务重启后先处理自己上次领取没确认的；别的副本挂了，
+    它领取的任务空闲超过 reclaim_idle_ms 后被其他副本 XCLAIM 过去重新处理
+  - 同一个任务投递超过 max_deliveries 次还失败，移到 stream:{队列名}:dead，不再无限重试
+  - 同一个消费组的多个副本各自领取不同的任务，可以水平扩容
+
+处理函数要能承受重复执行（至少一次投递：处理完、确认前崩溃会再处理一次）。
+
+迁移（服务还在 BRPOP 旧列表时只写流，任务就没人收了）：
+  1. 默认（没设置 WORK_QUEUE_STREAMS）生产者照旧写旧列表：LPUSH JSON，和 BRPOP 配合先进先出；
+     这时不写幂等键（旧服务不会把键标成已处理，写了之后 7 天内同一个任务都放不进来）
+  2. 服务换成 run_worker 部署好之后，生产者设置 WORK_QUEUE_STREAMS=1，改为写流
+  3. 再 python work_queue.py migrate，把旧列表里剩下的任务按原来 BRPOP 的顺序搬进流里
+
+去重：任务带幂等键 idempotency_key（生产者给的，或者账号 + video_path + 编号）时，
+记在 dedupe:{队列名}:{键}。两者都没有的任务不去重：内容一样不代表是同一个任务
+（同一个账号再下载一次、再扫描一次都是正常的新任务）：
+  - 放入时在同一个事务里检查并写入（WATCH + MULTI），同一个键已经在排队/处理中/
+    处理完的任务直接丢掉，enqueue 返回 None，不需要再先清空队列
+  - 消费时再检查一次：绕过 enqueue 进来的重复任务（旧列表迁移、旧版本生产者）也只处理一次；
+    同一条消息失败后重新投递不算重复
+  - 处理成功后键保留 DEDUPE_TTL（7 天），进了死信的任务删掉键，之后可以重新放入
+
+任务用 task_codec 编码（msgpack，比 JSON 小）。enqueue_many 批量放入：
+每 BATCH_SIZE 个任务只要 3 次往返（WATCH、MGET 查重、MULTI 里一起 SET + XADD），
+扫描出几千个帖子也只是几次往返；消费端 count>1 时一批任务的查重也是 3 次往返。
+
+用法（生产者）:
+    from work_queue import WorkQueue                          # WORK_QUEUE_STREAMS=1 时写流，否则写旧列表
+    WorkQueue(redis_client, "biliup:queue").enqueue(task)
+    WorkQueue(redis_client, "download_queue").enqueue_many(tasks)
+
+用法（服务）:
+    run_worker(redis_client, "biliup:queue", upload_one, group="biliup-uploader")
+
+用法（命令行）:
+  python work_queue.py status [队列名]
+  python work_queue.py migrate [队列名]
+  python work_queue.py dead biliup:queue
+"""
+import json
+import os
+import re
+import socket
+import sys
+import time
+
+import redis
+
+from task_codec import binary_client, decode, encode
+
+REDIS_URL = "redis://localhost:6379"
+QUEUES = ("auth_queue", "scan_queue", "download_queue", "standardize_queue", "merge_queue",
+          "upload_queue", "biliup:queue")
+STREAM_KEY = "stream:{queue}"
+DEAD_KEY = "stream:{queue}:dead"
+DEFAULT_GROUP = "workers"
+STREAM_MAXLEN = 100000
+BLOCK_MS = 5000
+RECLAIM_IDLE_MS = 10 * 60 * 1000  # 领取后 10 分钟没确认，认为那个副本已经挂了
+MAX_DELIVERIES = 5
+DEDUPE_KEY = "dedupe:{queue}:{key}"
+DEDUPE_TTL = 7 * 24 * 60 * 60
+BATCH_SIZE = 500
+USE_STREAMS = os.environ.get("WORK_QUEUE_STREAMS") == "1"  # 服务都换成 run_worker 之后再打开
+
+
+def default_consumer():
+    """消费者名：主机名（k8s 里是 Pod 名）+ 进程号，每个副本不一样"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _decode(fields):
+    return decode(fields[b"data"])
+
+
+def task_key(task):
+    """
+    任务的幂等键：生产者给了 idempotency_key 就用它；有 video_path 的是
+    账号:video_path:编号（编号取 number 字段，没有就取标题里的 #123）；其他任务返回 None，不去重
+    """
+    if task.get("idempotency_key"):
+        return str(task["idempotency_key"])
+    if task.get("video_path"):
+        number = task.get("number")
+        if number is None:
+            match = re.search(r"#(\d+)", task.get("title") or "")
+            number = match.group(1) if match else ""
+        return f"{task.get('account', '')}:{task['video_path']}:{number}"
+    return None
+
+
+class WorkQueue:
+    """一个任务队列（一条流）"""
+
+    def __init__(self, redis_client, name, group=DEFAULT_GROUP, streams=None):
+        self.redis = binary_client(redis_client)
+        self.name = name
+        self.group = group
+        self.streams = USE_STREAMS if streams is None else streams
+        self.stream = STREAM_KEY.format(queue=name)
+        self.dead = DEAD_KEY.format(queue=name)
+
+    def ensure_group(self):
+        try:
+            self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    # ------------------------------------------------------------------
+    # 生产
+    # ------------------------------------------------------------------
+
+    def dedupe_key(self, task):
+        """任务的去重键；不去重的任务返回 None"""
+        key = task_key(task)
+        return None if key is None else DEDUPE_KEY.format(queue=self.name, key=key)
+
+    def enqueue(self, task):
+        """
+        放入一个任务，返回消息ID；同一个幂等键的任务已经在队列里或已经处理过时返回 None。
+        还没切到流（streams=False）时写旧列表，返回放入后的列表长度。
+        """
+        return self.enqueue_many([task])[0]
+
+    def enqueue_many(self, tasks):
+        """批量放入，返回和 tasks 一一对应的消息ID（重复的是 None）"""
+        results = []
+        tasks = list(tasks)
+        enqueue_batch = self._enqueue_batch if self.streams else self._push_legacy
+        for start in range(0, len(tasks), BATCH_SIZE):
+            results.extend(enqueue_batch(tasks[start:start + BATCH_SIZE]))
+        return results
+
+    def _push_legacy(self, tasks):
+        """写旧列表（LPUSH JSON，旧服务 BRPOP 先进先出），不去重"""
+        pipe = self.redis.pipeline(transaction=False)
+        for task in tasks:
+            pipe.lpush(self.name, json.dumps(task, ensure_ascii=False))
+        return pipe.execute()
+
+    def _enqueue_batch(self, tasks):
+        keyed = []
+        for task in tasks:
+            key = task_key(task)
+            keyed.append(task if key is None else {**task, "idempotency_key": key})
+        tasks = keyed
+        keys = [self.dedupe_key(task) for task in tasks]
+        watched = sorted({key for key in keys if key})
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    states = {}
+                    if watched:
+                        pipe.watch(*watched)
+                        states = dict(zip(watched, pipe.mget(watched)))
+                    pipe.multi()
+                    queued, slots = set(), []
+                    for task, key in zip(tasks, keys):
+                        if key is not None:
+                            # 同一批里重复的也只放一个
+                            if states[key] is not None or key in queued:
+                                slots.append(None)
+                                continue
+                            queued.add(key)
+                            pipe.set(key, "queued", ex=DEDUPE_TTL)
+                        slots.append(len(pipe))
+                        pipe.xadd(self.stream, {"data": encode(task)}, maxlen=STREAM_MAXLEN, approximate=True)
+                    results = pipe.execute()
+                    return [None if slot is None else results[slot] for slot in slots]
+                except redis.WatchError:
+                    continue
+
+    def migrate_legacy(self):
+        """把旧列表里的任务搬进流（从右端取，和原来 BRPOP 的顺序一致），返回搬了几个"""
+        moved = 0
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self.name)
+                    if pipe.type(self.name) not in (b"list", "list"):
+                        pipe.unwatch()
+                        return moved
+                    payload = pipe.lindex(self.name, -1)
+                    pipe.multi()
+                    pipe.rpop(self.name)
+                    pipe.xadd(self.stream, {"data": payload}, maxlen=STREAM_MAXLEN, approximate=True)
+                    pipe.execute()
+                    moved += 1
+                except redis.WatchError:
+                    continue
+
+    # ------------------------------------------------------------------
+    # 消费
+    # ------------------------------------------------------------------
+
+    def _entries(self, entries):
+        """[(消息ID, 任务)]；已经被 MAXLEN 裁掉的消息直接确认掉"""
+        trimmed = [message_id for message_id, fields in entries if not fields]
+        if trimmed:
+            self.ack(*trimmed)
+        return [(message_id, _decode(fields)) for message_id, fields in entries if fields]
+
+    def read(self, consumer, count=1, block=BLOCK_MS, after=None):
+        """
+        读新任务 [(消息ID, 任务)]。after 是消息ID时改为读本消费者已经领取、
+        ID 在 after 之后但还没确认的任务（重启恢复用）。
+        """
+        response = self.redis.xreadgroup(
+            self.group, consumer, {self.stream: ">" if after is None else after},
+            count=count, block=block if after is None else None,
+        )
+        return self._entries(response[0][1] if response else [])
+
+    def ack(self, *message_ids):
+        if message_ids:
+            self.redis.xack(self.stream, self.group, *message_ids)
+
+    def claim_tasks(self, entries):
+        """
+        开始处理前调用，entries 是 read() 的结果。返回 (要处理的, 重复的)：
+        同一个幂等键的任务已经处理过或正由另一条消息处理，这条就是重复的（调用方直接确认掉）；
+        同一条消息重新投递不算重复。
+        """
+        if not entries:
+            return [], []
+        keys = [self.dedupe_key(task) for _, task in entries]
+        watched = sorted({key for key in keys if key})
+        if not watched:
+            return list(entries), []
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(*watched)
+                    states = dict(zip(watched, pipe.mget(watched)))
+                    pipe.multi()
+                    accepted, duplicates, claimed = [], [], {}
+                    for entry, key in zip(entries, keys):
+                        if key is None:
+                            accepted.append(entry)
+                            continue
+                        running = f"running:{_text(entry[0])}"
+                        state = claimed.get(key, _text(states[key]))
+                        if state == "done" or (state and state.startswith("running:") and state != running):
+                            duplicates.append(entry)
+                            continue
+                        claimed[key] = running
+                        pipe.set(key, running, ex=DEDUPE_TTL)
+                        accepted.append(entry)
+                    pipe.execute()
+                    return accepted, duplicates
+                except redis.WatchError:
+                    continue
+
+    def complete(self, message_id, task):
+        """处理成功：确认消息，幂等键记为已处理（一个事务）"""
+        key = self.dedupe_key(task)
+        pipe = self.redis.pipeline()
+        if key is not None:
+            pipe.set(key, "done", ex=DEDUPE_TTL)
+        pipe.xack(self.stream, self.group, message_id)
+        pipe.execute()
+
+    def reclaim(self, consumer, min_idle_ms=RECLAIM_IDLE_MS, count=10, max_deliveries=MAX_DELIVERIES):
+        """
+        领取空闲超过 min_idle_ms 还没确认的任务（任何消费者的），返回 [(消息ID, 任务)]。
+        投递次数已经达到 max_deliveries 的移到死信流。
+        """
+        pending = self.redis.xpending_range(self.stream, self.group, "-", "+", count, idle=min_idle_ms)
+        retry, dead = [], []
+        for entry in pending:
+            (dead if entry["times_delivered"] >= max_deliveries else retry).append(entry["message_id"])
+        for message_id in dead:
+            self._bury(message_id, consumer)
+        if not retry:
+            return []
+        # XCLAIM 自己再检查一次空闲时间：两个副本同时回收，只有一个拿得到
+        claimed = self.redis.xclaim(self.stream, self.group, consumer, min_idle_ms, retry)
+        return self._entries(claimed)
+
+    def _bury(self, message_id, consumer):
+        entries = self.redis.xrange(self.stream, message_id, message_id)
+        pipe = self.redis.pipeline()
+        if entries and entries[0][1]:
+            fields = entries[0][1]
+            key = self.dedupe_key(_decode(fields))
+            if key is not None:
+                pipe.delete(key)
+            pipe.xadd(self.dead, {
+                "data": fields[b"data"],
+                "source_id": message_id,
+                "buried_by": consumer,
+                "buried_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }, maxlen=STREAM_MAXLEN, approximate=True)
+        pipe.xack(self.stream, self.group, message_id)
+        pipe.execute()
+        print(f"☠️  [{self.name}] {_text(message_id)} 投递次数过多，移到 {self.dead}")
+
+    def backlog(self):
+        """还没处理完的任务数（未读 + 待确认）；还没有消费组时是流长度，还没切到流时是旧列表长度"""
+        if not self.streams:
+            return self.redis.llen(self.name)
+        group = self.status()["groups"].get(self.group)
+        if group is None or group["lag"] is None:
+            return self.redis.xlen(self.stream)
+        return group["lag"] + group["pending"]
+
+    def status(self):
+        """流长度、各消费组的待确认数/未读数、死信数、旧列表里剩下的任务数"""
+        info = {
+            "length": self.redis.xlen(self.stream),
+            "groups": {},
+            "dead": self.redis.xlen(self.dead),
+            "legacy": self.redis.llen(self.name) if self.redis.type(self.name) in (b"list", "list") else 0,
+        }
+        if self.redis.exists(self.stream):
+            for group in self.redis.xinfo_groups(self.stream):
+                info["groups"][_text(group["name"])] = {
+                    "pending": group["pending"],
+                    "lag": group.get("lag"),
+                    "consumers": group["consumers"],
+                }
+        return info
+
+
+def run_worker(redis_client, queue, handler, group=DEFAULT_GROUP, consumer=None, stop=None, count=1,
+               reclaim_idle_ms=RECLAIM_IDLE_MS, max_deliveries=MAX_DELIVERIES):
+    """
+    服务的消费循环。handler(task) 正常返回就确认；抛异常时任务留在待确认列表，
+    空闲 reclaim_idle_ms 后重新投递（本副本或其他副本）。幂等键重复的任务不调用 handler，直接确认。
+    stop.is_set() 时结束，返回处理成功的个数。
+    """
+    work_queue = WorkQueue(redis_client, queue, group, streams=True)
+    work_queue.ensure_group()
+    consumer = consumer or default_consumer()
+    handled = 0
+    after = "0"  # 先处理自己上次领取了没确认的
+    next_reclaim = 0
+    while not (stop and stop.is_set()):
+        if after is not None:
+            entries = work_queue.read(consumer, count, after=after)
+            after = entries[-1][0] if entries else None
+        else:
+            entries = []
+            if time.monotonic() >= next_reclaim:
+                entries = work_queue.reclaim(consumer, reclaim_idle_ms, count, max_deliveries)
+                if not entries:
+                    next_reclaim = time.monotonic() + min(reclaim_idle_ms / 1000, 60)
+            if not entries:
+                entries = work_queue.read(consumer, count)
+
+        entries, duplicates = work_queue.claim_tasks(entries)
+        for message_id, task in duplicates:
+            print(f"⏭️  [{queue}] {_text(message_id)} 重复任务 {task_key(task)}，跳过")
+        work_queue.ack(*(message_id for message_id, _ in duplicates))
+
+        for message_id, task in entries:
+            try:
+                handler(task)
+            except Exception as e:
+                print(f"❌ [{queue}] {_text(message_id)} 处理失败，稍后重试: {e}")
+                continue
+            work_queue.complete(message_id, task)
+            handled += 1
+    return handled
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    command = sys.argv[1]
+    names = sys.argv[2:] or QUEUES
+    r = redis.from_url(REDIS_URL)
+
+    if command == "status":
+        for name in names:
+            info = WorkQueue(r, name).status()
+            print(f"📊 {name}: {info['length']} 条, 死信 {info['dead']}, 旧列表 {info['legacy']}")
+            for group, counts in info["groups"].items():
+                lag = counts["lag"] if counts["lag"] is not None else "?"
+                print(f"   {group}: 消费者 {counts['consumers']}, 待确认 {counts['pending']}, 未读 {lag}")
+    elif command == "migrate":
+        for name in names:
+            moved = WorkQueue(r, name, streams=True).migrate_legacy()
+            print(f"✅ {name}: 从旧列表搬了 {moved} 个任务")
+    elif command == "dead":
+        for name in names:
+            work_queue = WorkQueue(r, name)
+            for message_id, fields in r.xrange(work_queue.dead):
+                task = json.dumps(decode(fields[b"data"]), ensure_ascii=False)
+                print(f"☠️  {_text(message_id)} ({_text(fields.get(b'buried_at'))}) {task}")
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,299 @@
+"""
+工作流提交接口 - 一次调用，服务端执行整个流程
+
+run_full_workflow.py 要向 gateway 发 5 次请求（扫描/下载/标准化/合并/上传），
+每一步之间还得客户端自己等、自己排顺序：笔记本合上了或者 CronJob 超时了，流程就断了。
+
+这里把整个计划一次交给 gateway，由 gateway 在后台线程里执行：
+  POST /workflow                    {"account", "download_limit", "merge_count", "resolution", "upload", "stream"}
+                                    → {"status": "success", "run_id": ...}
+                                    {"account", "resume": run_id} 从失败的地方继续
+  GET  /workflow/<run_id>           每个阶段的状态、task_id、进度
+  POST /workflow/<run_id>/cancel    取消
+  GET  /workflow?account=ai_vanvan  最近的执行
+
+执行用 workflow_engine（按依赖、失败即停），断点记在 workflow_checkpoints（同一个 run_id）。
+给了 redis_client 时，每次阶段变化都 publish_task_event(run_id, ...)，
+客户端也可以用 task_events.wait_for_task(run_id) 等结果。同一个账号同时只能有一个执行。
+
+用法（gateway）:
+    from workflow_api import create_blueprint
+    app.register_blueprint(create_blueprint(redis_client), url_prefix="/api")
+
+用法（客户端）:
+  python run_full_workflow.py ai_vanvan --server             # 提交后跟踪进度
+  python run_full_workflow.py ai_vanvan --server --detach    # 提交后直接退出
+"""
+import threading
+import time
+
+from run_full_workflow import build_stages, make_resumable, make_status_fn, record_event
+from workflow_checkpoints import get_checkpoints
+from workflow_engine import WorkflowEngine
+
+DEFAULT_PLAN = {
+    "download_limit": 20,
+    "merge_count": 15,
+    "resolution": "1080x1920",
+    "upload": False,
+    "stream": False,
+}
+RESOLUTIONS = ("720x1280", "1080x1920")
+
+
+class WorkflowConflict(Exception):
+    """这个账号已经有一个执行在跑，或者这次执行不能恢复"""
+
+
+BOOL_STRINGS = {"true": True, "false": False, "1": True, "0": False}
+
+
+def _parse_bool(key, value):
+    """只认 true/false（JSON 布尔、0/1、"true"/"false"）；"no"、"off" 之类不会被当成 True"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in BOOL_STRINGS:
+        return BOOL_STRINGS[value.strip().lower()]
+    raise ValueError(f"{key} 必须是 true 或 false")
+
+
+def _parse_positive_int(key, value):
+    if isinstance(value, bool):
+        raise ValueError(f"{key} 必须是整数")
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} 必须是整数")
+    if value <= 0:
+        raise ValueError(f"{key} 必须大于 0")
+    return value
+
+
+def parse_plan(data):
+    """校验提交的计划，返回 (账号, 参数)；不合法抛 ValueError"""
+    account = (data or {}).get("account")
+    if not account:
+        raise ValueError("缺少 account")
+    params = {}
+    for key, default in DEFAULT_PLAN.items():
+        value = data.get(key, default)
+        if isinstance(default, bool):
+            value = _parse_bool(key, value)
+        elif isinstance(default, int):
+            value = _parse_positive_int(key, value)
+        params[key] = value
+    if params["resolution"] not in RESOLUTIONS:
+        raise ValueError(f"resolution 只能是 {' / '.join(RESOLUTIONS)}")
+    return account, params
+
+
+class WorkflowRunner:
+    """在后台线程里执行工作流，记录每个阶段的进度"""
+
+    def __init__(self, checkpoints=None, redis_client=None):
+        self.checkpoints = checkpoints or get_checkpoints()
+        self.redis = redis_client
+        self._active = {}  # run_id -> {"account", "engine", "stages", "progress", "cancelled"}
+        self._lock = threading.Lock()
+
+    def _publish(self, run_id, account, status, **fields):
+        if self.redis is None:
+            return
+        from task_events import publish_task_event
+
+        try:
+            publish_task_event(self.redis, run_id, account, status, service="workflow", **fields)
+        except Exception as e:
+            print(f"⚠️  推送工作流事件失败: {e}")
+
+    def submit(self, data):
+        """提交（或恢复）一次执行，返回 run_id"""
+        resume = (data or {}).get("resume")
+        if not resume:
+            account, params = parse_plan(data)
+        else:
+            run = self.checkpoints.get_run(resume)
+            if run is None:
+                raise KeyError(resume)
+            if run["status"] == "completed":
+                raise WorkflowConflict(f"{resume} 已经完成")
+            if run["status"] == "abandoned":
+                # 手动放弃的执行（workflow_checkpoints.py abandon），不能再恢复
+                raise WorkflowConflict(f"{resume} 已经放弃，不能恢复")
+            # 恢复时沿用当时的参数，跳过的阶段和接下来的阶段是同一批视频
+            account, params = run["account"], {**DEFAULT_PLAN, **run["params"]}
+
+        with self._lock:
+            busy = [rid for rid, active in self._active.items() if active["account"] == account]
+            if busy:
+                raise WorkflowConflict(f"{account} 正在执行 {busy[0]}")
+            if resume:
+                run_id = resume
+                self.checkpoints.set_run_status(run_id, "running")
+            else:
+                run_id = self.checkpoints.start_run(account, params)
+
+            stages = make_resumable(build_stages(
+                account, params["download_limit"], params["merge_count"], params["resolution"],
+                params["upload"], run_id, params["stream"],
+            ), self.checkpoints, run_id)
+            active = {
+                "account": account,
+                "stages": [stage.name for stage in stages],
+                "progress": {},
+                "cancelled": False,
+            }
+            active["engine"] = WorkflowEngine(
+                stages,
+                status_fn=make_status_fn(account),
+                on_event=record_event(self.checkpoints, run_id, self._event_handler(run_id, active)),
+            )
+            self._active[run_id] = active
+
+        threading.Thread(target=self._run, args=(run_id, active), daemon=True,
+                         name=f"workflow-{run_id}").start()
+        return run_id
+
+    def _event_handler(self, run_id, active):
+        def handler(event, stage, info):
+            if event == "progress":
+                active["progress"][stage.name] = info.get("progress") or {}
+                return
+            self._publish(run_id, active["account"], "running", stage=stage.name, event=event,
+                          stage_task_id=info.get("task_id"), error=info.get("error"))
+        return handler
+
+    def _run(self, run_id, active):
+        context = {
+            "account": active["account"],
+            "run_id": run_id,
+            "results": self.checkpoints.completed_stages(run_id),
+        }
+        status, error = "failed", None
+        try:
+            active["engine"].run(context)
+            if active["cancelled"]:
+                status = "cancelled"
+            elif not context.get("failed"):
+                status = "completed"
+            else:
+                error = context["results"][context["failed"]].get("error")
+        except Exception as e:
+            error = str(e)
+        finally:
+            self.checkpoints.set_run_status(run_id, status)
+            with self._lock:
+                self._active.pop(run_id, None)
+            self._publish(run_id, active["account"], status, failed_stage=context.get("failed"), error=error)
+
+    def cancel(self, run_id):
+        with self._lock:
+            active = self._active.get(run_id)
+        if active is None:
+            return False
+        active["cancelled"] = True
+        active["engine"].cancel()
+        return True
+
+    def status(self, run_id):
+        """执行的状态和每个阶段的进度；没有这个 run_id 返回 None"""
+        run = self.checkpoints.get_run(run_id)
+        if run is None:
+            return None
+        with self._lock:
+            active = self._active.get(run_id)
+        recorded = self.checkpoints.stages(run_id)
+        names = active["stages"] if active else list(recorded)
+        stages = []
+        for name in names:
+            stage = recorded.get(name) or {"status": "pending", "task_id": None, "result": None}
+            entry = {"name": name, "status": stage["status"], "task_id": stage["task_id"]}
+            if stage["result"]:
+                entry["elapsed"] = stage["result"].get("elapsed")
+                entry["error"] = stage["result"].get("error")
+            if active and name in active["progress"] and stage["status"] == "running":
+                entry["progress"] = active["progress"][name]
+            stages.append(entry)
+        return {
+            "run_id": run_id,
+            "account": run["account"],
+            "status": run["status"],
+            "params": run["params"],
+            "active": active is not None,
+            "created_at": run["created_at"],
+            "updated_at": run["updated_at"],
+            "stages": stages,
+        }
+
+
+def create_blueprint(redis_client=None, runner=None, name="workflow_api"):
+    """/workflow 接口，注册到 API Gateway 的 Flask app 上"""
+    from flask import Blueprint, jsonify, request
+
+    bp = Blueprint(name, __name__)
+    runner = runner or WorkflowRunner(redis_client=redis_client)
+
+    @bp.route("/workflow", methods=["POST"])
+    def submit_workflow():
+        try:
+            run_id = runner.submit(request.get_json(silent=True) or {})
+        except ValueError as e:
+            return jsonify({"status": "error", "error": str(e)}), 400
+        except KeyError as e:
+            return jsonify({"status": "error", "error": f"没有这次执行: {e.args[0]}"}), 404
+        except WorkflowConflict as e:
+            return jsonify({"status": "error", "error": str(e)}), 409
+        return jsonify({"status": "success", "run_id": run_id, "task_id": run_id})
+
+    @bp.route("/workflow", methods=["GET"])
+    def list_workflows():
+        account = request.args.get("account")
+        if not account:
+            return jsonify({"status": "error", "error": "缺少 account"}), 400
+        try:
+            limit = min(_parse_positive_int("limit", request.args.get("limit", 10)), 100)
+        except ValueError as e:
+            return jsonify({"status": "error", "error": str(e)}), 400
+        runs = [runner.status(run["run_id"]) for run in runner.checkpoints.list_runs(account, limit)]
+        return jsonify({"status": "success", "runs": runs})
+
+    @bp.route("/workflow/<run_id>", methods=["GET"])
+    def workflow_status(run_id):
+        status = runner.status(run_id)
+        if status is None:
+            return jsonify({"status": "error", "error": f"没有这次执行: {run_id}"}), 404
+        return jsonify(status)
+
+    @bp.route("/workflow/<run_id>/cancel", methods=["POST"])
+    def cancel_workflow(run_id):
+        if not runner.cancel(run_id):
+            return jsonify({"status": "error", "error": f"{run_id} 没有在执行"}), 409
+        return jsonify({"status": "success", "run_id": run_id})
+
+    return bp
+
+
+def follow_workflow(base_url, run_id, interval=2.0, timeout=None, on_change=None, session=None):
+    """客户端：轮询 GET /workflow/<run_id> 直到结束，阶段状态变化时调用 on_change(stage)"""
+    import http_client
+
+    http = session or http_client.get_session()
+    deadline = time.monotonic() + timeout if timeout else None
+    seen = {}
+    while True:
+        response = http.get(f"{base_url}/workflow/{run_id}", timeout=10)
+        response.raise_for_status()
+        status = response.json()
+        for stage in status["stages"]:
+            key = (stage["status"], stage.get("task_id"), str(stage.get("progress")))
+            if seen.get(stage["name"]) != key:
+                seen[stage["name"]] = key
+                if on_change:
+                    on_change(stage)
+        if not status["active"]:
+            return status
+        if deadline and time.monotonic() > deadline:
+            raise TimeoutError(f"等待 {run_id} 超时（{timeout} 秒）")
+        time.sleep(interval)
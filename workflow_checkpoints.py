@@ -0,0 +1,255 @@
+"""
+工作流断点 - SQLite，按 run_id 记录每个阶段、每个视频的进度
+
+以前 run_full_workflow.py 在第 3、4 步失败，重跑就得从扫描开始；
+auto_retry_download.py 每次都整个重新调用 main.py --download，
+上一次进行到哪里没有任何记录。
+
+这里每次执行分配一个 run_id，记录在 videos/workflow_runs.db
+（videos/ 是各个容器共享的目录，服务端也能写同一个库）：
+  runs     每次执行一行：账号、参数、状态 running / failed / completed
+  stages   每个阶段一行：状态、task_id、结果
+  items    每个视频一行：阶段 + 条目（shortcode / 文件路径）+ 输出
+
+重试时用同一个 run_id 恢复：
+  - 已完成的阶段直接跳过（workflow_engine 把 context["results"] 里的阶段当作已完成）
+  - 中断时还在运行的任务，如果服务端还在跑或已经完成，接着等它，不重新提交
+  - 服务端拿到 run_id 后用 done_items() 跳过这一轮已经下载/标准化/合并过的视频
+
+用法:
+  python workflow_checkpoints.py list ai_vanvan
+  python workflow_checkpoints.py show ai_vanvan-20251020-093000-1a2b
+  python workflow_checkpoints.py abandon ai_vanvan-20251020-093000-1a2b
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+DB_PATH = "videos/workflow_runs.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      TEXT PRIMARY KEY,
+    account     TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    params      TEXT NOT NULL DEFAULT '{}',
+    status      TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    updated_at  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_account ON runs(account, kind, status);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id      TEXT NOT NULL,
+    stage       TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    task_id     TEXT,
+    result      TEXT,
+    updated_at  TEXT NOT NULL,
+    PRIMARY KEY (run_id, stage)
+);
+CREATE TABLE IF NOT EXISTS items (
+    run_id      TEXT NOT NULL,
+    stage       TEXT NOT NULL,
+    item        TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    output      TEXT,
+    updated_at  TEXT NOT NULL,
+    PRIMARY KEY (run_id, stage, item)
+);
+"""
+
+
+def new_run_id(account):
+    """ai_vanvan-20251020-093000-1a2b（同一秒启动两次也不会重复）"""
+    return f"{account}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:4]}"
+
+
+class WorkflowCheckpoints:
+    """工作流断点记录"""
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        # 工作流的各个阶段（以及 workflow_api 的请求）在不同线程里读写，共用一个连接
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    # ------------------------------------------------------------------
+    # 执行
+    # ------------------------------------------------------------------
+
+    def start_run(self, account, params=None, kind="workflow", run_id=None):
+        """新建一次执行，返回 run_id"""
+        run_id = run_id or new_run_id(account)
+        now = datetime.now().isoformat()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO runs (run_id, account, kind, params, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'running', ?, ?)",
+                (run_id, account, kind, json.dumps(params or {}, ensure_ascii=False), now, now),
+            )
+        return run_id
+
+    def get_run(self, run_id):
+        rows = self._query("SELECT * FROM runs WHERE run_id = ?", (run_id,))
+        if not rows:
+            return None
+        run = dict(rows[0])
+        run["params"] = json.loads(run["params"])
+        return run
+
+    def latest_unfinished(self, account, kind="workflow"):
+        """这个账号最近一次没有完成的执行（running / failed），没有返回 None"""
+        rows = self._query(
+            "SELECT run_id FROM runs WHERE account = ? AND kind = ? AND status IN ('running', 'failed') "
+            "ORDER BY created_at DESC LIMIT 1", (account, kind)
+        )
+        return self.get_run(rows[0]["run_id"]) if rows else None
+
+    def set_run_status(self, run_id, status):
+        """running / failed / completed / abandoned"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?",
+                         (status, datetime.now().isoformat(), run_id))
+
+    def list_runs(self, account, limit=10):
+        rows = self._query(
+            "SELECT run_id FROM runs WHERE account = ? ORDER BY created_at DESC LIMIT ?", (account, limit)
+        )
+        return [self.get_run(row["run_id"]) for row in rows]
+
+    # ------------------------------------------------------------------
+    # 阶段
+    # ------------------------------------------------------------------
+
+    def mark_stage(self, run_id, stage, status, task_id=None, result=None):
+        """记录阶段状态；task_id 不传时保留原来的"""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO stages (run_id, stage, status, task_id, result, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(run_id, stage) DO UPDATE SET status = excluded.status, "
+                "task_id = COALESCE(excluded.task_id, stages.task_id), "
+                "result = excluded.result, updated_at = excluded.updated_at",
+                (run_id, stage, status, task_id,
+                 json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 datetime.now().isoformat()),
+            )
+
+    def stages(self, run_id):
+        """{阶段: {"status", "task_id", "result"}}"""
+        rows = self._query("SELECT * FROM stages WHERE run_id = ? ORDER BY updated_at", (run_id,))
+        return {
+            row["stage"]: {
+                "status": row["status"],
+                "task_id": row["task_id"],
+                "result": json.loads(row["result"]) if row["result"] else None,
+            }
+            for row in rows
+        }
+
+    def completed_stages(self, run_id):
+        """{阶段: 结果}，只包含已完成的阶段（可以直接放进 context["results"]）"""
+        return {
+            name: stage["result"] or {"status": "completed", "elapsed": 0}
+            for name, stage in self.stages(run_id).items()
+            if stage["status"] == "completed"
+        }
+
+    # ------------------------------------------------------------------
+    # 条目
+    # ------------------------------------------------------------------
+
+    def mark_item(self, run_id, stage, item, status="done", output=None):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO items (run_id, stage, item, status, output, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, stage, str(item), status, output, datetime.now().isoformat()),
+            )
+
+    def done_items(self, run_id, stage):
+        """{条目: 输出}，这一轮这个阶段已经完成的条目"""
+        rows = self._query(
+            "SELECT item, output FROM items WHERE run_id = ? AND stage = ? AND status = 'done'", (run_id, stage)
+        )
+        return {row["item"]: row["output"] for row in rows}
+
+    def item_counts(self, run_id):
+        """{阶段: {状态: 个数}}"""
+        counts = {}
+        for row in self._query(
+            "SELECT stage, status, COUNT(*) AS n FROM items WHERE run_id = ? GROUP BY stage, status", (run_id,)
+        ):
+            counts.setdefault(row["stage"], {})[row["status"]] = row["n"]
+        return counts
+
+
+_default = None
+
+
+def get_checkpoints():
+    """进程内共用一个实例"""
+    global _default
+    if _default is None:
+        _default = WorkflowCheckpoints()
+    return _default
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    command, target = sys.argv[1], sys.argv[2]
+    checkpoints = WorkflowCheckpoints()
+
+    if command == "list":
+        for run in checkpoints.list_runs(target, limit=20):
+            done = ", ".join(checkpoints.completed_stages(run["run_id"])) or "-"
+            print(f"{run['run_id']:32} {run['kind']:10} {run['status']:10} 已完成: {done}")
+    elif command == "show":
+        run = checkpoints.get_run(target)
+        if run is None:
+            print(f"❌ 没有这次执行: {target}")
+            sys.exit(1)
+        print(f"📋 {run['run_id']} ({run['account']}, {run['kind']}) {run['status']}")
+        print(f"   参数: {json.dumps(run['params'], ensure_ascii=False)}")
+        for name, stage in checkpoints.stages(target).items():
+            print(f"   {name:12} {stage['status']:10} {stage['task_id'] or ''}")
+        for stage, counts in checkpoints.item_counts(target).items():
+            print(f"   {stage} 条目: {', '.join(f'{s} {n}' for s, n in sorted(counts.items()))}")
+    elif command == "abandon":
+        checkpoints.set_run_status(target, "abandoned")
+        print(f"✅ {target} 不再恢复")
+    else:
+        print(f"未知命令: {command}")
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,172 @@
+"""
+工作流执行器 - 按依赖关系（DAG）执行各个阶段
+
+run_full_workflow.py 以前提交一个任务就 sleep 3~5 秒再提交下一个，
+根本不等上一个任务完成：要么下一步拿到的是旧数据，要么白等。
+
+这里每个阶段声明自己依赖哪些阶段：
+  - 依赖全部完成的阶段立刻开始（不用固定等待）
+  - 阶段提交后按 task_id 查询状态，完成就触发后续阶段
+  - 每个阶段有自己的超时；任何阶段失败/超时，还没开始的阶段全部取消（失败即停止）
+
+状态查询是一个函数 status_fn(stage, task_id) -> {"status": ..., ...}，
+HTTP 轮询、Redis 订阅都可以接进来。轮询间隔从 0.5 秒开始逐步加到 5 秒，
+短任务不会多等，长任务也不会频繁查询。
+
+用法:
+    engine = WorkflowEngine([
+        Stage("scan", submit_scan, timeout=300),
+        Stage("download", submit_download, after=["scan"], timeout=1800),
+    ], status_fn=query_status)
+    result = engine.run({"account": "ai_vanvan"})
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DONE_STATUSES = ("completed", "success", "done", "finished")
+FAILED_STATUSES = ("failed", "error", "cancelled")
+
+
+class StageFailed(Exception):
+    """阶段失败或超时"""
+
+
+class Stage:
+    """
+    一个阶段。submit(context) 提交任务并返回 task_id；
+    返回 None 表示任务已经同步完成，不需要等待。
+    """
+
+    def __init__(self, name, submit, after=(), timeout=600, service=None):
+        self.name = name
+        self.submit = submit
+        self.after = tuple(after)
+        self.timeout = timeout
+        self.service = service or name
+
+
+class WorkflowEngine:
+    """按依赖关系执行阶段，阶段之间没有固定等待"""
+
+    def __init__(self, stages, status_fn, poll_interval=0.5, max_poll_interval=5.0, on_event=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.status_fn = status_fn
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.on_event = on_event or (lambda event, stage, info: None)
+        self._cancelled = threading.Event()
+        self._check_graph()
+
+    def _check_graph(self):
+        for stage in self.stages.values():
+            for dep in stage.after:
+                if dep not in self.stages:
+                    raise ValueError(f"阶段 {stage.name} 依赖不存在的阶段 {dep}")
+        # 检查环：反复去掉没有未完成依赖的阶段，去不完就是有环
+        remaining = dict(self.stages)
+        while remaining:
+            ready = [name for name, s in remaining.items() if not any(d in remaining for d in s.after)]
+            if not ready:
+                raise ValueError(f"阶段依赖有环: {', '.join(remaining)}")
+            for name in ready:
+                del remaining[name]
+
+    def cancel(self):
+        """取消：正在等待的阶段尽快结束，还没开始的不再开始"""
+        self._cancelled.set()
+
+    # ------------------------------------------------------------------
+    # 单个阶段
+    # ------------------------------------------------------------------
+
+    def wait_task(self, stage, task_id, deadline):
+        """等待 task_id 完成，返回最后一次状态"""
+        interval = self.poll_interval
+        while True:
+            if self._cancelled.is_set():
+                raise StageFailed("已取消")
+            info = self.status_fn(stage, task_id) or {}
+            status = str(info.get("status", "")).lower()
+            if status in DONE_STATUSES:
+                return info
+            if status in FAILED_STATUSES:
+                raise StageFailed(info.get("error") or f"任务状态: {status}")
+            self.on_event("progress", stage, info)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise StageFailed(f"超时（{stage.timeout} 秒）")
+            self._cancelled.wait(min(interval, remaining))
+            interval = min(interval * 1.5, self.max_poll_interval)
+
+    def _run_stage(self, stage, context):
+        started = time.monotonic()
+        deadline = started + stage.timeout
+        self.on_event("start", stage, {})
+        task_id = stage.submit(context)
+        info = {}
+        if task_id is not None:
+            self.on_event("submitted", stage, {"task_id": task_id})
+            info = self.wait_task(stage, task_id, deadline)
+        return {
+            "status": "completed",
+            "task_id": task_id,
+            "elapsed": time.monotonic() - started,
+            "info": info,
+        }
+
+    # ------------------------------------------------------------------
+    # 整个流程
+    # ------------------------------------------------------------------
+
+    def run(self, context=None):
+        """
+        执行所有阶段，返回 {阶段名: 结果}。
+        结果的 status 是 completed / failed / cancelled / skipped；
+        有失败时 context["failed"] 是第一个失败的阶段名。
+        context["results"] 里已经有的阶段（断点恢复）当作已完成，不再执行。
+        """
+        context = context if context is not None else {}
+        self._cancelled.clear()
+        results = context.setdefault("results", {})
+        pending = {name: stage for name, stage in self.stages.items() if name not in results}
+        running = {}
+        failed = None
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.stages))) as pool:
+            try:
+                while pending or running:
+                    if failed is None and not self._cancelled.is_set():
+                        for name in [n for n, s in pending.items() if all(d in results for d in s.after)]:
+                            stage = pending.pop(name)
+                            running[pool.submit(self._run_stage, stage, context)] = stage
+
+                    if not running:
+                        break
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage = running.pop(future)
+                        try:
+                            results[stage.name] = future.result()
+                            self.on_event("completed", stage, results[stage.name])
+                        except Exception as e:
+                            # 别的阶段先失败了，这个阶段是被连带取消的
+                            status = "cancelled" if failed is not None else "failed"
+                            results[stage.name] = {"status": status, "error": str(e)}
+                            self.on_event(status, stage, results[stage.name])
+                            if failed is None:
+                                failed = stage.name
+                                # 失败即停止：正在等待的阶段也不用再等了
+                                self._cancelled.set()
+            except BaseException:
+                # Ctrl-C 等：先让正在等待的阶段退出，否则退出 with 时线程池会一直等它们到超时
+                self._cancelled.set()
+                raise
+
+        for name in pending:
+            results[name] = {"status": "skipped"}
+        if failed is not None:
+            context["failed"] = failed
+        return results